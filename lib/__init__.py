@@ -4,6 +4,7 @@ from .colors import (
     MODULE_BAIDU, 
     MODULE_PROMPT, 
     MODULE_ROUTE,
+    MODULE_LLM,
     success, 
     error, 
     warning, 
@@ -1,5 +1,3 @@
-import os
-import json
 import hashlib
 import random
 import requests
@@ -7,6 +5,9 @@ import time
 
 # 导入颜色模块
 from .colors import Colors, MODULE_BAIDU, success, error, warning, info, content, format_log
+from .rate_limiter import rate_limiters
+from .singleflight import SingleFlight
+from .config_store import config_store
 
 class BaiduTranslator:
     # 百度错误码对应的中文描述
@@ -28,22 +29,24 @@ class BaiduTranslator:
         "20003": "请求内容存在安全风险，请检查请求内容"
     }
     
+    # 单次请求 q 参数的字节上限（百度建议 6000 bytes 以内）
+    MAX_QUERY_BYTES = 5000
+    
     def __init__(self):
         self._session = None
-        self.config = self._load_config()
         self._debug = False  # 控制是否输出详细调试信息
         self._paragraph_index = 0  # 增加段落索引计数器
+        self._flights = SingleFlight()  # 合并相同的并发请求
     
-    def _load_config(self):
-        """加载配置文件"""
-        current_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-        config_path = os.path.join(current_path, "config.json")
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(format_log(MODULE_BAIDU, f"加载配置文件失败: {e}", 'error'))
-            return {"prompt_translate": {"appid": "", "key": ""}}
+    @property
+    def config(self):
+        """当前配置（来自共享配置存储，只读）"""
+        return config_store.get()
+    
+    @property
+    def backend_id(self):
+        """翻译后端标识（区分账号），用于缓存键"""
+        return f"baidu:{config_store.section('prompt_translate').get('appid', '')}"
     
     @property
     def session(self):
@@ -61,39 +64,53 @@ class BaiduTranslator:
         sign_str = appid + query + salt + key
         return hashlib.md5(sign_str.encode()).hexdigest()
     
-    def translate_text(self, text, from_lang="auto", to_lang="auto", retry_count=3):
+    def _get_rate_limiter(self, appid):
         """
-        翻译单个文本片段
-        这是核心翻译方法，仅负责与百度API通信
+        获取当前账号的令牌桶
+        速率由 prompt_translate.tier（standard/advanced/premium）或 prompt_translate.qps 配置
         """
-        if not text.strip():
-            return {"status": "success", "text": ""}
-        
-        appid = self.config["prompt_translate"]["appid"]
-        key = self.config["prompt_translate"]["key"]
-        
-        if not appid or not key:
-            print(format_log(MODULE_BAIDU, "未配置API密钥", 'error'))
-            return {"status": "error", "message": "翻译失败：请在设置界面中配置翻译API"}
-        
-        if self._debug:
-            print(format_log(MODULE_BAIDU, f"开始翻译，长度: {len(text)}字符",))
-
+        translate_config = config_store.section("prompt_translate")
+        qps = rate_limiters.resolve_qps(translate_config.get("tier"), translate_config.get("qps"))
+        return rate_limiters.get(appid, qps, translate_config.get("burst", 1))
+    
+    def _request(self, query, from_lang, to_lang, retry_count=3):
+        """
+        发送翻译请求
+        同一账号、语言方向和内容的请求正在进行时，不再重复调用API，等待并共享其结果
+        """
+        appid = config_store.section("prompt_translate").get("appid", "")
+        return self._flights.do(
+            (appid, from_lang, to_lang, query),
+            lambda: self._send_request(query, from_lang, to_lang, retry_count)
+        )
+    
+    def _send_request(self, query, from_lang, to_lang, retry_count=3):
+        """
+        发送翻译请求（含重试）
+        仅负责与百度API通信，成功时返回原始的 trans_result 列表
+        """
+        translate_config = config_store.section("prompt_translate")
+        appid = translate_config.get("appid", "")
+        key = translate_config.get("key", "")
+        limiter = self._get_rate_limiter(appid)
         
         for attempt in range(retry_count):
             try:
+                # 等待令牌，按账号QPS排队发送
+                limiter.acquire()
+                
                 salt = self._generate_salt()
-                sign = self._generate_sign(appid, text, salt, key)
+                sign = self._generate_sign(appid, query, salt, key)
                 
                 # 只在调试模式下打印详细信息
                 if self._debug:
-                    paragraph_info = f"段落 #{self._paragraph_index}，长度: {len(text)}字符"
+                    paragraph_info = f"段落 #{self._paragraph_index}，长度: {len(query)}字符"
                     retry_info = f"尝试 #{attempt+1}/{retry_count}"
                     print(f"{MODULE_BAIDU} {paragraph_info} - {retry_info}")
                 
                 # 构建请求参数
                 request_params = {
-                    "q": text,
+                    "q": query,
                     "from": from_lang,
                     "to": to_lang,
                     "appid": appid,
@@ -139,8 +156,14 @@ class BaiduTranslator:
                     error_message = self.ERROR_CODES.get(error_code, f"未知错误 (错误码: {error_code})")
                     print(format_log(MODULE_BAIDU, f"API错误: {error_message}", 'error'))
                     
+                    # 频率受限时清空令牌，下次请求至少等待一个周期，无需固定休眠
+                    if error_code == "54003" and attempt < retry_count - 1:
+                        limiter.drain()
+                        print(format_log(MODULE_BAIDU, "访问频率受限，排队等待令牌后重试", 'warning'))
+                        continue
+                    
                     # 判断是否可以重试
-                    if error_code in ["54003", "52001", "52002"] and attempt < retry_count - 1:
+                    if error_code in ["52001", "52002"] and attempt < retry_count - 1:
                         delay = (attempt + 1) * 2
                         print(format_log(MODULE_BAIDU, f"将在 {delay} 秒后重试", 'warning'))
                         time.sleep(delay)
@@ -150,10 +173,7 @@ class BaiduTranslator:
                 
                 # 处理成功响应
                 if "trans_result" in result and result["trans_result"]:
-                    translated_text = result["trans_result"][0]["dst"]
-                    if self._debug:
-                        print(format_log(MODULE_BAIDU, f"段落 #{self._paragraph_index} 翻译成功", 'success'))
-                    return {"status": "success", "text": translated_text}
+                    return {"status": "success", "trans_result": result["trans_result"]}
                 
                 # 未找到翻译结果
                 print(format_log(MODULE_BAIDU, "API返回无效的响应", 'error'))
@@ -171,12 +191,110 @@ class BaiduTranslator:
                     return {"status": "error", "message": f"翻译失败: {str(e)}"}
         
         return {"status": "error", "message": "超过最大重试次数"}
+    
+    def _check_credentials(self):
+        """检查是否已配置API密钥"""
+        translate_config = config_store.section("prompt_translate")
+        appid = translate_config.get("appid", "")
+        key = translate_config.get("key", "")
+        if not appid or not key:
+            print(format_log(MODULE_BAIDU, "未配置API密钥", 'error'))
+            return False
+        return True
+    
+    def translate_text(self, text, from_lang="auto", to_lang="auto", retry_count=3):
+        """
+        翻译单个文本片段
+        """
+        if not text.strip():
+            return {"status": "success", "text": ""}
+        
+        if not self._check_credentials():
+            return {"status": "error", "message": "翻译失败：请在设置界面中配置翻译API"}
+        
+        if self._debug:
+            print(format_log(MODULE_BAIDU, f"开始翻译，长度: {len(text)}字符",))
+        
+        result = self._request(text, from_lang, to_lang, retry_count)
+        if result["status"] != "success":
+            return result
+        
+        translated_text = result["trans_result"][0]["dst"]
+        if self._debug:
+            print(format_log(MODULE_BAIDU, f"段落 #{self._paragraph_index} 翻译成功", 'success'))
+        return {"status": "success", "text": translated_text}
+    
+    @classmethod
+    def pack_batches(cls, texts, max_bytes=None):
+        """
+        按字节上限将多个单行文本打包成批
+        返回批次列表，每个批次是 texts 中的下标列表；单条超限的文本独占一批
+        """
+        max_bytes = max_bytes or cls.MAX_QUERY_BYTES
+        batches = []
+        current = []
+        current_bytes = 0
+        for i, text in enumerate(texts):
+            # 每行额外计入一个换行符
+            size = len(text.encode("utf-8")) + 1
+            if current and current_bytes + size > max_bytes:
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(i)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+    
+    def translate_batch(self, texts, from_lang="auto", to_lang="auto", retry_count=3):
+        """
+        批量翻译多个单行文本
+        用换行符合并为一次请求，百度API按行返回 trans_result，按顺序映射回各条文本
+        返回 {"status": "success", "texts": [...]}，译文与输入一一对应
+        """
+        if not texts:
+            return {"status": "success", "texts": []}
+        if len(texts) == 1:
+            result = self.translate_text(texts[0], from_lang=from_lang, to_lang=to_lang, retry_count=retry_count)
+            if result["status"] != "success":
+                return result
+            return {"status": "success", "texts": [result["text"]]}
+        
+        if not self._check_credentials():
+            return {"status": "error", "message": "翻译失败：请在设置界面中配置翻译API"}
+        
+        if self._debug:
+            print(format_log(MODULE_BAIDU, f"开始批量翻译，{len(texts)} 行",))
+        
+        result = self._request("\n".join(texts), from_lang, to_lang, retry_count)
+        if result["status"] != "success":
+            return result
+        
+        translated = [item.get("dst", "") for item in result["trans_result"]]
+        if len(translated) != len(texts):
+            # 返回行数与请求不一致时无法可靠对应，退回逐条翻译
+            print(format_log(MODULE_BAIDU, f"批量结果行数不匹配 ({len(translated)}/{len(texts)})，改为逐条翻译", 'warning'))
+            translated = []
+            for text in texts:
+                single = self.translate_text(text, from_lang=from_lang, to_lang=to_lang, retry_count=retry_count)
+                if single["status"] != "success":
+                    return single
+                translated.append(single["text"])
+        
+        if self._debug:
+            print(format_log(MODULE_BAIDU, f"批量翻译成功，{len(texts)} 行", 'success'))
+        return {"status": "success", "texts": translated}
         
     def set_debug(self, debug=False):
         """设置是否输出详细调试信息"""
         self._debug = debug
         return self
 
+    def get_coalescing_stats(self):
+        """获取请求合并的统计信息"""
+        return self._flights.stats()
+
     def set_paragraph_index(self, index):
         """设置段落索引"""
         self._paragraph_index = index
@@ -194,25 +312,8 @@ class BaiduTranslator:
         """
         try:
             if appid is not None and appkey is not None:
-                # 更新内存中的配置
-                self.config["prompt_translate"]["appid"] = appid
-                self.config["prompt_translate"]["key"] = appkey
-                
-                # 更新配置文件
-                current_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-                config_path = os.path.join(current_path, "config.json")
-                
-                # 读取现有配置
-                with open(config_path, "r", encoding="utf-8") as f:
-                    full_config = json.load(f)
-                
-                # 更新翻译配置部分
-                full_config["prompt_translate"]["appid"] = appid
-                full_config["prompt_translate"]["key"] = appkey
-                
-                # 保存更新后的配置
-                with open(config_path, "w", encoding="utf-8") as f:
-                    json.dump(full_config, f, ensure_ascii=False, indent=2)
+                # 通过共享配置存储保存，其他模块随之生效
+                config_store.save({"prompt_translate": {"appid": appid, "key": appkey}})
                 
                 if self._debug:
                     print(format_log(MODULE_BAIDU, "翻译器配置已更新", 'success'))
@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .colors import MODULE_PROMPT, format_log
+
+class BatchPool:
+    """
+    批次并发线程池（线程安全）
+    所有翻译请求共享同一个线程池以限制对上游的总并发，并发数变化时重建；
+    获取线程池与提交批次在同一把锁内完成，重建时旧线程池不会在提交途中被关闭，
+    已提交的批次在旧线程池中继续执行完毕
+    """
+    
+    def __init__(self, thread_name_prefix="prompt_translate_batch"):
+        self._executor = None
+        self._size = 0
+        self._lock = threading.Lock()
+        self._thread_name_prefix = thread_name_prefix
+    
+    def submit_all(self, fn, items, concurrency, *args):
+        """以 fn(item, *args) 提交所有批次，返回与 items 顺序一致的 future 列表"""
+        with self._lock:
+            if self._executor is None or self._size != concurrency:
+                if self._executor is not None:
+                    # 不取消已排队的批次，旧线程池执行完后自行退出
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=self._thread_name_prefix)
+                self._size = concurrency
+                print(format_log(MODULE_PROMPT, f"批次并发线程池已创建，并发数: {concurrency}"))
+            return [self._executor.submit(fn, item, *args) for item in items]
+    
+    def map_ordered(self, fn, items, concurrency, *args):
+        """
+        并发执行各批次，按 items 的顺序逐个产出结果
+        提前结束（如调用方关闭生成器）时取消尚未开始的批次
+        """
+        futures = self.submit_all(fn, items, concurrency, *args)
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    @property
+    def size(self):
+        """当前线程池的并发数，尚未创建时为 0"""
+        return self._size
+
+# 创建全局批次线程池实例
+batch_pool = BatchPool()
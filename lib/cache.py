@@ -1,16 +1,403 @@
 import json
 import os
-from typing import Dict, Any, Optional
+import re
+import hashlib
+import time
+import unicodedata
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
+from .history import HistoryStore
+from .history_journal import HistoryJournal
+from .janitor import janitor
+
+# 插件根目录
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# NFKC 之外仍需统一的中文标点
+_PUNCT_TABLE = str.maketrans({"。": ".", "、": ",", "“": '"', "”": '"', "‘": "'", "’": "'"})
+_SPACES_RE = re.compile(r"[^\S\n]+")
+_COMMA_RE = re.compile(r" ?, ?")
+_KEY_SEPARATOR = "\x1f"
+
+def normalize_prompt_text(text: str) -> str:
+    """
+    规范化提示词文本，仅用于生成缓存键
+    统一全角/半角字符与标点，合并行内空白，统一逗号两侧空格，去除行首尾空白
+    """
+    text = unicodedata.normalize("NFKC", text).translate(_PUNCT_TABLE)
+    lines = []
+    for line in text.split("\n"):
+        line = _SPACES_RE.sub(" ", line).strip()
+        lines.append(_COMMA_RE.sub(", ", line).rstrip())
+    return "\n".join(lines).strip("\n")
+
+def reverse_direction(from_lang: str, to_lang: str) -> Tuple[str, str]:
+    """
+    返回反向翻译的语言对
+    源语言为 auto 时按目标语言推断（目标为英文则原文视为中文，反之亦然）
+    """
+    if from_lang != "auto":
+        return to_lang, from_lang
+    if to_lang == "en":
+        return "auto", "zh"
+    if to_lang == "zh":
+        return "auto", "en"
+    return "auto", "auto"
+
+def make_translation_key(text: str, from_lang: str = "auto", to_lang: str = "auto", backend: str = "") -> str:
+    """生成翻译缓存键：(规范化文本, 源语言, 目标语言, 翻译后端)"""
+    return _KEY_SEPARATOR.join((backend, from_lang, to_lang, normalize_prompt_text(text)))
+
+def workflow_id(extra_pnginfo: Any) -> str:
+    """
+    从节点执行时附带的 EXTRA_PNGINFO 中取工作流ID（与前端 app.graph.id 相同），取不到时返回空字符串
+    图执行与界面操作用它区分历史记录和增量翻译记录
+    """
+    workflow = extra_pnginfo.get("workflow") if isinstance(extra_pnginfo, dict) else None
+    if isinstance(workflow, dict):
+        return str(workflow.get("id") or "")
+    return ""
+
+class TranslationStore:
+    """
+    基于SQLite（WAL模式）的持久化翻译缓存
+    写入先进入内存队列，由后台线程批量落盘，不拖慢请求路径
+    """
+    
+    def __init__(self, path: str, max_entries: int = 100000, flush_interval: float = 2.0, batch_size: int = 200):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        
+    def _connect(self) -> sqlite3.Connection:
+        """首次访问时才打开数据库"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "source TEXT PRIMARY KEY, target TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_updated ON translations(updated)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def _ensure_writer(self):
+        """启动后台写入线程"""
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._writer_loop, name="prompt_widget_cache_writer", daemon=True)
+            self._writer.start()
+    
+    def _writer_loop(self):
+        """定期或在积压达到批量大小时落盘"""
+        while True:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            self.flush()
+    
+    def get(self, text: str) -> Optional[str]:
+        """查询持久化缓存，尚未落盘的写入同样可见"""
+        with self._pending_lock:
+            if text in self._pending:
+                return self._pending[text]
+        try:
+            with self._db_lock:
+                row = self._connect().execute(
+                    "SELECT target FROM translations WHERE source = ?", (text,)
+                ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            print(f"读取翻译缓存数据库失败: {e}")
+            return None
+    
+    def put(self, text: str, translated_text: str):
+        """加入写入队列"""
+        with self._pending_lock:
+            self._pending[text] = translated_text
+            pending_count = len(self._pending)
+        self._ensure_writer()
+        if pending_count >= self.batch_size:
+            self._flush_event.set()
+    
+    def flush(self):
+        """将队列中的写入批量提交，并按最近更新时间裁剪到容量上限"""
+        with self._pending_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+        now = time.time()
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO translations (source, target, updated) VALUES (?, ?, ?)",
+                    [(source, target, now) for source, target in pending.items()]
+                )
+                if self.max_entries > 0:
+                    count = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                    if count > self.max_entries:
+                        conn.execute(
+                            "DELETE FROM translations WHERE source IN "
+                            "(SELECT source FROM translations ORDER BY updated ASC LIMIT ?)",
+                            (count - self.max_entries,)
+                        )
+                conn.commit()
+        except Exception as e:
+            print(f"写入翻译缓存数据库失败: {e}")
+    
+    def clear(self):
+        """清空持久化缓存"""
+        with self._pending_lock:
+            self._pending = {}
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM translations")
+                conn.commit()
+        except Exception as e:
+            print(f"清空翻译缓存数据库失败: {e}")
+    
+    def close(self):
+        """落盘剩余写入并关闭数据库"""
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class TranslationLRU:
+    """
+    有界的双向翻译缓存
+    按条目数和字符串总字节数双重限制，LRU淘汰，正反两个方向作为一对同时淘汰
+    """
+    
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._pairs: "OrderedDict[int, Tuple[str, str, str, str, int]]" = OrderedDict()
+        self._index: Dict[str, int] = {}
+        self._used: Dict[int, float] = {}  # 每对条目最近一次使用的时间
+        self._next_id = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._pairs)
+    
+    def get(self, key: str) -> Optional[str]:
+        """按任一方向的键查询，命中时刷新为最近使用"""
+        with self._lock:
+            pair_id = self._index.get(key)
+            if pair_id is None:
+                self.misses += 1
+                return None
+            forward_key, forward_value, _, reverse_value, _ = self._pairs[pair_id]
+            self._pairs.move_to_end(pair_id)
+            self._used[pair_id] = time.time()
+            self.hits += 1
+            return forward_value if key == forward_key else reverse_value
+    
+    def put(self, forward_key: str, forward_value: str, reverse_key: str, reverse_value: str):
+        """写入正反两个方向的条目，替换两个键已有的旧条目"""
+        size = sum(len(s.encode("utf-8")) for s in (forward_key, forward_value, reverse_key, reverse_value))
+        with self._lock:
+            for key in (forward_key, reverse_key):
+                pair_id = self._index.get(key)
+                if pair_id is not None:
+                    self._remove(pair_id)
+            pair_id = self._next_id
+            self._next_id += 1
+            self._pairs[pair_id] = (forward_key, forward_value, reverse_key, reverse_value, size)
+            self._index[forward_key] = pair_id
+            self._index[reverse_key] = pair_id
+            self._used[pair_id] = time.time()
+            self._bytes += size
+            self._evict()
+    
+    def _remove(self, pair_id: int):
+        """移除一对条目（调用方持有锁）"""
+        forward_key, _, reverse_key, _, size = self._pairs.pop(pair_id)
+        self._used.pop(pair_id, None)
+        for key in (forward_key, reverse_key):
+            if self._index.get(key) == pair_id:
+                del self._index[key]
+        self._bytes -= size
+    
+    def _evict(self):
+        """淘汰最久未使用的条目直到满足限制（调用方持有锁）"""
+        while self._pairs and (
+            (self.max_entries > 0 and len(self._pairs) > self.max_entries)
+            or (self.max_bytes > 0 and self._bytes > self.max_bytes)
+        ):
+            pair_id = next(iter(self._pairs))
+            self._remove(pair_id)
+            self.evictions += 1
+    
+    def resize(self, max_entries: int, max_bytes: int):
+        """调整容量并立即淘汰超出部分"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+    
+    def clear(self):
+        """清空缓存（保留统计计数）"""
+        with self._lock:
+            self._pairs.clear()
+            self._index.clear()
+            self._used.clear()
+            self._bytes = 0
+    
+    def purge_idle(self, max_age: float) -> int:
+        """清除超过 max_age 秒未使用的条目，返回清除的对数"""
+        cutoff = time.time() - max_age
+        removed = 0
+        with self._lock:
+            # 条目按最近使用排序，遇到未过期的即可停止
+            while self._pairs:
+                pair_id = next(iter(self._pairs))
+                if self._used.get(pair_id, 0) >= cutoff:
+                    break
+                self._remove(pair_id)
+                removed += 1
+        return removed
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回容量与命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._pairs),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class ExpansionCache:
+    """
+    LLM扩写结果缓存
+    键由接口地址、模型、系统提示词、采样参数、原文和种子共同决定，按TTL和条目数限制
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(api_base: str, model: str, system_prompt: str, temperature: Any, max_tokens: Any, text: str, seed: Any = None) -> str:
+        """生成扩写缓存键"""
+        prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+        payload = json.dumps([api_base, model, prompt_hash, temperature, max_tokens, text, seed], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def resize(self, max_entries: int, ttl: float):
+        """调整容量和过期时间"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            self._evict()
+    
+    def get(self, key: str) -> Optional[str]:
+        """获取未过期的扩写结果"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: str):
+        """写入扩写结果"""
+        expires_at = time.time() + self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            self._evict()
+    
+    def _evict(self):
+        """淘汰超出容量的最久未使用条目（调用方持有锁）"""
+        while self.max_entries > 0 and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def purge_expired(self) -> int:
+        """清除已过期条目，返回清除数量"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items() if expires_at and expires_at < now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+    
+    def dump(self) -> Dict[str, Any]:
+        """导出为可序列化的字典"""
+        with self._lock:
+            return {key: [value, expires_at] for key, (value, expires_at) in self._entries.items()}
+    
+    def load(self, data: Dict[str, Any]):
+        """从字典恢复，跳过已过期条目"""
+        now = time.time()
+        with self._lock:
+            for key, entry in data.items():
+                try:
+                    value, expires_at = entry
+                except (TypeError, ValueError):
+                    continue
+                if not expires_at or expires_at >= now:
+                    self._entries[key] = (value, expires_at)
+            self._evict()
 
 class CacheManager:
     """通用缓存管理器，用于管理各种操作的缓存"""
     
-    def __init__(self, cache_dir: str = "cache"):
+    def __init__(self, cache_dir: str = os.path.join(PLUGIN_DIR, "cache")):
         self.cache_dir = cache_dir
+        self._save_lock = threading.Lock()
         self._ensure_cache_dir()
-        self._memory_cache: Dict[str, Any] = {}
-        self._history_cache: Dict[str, Dict] = {}
+        self._memory_cache = TranslationLRU()
+        self._history = HistoryStore()
+        self._history_journal_path: Optional[str] = None
+        self._last_translations: Dict[str, Dict] = {}
+        self._expansion_cache = ExpansionCache()
+        self._expansion_persistent = False
+        self._expansion_loaded = False
+        self._expansion_dirty = False
+        self._expansion_timer: Optional[threading.Timer] = None
+        self._store_options: Dict[str, Any] = {}
+        self._store: Optional[TranslationStore] = None
+        self._store_lock = threading.Lock()
+        # 两级缓存的命中统计：内存未命中后由持久化存储命中的次数，以及两级都未命中的次数
+        self._stats_lock = threading.Lock()
+        self._store_hits = 0
+        self._misses = 0
         
     def _ensure_cache_dir(self):
         """确保缓存目录存在"""
@@ -33,108 +420,282 @@ class CacheManager:
         return {}
     
     def save_cache(self, cache_type: str, data: Dict):
-        """保存缓存到文件"""
+        """原子保存缓存到文件，写入中断时保留原文件"""
         cache_file = self._get_cache_file_path(cache_type)
+        tmp_path = cache_file + ".tmp"
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with self._save_lock:
+                self._ensure_cache_dir()
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, cache_file)
         except Exception as e:
             print(f"保存缓存文件失败: {e}")
     
-    def get_translation_cache(self, text: str) -> Optional[str]:
-        """获取翻译缓存"""
-        return self._memory_cache.get(text)
+    def configure(self, options: Optional[Dict[str, Any]] = None):
+        """
+        配置持久化翻译缓存（对应 config.json 的 cache 部分）
+        persistent: 是否启用，path: 数据库路径，max_entries: 最大条目数，flush_interval: 落盘间隔（秒）
+        memory_entries / memory_bytes: 内存缓存的条目数和字节数上限
+        """
+        options = dict(options or {})
+        self._memory_cache.resize(
+            int(options.get("memory_entries", 5000)),
+            int(options.get("memory_bytes", 16 * 1024 * 1024))
+        )
+        with self._store_lock:
+            if options == self._store_options:
+                return
+            self._store_options = options
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+    
+    def _get_store(self) -> Optional[TranslationStore]:
+        """按需创建持久化存储，未启用时返回 None"""
+        if self._store is not None:
+            return self._store
+        options = self._store_options
+        if not options.get("persistent", True):
+            return None
+        with self._store_lock:
+            if self._store is None:
+                path = options.get("path") or os.path.join(PLUGIN_DIR, "cache", "translation_cache.db")
+                self._store = TranslationStore(
+                    path,
+                    max_entries=int(options.get("max_entries", 100000)),
+                    flush_interval=float(options.get("flush_interval", 2.0))
+                )
+            return self._store
+    
+    def get_translation_cache(self, text: str, from_lang: str = "auto", to_lang: str = "auto", backend: str = "") -> Optional[str]:
+        """
+        获取翻译缓存，内存未命中时回查持久化存储
+        键为 (规范化文本, 源语言, 目标语言, 翻译后端)
+        """
+        key = make_translation_key(text, from_lang, to_lang, backend)
+        result = self._memory_cache.get(key)
+        if result is not None:
+            return result
+        store = self._get_store()
+        if store is not None:
+            result = store.get(key)
+        with self._stats_lock:
+            if result is None:
+                self._misses += 1
+            else:
+                self._store_hits += 1
+        if result is not None:
+            reverse_from, reverse_to = reverse_direction(from_lang, to_lang)
+            self._memory_cache.put(key, result, make_translation_key(result, reverse_from, reverse_to, backend), text)
+        return result
+    
+    def set_translation_cache(self, text: str, translated_text: str, from_lang: str = "auto", to_lang: str = "auto", backend: str = ""):
+        """设置翻译缓存，同时写入反向条目，便于恢复原文"""
+        reverse_from, reverse_to = reverse_direction(from_lang, to_lang)
+        forward_key = make_translation_key(text, from_lang, to_lang, backend)
+        reverse_key = make_translation_key(translated_text, reverse_from, reverse_to, backend)
+        self._memory_cache.put(forward_key, translated_text, reverse_key, text)
+        store = self._get_store()
+        if store is not None:
+            store.put(forward_key, translated_text)
+            store.put(reverse_key, text)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取翻译缓存的容量与命中统计
+        memory_hits / store_hits 分别为内存和持久化存储的命中次数，misses 只计两级都未命中的查询
+        """
+        stats = self._memory_cache.stats()
+        memory_hits = stats.pop("hits")
+        memory_misses = stats.pop("misses")
+        memory_hit_rate = stats.pop("hit_rate")
+        with self._stats_lock:
+            store_hits = self._store_hits
+            misses = self._misses
+        hits = memory_hits + store_hits
+        lookups = hits + misses
+        stats.update({
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_hits": memory_hits,
+            "memory_misses": memory_misses,
+            "memory_hit_rate": memory_hit_rate,
+            "store_hits": store_hits
+        })
+        return stats
+    
+    def flush(self):
+        """将尚未落盘的翻译缓存、历史日志和扩写缓存写入磁盘"""
+        if self._store is not None:
+            self._store.flush()
+        if self._history.journal is not None:
+            self._history.journal.flush()
+        self._save_expansion_cache()
+    
+    def configure_expansion_cache(self, options: Optional[Dict[str, Any]] = None):
+        """
+        配置扩写缓存（对应 config.json 的 llm_expand 部分）
+        cache_size: 最大条目数，cache_ttl: 过期时间（秒），cache_persistent: 是否持久化
+        """
+        options = options or {}
+        self._expansion_cache.resize(int(options.get("cache_size", 256)), float(options.get("cache_ttl", 86400)))
+        self._expansion_persistent = bool(options.get("cache_persistent", False))
+    
+    def _ensure_expansion_loaded(self):
+        """启用持久化时，首次访问才从文件加载"""
+        if self._expansion_persistent and not self._expansion_loaded:
+            self._expansion_loaded = True
+            self._expansion_cache.load(self.load_cache("expansion"))
+    
+    def get_expansion_cache(self, key: str) -> Optional[str]:
+        """获取扩写缓存"""
+        self._ensure_expansion_loaded()
+        return self._expansion_cache.get(key)
+    
+    def set_expansion_cache(self, key: str, expanded_text: str):
+        """设置扩写缓存，启用持久化时延迟批量写入文件"""
+        self._ensure_expansion_loaded()
+        self._expansion_cache.put(key, expanded_text)
+        if self._expansion_persistent:
+            self._expansion_dirty = True
+            if self._expansion_timer is None:
+                self._expansion_timer = threading.Timer(2.0, self._save_expansion_cache)
+                self._expansion_timer.daemon = True
+                self._expansion_timer.start()
+    
+    def _save_expansion_cache(self):
+        """将扩写缓存写入文件"""
+        self._expansion_timer = None
+        if self._expansion_dirty:
+            self._expansion_dirty = False
+            self.save_cache("expansion", self._expansion_cache.dump())
+    
+    def set_last_translation(self, node_id: str, source: str, translated: str, from_lang: str = "auto", to_lang: str = "auto", workflow: str = ""):
+        """记录节点最近一次翻译的原文和译文，用于增量翻译（与历史记录一样按工作流和节点ID区分）"""
+        self._last_translations[self._history_key(node_id, workflow)] = {
+            "source": source,
+            "translated": translated,
+            "from_lang": from_lang,
+            "to_lang": to_lang,
+            "timestamp": time.time()
+        }
+    
+    def get_last_translation(self, node_id: str, workflow: str = "") -> Optional[Dict]:
+        """获取节点最近一次翻译的记录"""
+        return self._last_translations.get(self._history_key(node_id, workflow))
     
-    def set_translation_cache(self, text: str, translated_text: str):
-        """设置翻译缓存"""
-        self._memory_cache[text] = translated_text
-        self._memory_cache[translated_text] = text  # 双向缓存
+    def configure_history(self, options: Optional[Dict[str, Any]] = None):
+        """
+        配置历史记录（对应 config.json 的 history 部分）
+        depth: 每个节点保留的历史条数；max_bytes: 所有节点历史合计的字节上限，0 表示不限
+        persistent: 是否写入历史日志以便重启后恢复，path: 日志目录
+        """
+        options = options or {}
+        self._history.configure(
+            int(options.get("depth", 20)),
+            int(options.get("max_bytes", 32 * 1024 * 1024))
+        )
+        path = None
+        if options.get("persistent", True):
+            path = options.get("path") or os.path.join(PLUGIN_DIR, "cache", "history")
+        if path != self._history_journal_path:
+            if self._history.journal is not None:
+                self._history.journal.flush()
+            self._history_journal_path = path
+            self._history.attach_journal(HistoryJournal(path) if path else None)
     
-    def init_history(self, node_id: str):
+    @staticmethod
+    def _history_key(node_id: str, workflow: str = "") -> str:
+        """历史记录按工作流和节点ID区分，未提供工作流时只用节点ID"""
+        return f"{workflow}{_KEY_SEPARATOR}{node_id}" if workflow else str(node_id)
+    
+    def init_history(self, node_id: str, workflow: str = ""):
         """初始化节点的历史记录"""
-        if node_id not in self._history_cache:
-            self._history_cache[node_id] = {
-                "past": [],
-                "future": [],
-                "current": "",
-                "last_update": datetime.now().isoformat()
-            }
+        self._history.init(self._history_key(node_id, workflow))
     
-    def record_history(self, node_id: str, text: str):
+    def record_history(self, node_id: str, text: str, workflow: str = ""):
         """记录历史"""
-        self.init_history(node_id)
-        history = self._history_cache[node_id]
-        
-        if history["current"] == text:
-            return
-            
-        if text in history["past"]:
-            return
-            
-        history["past"].append(history["current"])
-        history["current"] = text
-        history["future"] = []
-        history["last_update"] = datetime.now().isoformat()
-        
-        # 限制历史记录长度
-        if len(history["past"]) > 20:
-            history["past"].pop(0)
+        self._history.record(self._history_key(node_id, workflow), text)
     
-    def undo(self, node_id: str) -> Optional[str]:
+    def undo(self, node_id: str, workflow: str = "") -> Optional[str]:
         """撤销操作"""
-        history = self._history_cache.get(node_id)
-        if not history or not history["past"]:
-            return None
-            
-        current = history["current"]
-        history["future"].append(current)
-        history["current"] = history["past"].pop()
-        history["last_update"] = datetime.now().isoformat()
-        return history["current"]
+        return self._history.undo(self._history_key(node_id, workflow))
     
-    def redo(self, node_id: str) -> Optional[str]:
+    def redo(self, node_id: str, workflow: str = "") -> Optional[str]:
         """重做操作"""
-        history = self._history_cache.get(node_id)
-        if not history or not history["future"]:
-            return None
-            
-        current = history["current"]
-        history["past"].append(current)
-        history["current"] = history["future"].pop()
-        history["last_update"] = datetime.now().isoformat()
-        return history["current"]
+        return self._history.redo(self._history_key(node_id, workflow))
     
-    def clear_history(self, node_id: str):
+    def clear_history(self, node_id: str, workflow: str = ""):
         """清空历史记录"""
-        if node_id in self._history_cache:
-            self._history_cache[node_id] = {
-                "past": [],
-                "future": [],
-                "current": "",
-                "last_update": datetime.now().isoformat()
-            }
+        self._history.clear(self._history_key(node_id, workflow))
     
-    def get_history(self, node_id: str) -> Dict:
-        """获取历史记录"""
-        return self._history_cache.get(node_id, {
+    def get_history(self, node_id: str, workflow: str = "") -> Dict:
+        """获取历史记录（内存中没有时从历史日志恢复）"""
+        history = self._history.get(self._history_key(node_id, workflow))
+        if history is not None:
+            return history.to_dict()
+        return {
             "past": [],
             "future": [],
             "current": "",
             "last_update": datetime.now().isoformat()
-        })
+        }
     
-    def has_history(self, node_id: str) -> bool:
+    def has_history(self, node_id: str, workflow: str = "") -> bool:
         """检查是否有历史记录"""
-        history = self._history_cache.get(node_id)
-        return bool(history and (history["past"] or history["future"]))
-    
-    def cleanup_old_cache(self, max_age_hours: int = 24):
-        """清理过期的缓存"""
-        current_time = datetime.now()
-        for node_id, history in list(self._history_cache.items()):
-            last_update = datetime.fromisoformat(history["last_update"])
-            if (current_time - last_update).total_seconds() > max_age_hours * 3600:
-                del self._history_cache[node_id]
+        history = self._history.get(self._history_key(node_id, workflow))
+        return bool(history and (history.can_undo() or history.can_redo()))
+    
+    def get_history_stats(self) -> Dict[str, int]:
+        """获取历史记录的节点数与内存占用"""
+        return self._history.stats()
+    
+    def sweep(self, policy: Dict[str, Any]) -> Dict[str, int]:
+        """
+        清理过期数据，由后台维护任务定期调用，返回各项回收的数量
+        policy 为 janitor 配置，各项 max_age 以秒为单位，0 表示不按时间清理
+        """
+        history_nodes, history_bytes = self._history.sweep(
+            float(policy.get("history_max_age", 0)),
+            int(policy.get("history_max_nodes", 0))
+        )
+        journals = 0
+        journal_max_age = float(policy.get("journal_max_age") or 0)
+        if self._history.journal is not None and journal_max_age > 0:
+            journals = self._history.journal.purge(journal_max_age)
+        
+        last_translations = 0
+        state_max_age = float(policy.get("state_max_age", 0))
+        state_max_nodes = int(policy.get("state_max_nodes", 0))
+        cutoff = time.time() - state_max_age
+        ordered = sorted(list(self._last_translations.items()), key=lambda item: item[1]["timestamp"])
+        excess = len(ordered) - state_max_nodes if state_max_nodes > 0 else 0
+        for index, (key, record) in enumerate(ordered):
+            if index < excess or (state_max_age > 0 and record["timestamp"] < cutoff):
+                if self._last_translations.pop(key, None) is not None:
+                    last_translations += 1
+        
+        translation_cache = 0
+        cache_max_age = float(policy.get("cache_max_age") or 0)
+        if cache_max_age > 0:
+            translation_cache = self._memory_cache.purge_idle(cache_max_age)
+        
+        return {
+            "history_nodes": history_nodes,
+            "history_bytes": history_bytes,
+            "history_journals": journals,
+            "last_translations": last_translations,
+            "translation_cache": translation_cache,
+            "expansion_cache": self._expansion_cache.purge_expired()
+        }
 
 # 创建全局缓存管理器实例
-cache_manager = CacheManager() 
\ No newline at end of file
+cache_manager = CacheManager()
+
+# 退出时落盘剩余写入
+atexit.register(cache_manager.flush)
+
+# 由后台维护任务定期清理过期数据
+janitor.register("cache", cache_manager.sweep) 
\ No newline at end of file
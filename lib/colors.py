@@ -24,6 +24,7 @@ class Colors:
 MODULE_BAIDU = f"{Colors.LIGHT_YELLOW}[BaiduTranslator]{Colors.RESET}"
 MODULE_PROMPT = f"{Colors.LIGHT_BLUE}[PromptWidget]{Colors.RESET}"
 MODULE_ROUTE = f"{Colors.PURPLE}[PromptWidget-Route]{Colors.RESET}"
+MODULE_LLM = f"{Colors.CYAN}[LLMClient]{Colors.RESET}"
 
 # 状态颜色函数
 def success(text):
@@ -0,0 +1,127 @@
+import os
+import json
+import copy
+import threading
+from typing import Dict, Any, Callable, List, Optional
+
+# 导入颜色模块
+from .colors import Colors, MODULE_PROMPT, success, error, warning, info, content, format_log
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+DEFAULT_CONFIG = {
+    "prompt_translate": {
+        "appid": "",
+        "key": ""
+    },
+    "llm_expand": {
+        "api_key": "",
+        "api_base": "https://api.openai.com/v1",
+        "model": "gpt-3.5-turbo",
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "system_prompt": "你是一个专业的写作助手，擅长对文本进行扩写和润色。请对用户输入的文本进行扩写，使其更加丰富和生动。"
+    }
+}
+
+class ConfigStore:
+    """
+    config.json 的共享内存副本
+    读取时只检查文件修改时间，文件变化或通过 save 保存后才重新解析，并通知已注册的监听器
+    get 返回的字典由所有调用方共享，只读使用；修改配置请调用 save
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._config: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[int] = None
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+    
+    def _stat_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _load(self) -> Dict[str, Any]:
+        """从文件加载配置，文件不存在时写入默认配置"""
+        if not os.path.exists(self.path):
+            config = copy.deepcopy(DEFAULT_CONFIG)
+            self._write(config)
+            print(format_log(MODULE_PROMPT, f"创建默认配置文件: {self.path}", 'success'))
+            return config
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def _write(self, config: Dict[str, Any]):
+        """原子写入配置文件"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+    
+    def get(self) -> Dict[str, Any]:
+        """获取当前配置，文件修改时间变化时重新加载"""
+        mtime = self._stat_mtime()
+        if self._config is not None and mtime == self._mtime:
+            return self._config
+        with self._lock:
+            mtime = self._stat_mtime()
+            if self._config is None or mtime != self._mtime:
+                try:
+                    config = self._load()
+                except Exception as e:
+                    print(format_log(MODULE_PROMPT, f"加载配置文件失败: {e}", 'error'))
+                    if self._config is not None:
+                        return self._config
+                    config = copy.deepcopy(DEFAULT_CONFIG)
+                self._apply(config)
+            return self._config
+    
+    def section(self, name: str) -> Dict[str, Any]:
+        """获取配置中的某个部分，不存在时返回空字典"""
+        return self.get().get(name) or {}
+    
+    def save(self, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将更新按部分合并到现有配置并写入文件，保留未包含的选项
+        返回合并后的配置
+        """
+        with self._lock:
+            config = copy.deepcopy(self.get())
+            for section, values in updates.items():
+                if isinstance(values, dict) and isinstance(config.get(section), dict):
+                    config[section].update(values)
+                else:
+                    config[section] = values
+            self._write(config)
+            self._apply(config)
+            return config
+    
+    def reload(self) -> Dict[str, Any]:
+        """强制从文件重新加载配置"""
+        with self._lock:
+            self._mtime = None
+            self._config = None
+        return self.get()
+    
+    def _apply(self, config: Dict[str, Any]):
+        """替换内存中的配置并通知监听器"""
+        self._config = config
+        self._mtime = self._stat_mtime()
+        for listener in list(self._listeners):
+            try:
+                listener(config)
+            except Exception as e:
+                print(format_log(MODULE_PROMPT, f"应用配置时出错: {e}", 'error'))
+    
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """注册配置变化的监听器，注册时立即以当前配置调用一次"""
+        config = self.get()
+        with self._lock:
+            self._listeners.append(listener)
+        listener(config)
+
+# 创建全局配置实例
+config_store = ConfigStore(os.path.join(PLUGIN_DIR, "config.json"))
@@ -0,0 +1,477 @@
+import re
+import sys
+import time
+import difflib
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# 每隔多少个版本保存一次完整文本，限制重建某个版本时需要应用的差异数
+SNAPSHOT_INTERVAL = 16
+
+# 差异按标签或分句切分后比较（每段带上其后的分隔符），拼接后与原文完全一致
+_TOKEN_RE = re.compile(r"[^,，。.;；\n]+[,，。.;；\n]?|[,，。.;；\n]")
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    """a、b 公共前缀的长度（二分比较切片，避免逐字符循环）"""
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """a、b 公共后缀的长度，不超过 limit"""
+    low, high = 0, limit
+    la, lb = len(a), len(b)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[la - mid:] == b[lb - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def make_delta(previous: str, text: str) -> tuple:
+    """
+    计算两个版本之间的差异，由整数（相同的字符数）和 (旧片段, 新片段) 组成，可双向还原
+    先去掉公共前后缀，只对中间部分按段比较
+    """
+    limit = min(len(previous), len(text))
+    prefix = _common_prefix(previous, text, limit)
+    suffix = _common_suffix(previous, text, limit - prefix)
+    old_tokens = _TOKEN_RE.findall(previous[prefix:len(previous) - suffix])
+    new_tokens = _TOKEN_RE.findall(text[prefix:len(text) - suffix])
+    
+    delta = [prefix] if prefix else []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append(sum(len(token) for token in old_tokens[i1:i2]))
+        else:
+            delta.append(("".join(old_tokens[i1:i2]), "".join(new_tokens[j1:j2])))
+    if suffix:
+        delta.append(suffix)
+    return tuple(delta)
+
+def _patch(source: str, delta: tuple, forward: bool) -> str:
+    parts = []
+    pos = 0
+    for item in delta:
+        if isinstance(item, int):
+            parts.append(source[pos:pos + item])
+            pos += item
+        else:
+            old, new = item if forward else item[::-1]
+            parts.append(new)
+            pos += len(old)
+    return "".join(parts)
+
+class HistoryEntry:
+    """
+    一个历史版本
+    完整版本保存 text；差异版本 text 为 None，delta 为与上一版本的差异（见 make_delta）
+    """
+    
+    __slots__ = ("text", "delta", "digest", "size")
+    
+    def __init__(self, text: str, digest: int, delta: Optional[tuple] = None):
+        self.text = None if delta is not None else text
+        self.delta = delta
+        self.digest = digest
+        if delta is None:
+            self.size = sys.getsizeof(text)
+        else:
+            self.size = sys.getsizeof(delta) + sum(
+                sys.getsizeof(item) + sys.getsizeof(item[0]) + sys.getsizeof(item[1])
+                if isinstance(item, tuple) else sys.getsizeof(item)
+                for item in delta
+            )
+    
+    @classmethod
+    def full(cls, text: str) -> "HistoryEntry":
+        return cls(text, hash(text))
+    
+    @classmethod
+    def diff(cls, previous: str, text: str) -> "HistoryEntry":
+        """相对上一版本记录差异，差异不比完整文本小时保存完整文本"""
+        delta = make_delta(previous, text)
+        entry = cls(text, hash(text), delta)
+        if entry.size >= sys.getsizeof(text) // 2:
+            return cls.full(text)
+        return entry
+    
+    def forward(self, previous: str) -> str:
+        """由上一版本文本还原本版本"""
+        return _patch(previous, self.delta, True)
+    
+    def backward(self, text: str) -> str:
+        """由本版本文本还原上一版本"""
+        return _patch(text, self.delta, False)
+
+class NodeHistory:
+    """
+    单个节点的撤销/重做历史
+    所有版本按时间顺序存放在 versions 中，cursor 指向当前版本：之前的是 past，之后的是 future
+    版本以相对上一版本的差异保存，每 SNAPSHOT_INTERVAL 个版本保存一次完整文本，只缓存当前版本的完整文本，
+    内存占用随编辑量而非深度与提示词长度的乘积增长
+    按哈希计数维护 past 的成员索引，判断文本是否已在历史中无需逐条还原比较
+    """
+    
+    __slots__ = ("versions", "cursor", "last_update", "_current", "_entries_size", "_digests")
+    
+    def __init__(self):
+        self.versions: deque = deque([HistoryEntry.full("")])
+        self.cursor = 0
+        self.last_update = time.time()
+        self._current = ""
+        self._entries_size = self.versions[0].size
+        self._digests: Dict[int, int] = {}
+    
+    @property
+    def size(self) -> int:
+        """占用的字节数（差异版本为当前版本时，另计缓存的完整文本）"""
+        if self.versions[self.cursor].text is None:
+            return self._entries_size + sys.getsizeof(self._current)
+        return self._entries_size
+    
+    def can_undo(self) -> bool:
+        return self.cursor > 0
+    
+    def can_redo(self) -> bool:
+        return self.cursor < len(self.versions) - 1
+    
+    def current_text(self) -> str:
+        return self._current
+    
+    def _count(self, entry: HistoryEntry, step: int):
+        count = self._digests.get(entry.digest, 0) + step
+        if count:
+            self._digests[entry.digest] = count
+        else:
+            del self._digests[entry.digest]
+    
+    def _text_at(self, index: int) -> str:
+        """还原第 index 个版本：从最近的完整版本（或更近的当前版本）出发，依次应用差异"""
+        versions = self.versions
+        anchor = index
+        while versions[anchor].text is None:
+            anchor -= 1
+        if anchor < self.cursor < index:
+            anchor, text = self.cursor, self._current
+        else:
+            text = versions[anchor].text
+        while anchor < index:
+            anchor += 1
+            text = versions[anchor].forward(text)
+        return text
+    
+    def _texts(self) -> List[str]:
+        """还原所有版本"""
+        texts = []
+        text = ""
+        for entry in self.versions:
+            text = entry.text if entry.text is not None else entry.forward(text)
+            texts.append(text)
+        return texts
+    
+    @staticmethod
+    def _make_entry(previous: Optional[str], text: str, deltas: int) -> HistoryEntry:
+        """连续的差异版本达到间隔时保存完整文本，否则保存差异"""
+        if previous is None or deltas + 1 >= SNAPSHOT_INTERVAL:
+            return HistoryEntry.full(text)
+        return HistoryEntry.diff(previous, text)
+    
+    def trim(self, depth: int):
+        """丢弃超出深度的最早历史，最早的版本始终保存完整文本"""
+        versions = self.versions
+        while self.cursor > depth:
+            second = versions[1]
+            if second.text is None:
+                full = HistoryEntry.full(second.forward(versions[0].text))
+                versions[1] = full
+                self._entries_size += full.size - second.size
+            entry = versions.popleft()
+            self.cursor -= 1
+            self._entries_size -= entry.size
+            self._count(entry, -1)
+    
+    def in_past(self, text: str) -> bool:
+        """文本是否已在 past 中（哈希命中时才还原比较）"""
+        if hash(text) not in self._digests:
+            return False
+        return text in self._texts()[:self.cursor]
+    
+    def record(self, text: str, depth: int) -> int:
+        """记录新文本，返回占用字节数的变化"""
+        before = self.size
+        versions = self.versions
+        while len(versions) - 1 > self.cursor:
+            self._entries_size -= versions.pop().size
+        
+        deltas = 0
+        while versions[-1 - deltas].text is None:
+            deltas += 1
+        entry = self._make_entry(self._current, text, deltas)
+        
+        self._count(versions[self.cursor], 1)
+        versions.append(entry)
+        self.cursor += 1
+        self._current = text
+        self._entries_size += entry.size
+        self.trim(depth)
+        self.last_update = time.time()
+        return self.size - before
+    
+    def undo(self) -> Optional[str]:
+        if not self.cursor:
+            return None
+        current = self.versions[self.cursor]
+        self._current = current.backward(self._current) if current.text is None else self._text_at(self.cursor - 1)
+        self.cursor -= 1
+        self._count(self.versions[self.cursor], -1)
+        self.last_update = time.time()
+        return self._current
+    
+    def redo(self) -> Optional[str]:
+        if not self.can_redo():
+            return None
+        self._count(self.versions[self.cursor], 1)
+        self.cursor += 1
+        entry = self.versions[self.cursor]
+        self._current = entry.text if entry.text is not None else entry.forward(self._current)
+        self.last_update = time.time()
+        return self._current
+    
+    def _load(self, past: List[str], current: str, future: List[str], depth: int):
+        """以完整状态重置历史（future 为重做栈顺序）"""
+        self.versions = deque()
+        self._entries_size = 0
+        previous = None
+        deltas = 0
+        for text in list(past) + [current] + list(reversed(future)):
+            entry = self._make_entry(previous, text, deltas)
+            deltas = 0 if entry.text is not None else deltas + 1
+            self.versions.append(entry)
+            self._entries_size += entry.size
+            previous = text
+        self.cursor = len(past)
+        self._current = current
+        self._digests = {}
+        for index in range(self.cursor):
+            self._count(self.versions[index], 1)
+        self.trim(depth)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """完整状态，作为历史日志压缩后的首条事件"""
+        texts = self._texts()
+        return {
+            "op": "snapshot",
+            "past": texts[:self.cursor],
+            "future": texts[:self.cursor:-1],
+            "current": self._current,
+            "t": self.last_update
+        }
+    
+    def apply(self, event: Dict[str, Any], depth: int) -> bool:
+        """重放一条历史日志事件，返回事件是否生效"""
+        op = event.get("op")
+        if op == "record":
+            text = event.get("text", "")
+            if self._current == text or self.in_past(text):
+                return False
+            self.record(text, depth)
+        elif op == "undo":
+            if self.undo() is None:
+                return False
+        elif op == "redo":
+            if self.redo() is None:
+                return False
+        elif op in ("clear", "snapshot"):
+            self._load(event.get("past", []), event.get("current", ""), event.get("future", []), depth)
+        else:
+            return False
+        self.last_update = event.get("t", self.last_update)
+        return True
+    
+    @classmethod
+    def replay(cls, events: List[Dict[str, Any]], depth: int) -> "NodeHistory":
+        """由历史日志事件重建节点历史"""
+        history = cls()
+        for event in events:
+            history.apply(event, depth)
+        return history
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """兼容旧的字典格式"""
+        texts = self._texts()
+        return {
+            "past": texts[:self.cursor],
+            "future": texts[:self.cursor:-1],
+            "current": self._current,
+            "last_update": datetime.fromtimestamp(self.last_update).isoformat()
+        }
+
+class HistoryStore:
+    """
+    所有节点的历史记录
+    每个节点保留 depth 条历史；所有节点合计超过 max_bytes 时，从最久未更新的节点开始整体淘汰
+    挂接历史日志后，每次变更都追加到日志，内存中没有的节点在首次访问时才从日志恢复
+    """
+    
+    def __init__(self, depth: int = 20, max_bytes: int = 32 * 1024 * 1024):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.journal = None
+        self._nodes: "OrderedDict[str, NodeHistory]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+    
+    def attach_journal(self, journal):
+        """挂接（或以 None 卸下）历史日志，已在内存中的节点不受影响"""
+        with self._lock:
+            self.journal = journal
+            if journal is not None:
+                journal.depth = self.depth
+    
+    def _log(self, key: str, op: str, **fields):
+        if self.journal is not None:
+            fields["op"] = op
+            fields["t"] = self._nodes[key].last_update
+            self.journal.append(key, fields)
+    
+    def _lookup(self, key: str) -> Optional[NodeHistory]:
+        """查找节点历史，内存中没有时从历史日志恢复"""
+        history = self._nodes.get(key)
+        if history is not None or self.journal is None:
+            return history
+        events = self.journal.read(key)
+        if not events:
+            return None
+        history = self._nodes[key] = NodeHistory.replay(events, self.depth)
+        self._bytes += history.size
+        self._enforce_budget(keep=key)
+        return history
+    
+    def configure(self, depth: int, max_bytes: int):
+        """调整每个节点的深度和总字节上限"""
+        with self._lock:
+            self.depth = max(1, depth)
+            self.max_bytes = max_bytes
+            if self.journal is not None:
+                self.journal.depth = self.depth
+            for history in self._nodes.values():
+                history.trim(self.depth)
+            self._bytes = sum(history.size for history in self._nodes.values())
+            self._enforce_budget()
+    
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """超过总字节上限时淘汰最久未更新的节点（不淘汰 keep）"""
+        if self.max_bytes <= 0:
+            return
+        for node_id in list(self._nodes.keys()):
+            if self._bytes <= self.max_bytes:
+                break
+            if node_id == keep:
+                continue
+            self._bytes -= self._nodes.pop(node_id).size
+    
+    def _create(self, node_id: str) -> NodeHistory:
+        history = self._nodes[node_id] = NodeHistory()
+        self._bytes += history.size
+        return history
+    
+    def init(self, node_id: str):
+        with self._lock:
+            if self._lookup(node_id) is None:
+                self._create(node_id)
+    
+    def record(self, node_id: str, text: str):
+        with self._lock:
+            history = self._lookup(node_id)
+            if history is None:
+                history = self._create(node_id)
+            if history.current_text() == text or history.in_past(text):
+                return
+            self._bytes += history.record(text, self.depth)
+            self._nodes.move_to_end(node_id)
+            self._log(node_id, "record", text=text)
+            self._enforce_budget(keep=node_id)
+    
+    def undo(self, node_id: str) -> Optional[str]:
+        with self._lock:
+            history = self._lookup(node_id)
+            if history is None:
+                return None
+            before = history.size
+            text = history.undo()
+            if text is not None:
+                self._bytes += history.size - before
+                self._nodes.move_to_end(node_id)
+                self._log(node_id, "undo")
+            return text
+    
+    def redo(self, node_id: str) -> Optional[str]:
+        with self._lock:
+            history = self._lookup(node_id)
+            if history is None:
+                return None
+            before = history.size
+            text = history.redo()
+            if text is not None:
+                self._bytes += history.size - before
+                self._nodes.move_to_end(node_id)
+                self._log(node_id, "redo")
+            return text
+    
+    def clear(self, node_id: str):
+        with self._lock:
+            history = self._lookup(node_id)
+            if history is not None:
+                self._bytes -= history.size
+                self._create(node_id)
+                self._log(node_id, "clear")
+    
+    def remove(self, node_id: str) -> bool:
+        """从内存中移除节点历史（历史日志保留，之后访问时可再恢复）"""
+        with self._lock:
+            history = self._nodes.pop(node_id, None)
+            if history is None:
+                return False
+            self._bytes -= history.size
+            return True
+    
+    def sweep(self, max_age: float = 0, max_nodes: int = 0) -> Tuple[int, int]:
+        """
+        从内存中移除超过 max_age 秒未更新的节点，max_nodes 大于 0 时再移除超出数量的最久未更新节点
+        返回 (移除的节点数, 释放的字节数)，历史日志保留
+        """
+        cutoff = time.time() - max_age
+        removed = freed = 0
+        with self._lock:
+            ordered = sorted(self._nodes.items(), key=lambda item: item[1].last_update)
+            excess = len(ordered) - max_nodes if max_nodes > 0 else 0
+            for index, (node_id, history) in enumerate(ordered):
+                if index < excess or (max_age > 0 and history.last_update < cutoff):
+                    del self._nodes[node_id]
+                    self._bytes -= history.size
+                    removed += 1
+                    freed += history.size
+        return removed, freed
+    
+    def get(self, node_id: str) -> Optional[NodeHistory]:
+        with self._lock:
+            return self._lookup(node_id)
+    
+    def last_updates(self) -> Dict[str, float]:
+        """各节点的最后更新时间"""
+        with self._lock:
+            return {node_id: history.last_update for node_id, history in self._nodes.items()}
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"nodes": len(self._nodes), "bytes": self._bytes, "max_bytes": self.max_bytes, "depth": self.depth}
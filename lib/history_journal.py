@@ -0,0 +1,129 @@
+import os
+import json
+import hashlib
+import time
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple, Optional
+from .history import NodeHistory
+
+class HistoryJournal:
+    """
+    节点历史的追加式日志，每个节点（工作流 + 节点ID）一个文件，按哈希前两位分目录
+    事件先进入内存队列，由后台线程批量追加；文件行数超过 compact_threshold 时，
+    后台线程将其重放为一条快照并原子替换，启动时不读取任何日志
+    """
+    
+    def __init__(self, directory: str, flush_interval: float = 1.0, compact_threshold: int = 200):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        self.depth = 20  # 压缩时重放使用的历史深度，由 HistoryStore 同步
+        self._pending: List[Tuple[str, str]] = []
+        self._pending_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._lines: Dict[str, int] = {}  # 日志文件路径 -> 行数
+        self._flush_event = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+    
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".jsonl")
+    
+    def _ensure_writer(self):
+        """启动后台写入线程"""
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._writer_loop, name="prompt_widget_history_writer", daemon=True)
+            self._writer.start()
+    
+    def _writer_loop(self):
+        while True:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            self.flush()
+    
+    def append(self, key: str, event: Dict[str, Any]):
+        """加入写入队列"""
+        line = json.dumps(event, ensure_ascii=False)
+        with self._pending_lock:
+            self._pending.append((key, line))
+        self._ensure_writer()
+    
+    def _read_file(self, key: str) -> List[Dict[str, Any]]:
+        path = self._path(key)
+        events = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        continue  # 写入中断留下的残行
+        except FileNotFoundError:
+            pass
+        self._lines[path] = len(events)
+        return events
+    
+    def read(self, key: str) -> List[Dict[str, Any]]:
+        """读取一个节点的全部事件，尚未落盘的事件同样包含在内"""
+        with self._file_lock:
+            events = self._read_file(key)
+            with self._pending_lock:
+                events.extend(json.loads(line) for pending_key, line in self._pending if pending_key == key)
+        return events
+    
+    def flush(self):
+        """将队列中的事件按节点追加到日志文件，并压缩过长的日志"""
+        with self._file_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, []
+            grouped = defaultdict(list)
+            for key, line in pending:
+                grouped[key].append(line)
+            for key, lines in grouped.items():
+                path = self._path(key)
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                    self._lines[path] = self._lines.get(path, 0) + len(lines)
+                    if self._lines[path] > self.compact_threshold:
+                        self._compact(key)
+                except Exception as e:
+                    print(f"写入历史日志失败: {e}")
+    
+    def _compact(self, key: str):
+        """将日志重放为一条快照后原子替换"""
+        snapshot = NodeHistory.replay(self._read_file(key), self.depth).snapshot()
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+        self._lines[path] = 1
+    
+    def purge(self, max_age: float) -> int:
+        """删除超过 max_age 秒未写入的日志文件，返回删除数量"""
+        self.flush()
+        cutoff = time.time() - max_age
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue
+                    # 逐个文件加锁并再次确认，期间有新写入的文件不删除
+                    with self._file_lock:
+                        if os.stat(entry.path).st_mtime < cutoff:
+                            os.remove(entry.path)
+                            self._lines.pop(entry.path, None)
+                            removed += 1
+                except OSError:
+                    continue
+        return removed
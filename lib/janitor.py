@@ -0,0 +1,125 @@
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from .colors import MODULE_PROMPT, format_log
+
+# 默认清理策略，时间均以秒为单位，0 表示不按该项清理
+DEFAULT_POLICY = {
+    "enabled": True,
+    "interval": 600,                  # 两次清理的间隔
+    "history_max_age": 86400,         # 超过该时间未更新的节点历史移出内存（历史日志保留）
+    "history_max_nodes": 0,           # 内存中最多保留的节点历史数
+    "journal_max_age": 30 * 86400,    # 超过该时间未写入的历史日志文件删除，不应小于 history_max_age
+    "state_max_age": 3600,            # 节流记录和增量翻译记录的保留时间
+    "state_max_nodes": 10000,         # 节流记录和增量翻译记录最多保留的节点数
+    "cache_max_age": 7 * 86400        # 内存翻译缓存中超过该时间未使用的条目
+}
+
+class Janitor:
+    """
+    后台维护任务
+    在服务器事件循环上按间隔调度，清理工作在线程池中执行，不占用事件循环和请求路径
+    各模块通过 register 注册清理函数：接收当前策略，返回 {项目: 回收数量}
+    """
+    
+    def __init__(self):
+        self.policy: Dict[str, Any] = dict(DEFAULT_POLICY)
+        self._sweepers: List[Tuple[str, Callable[[Dict[str, Any]], Dict[str, int]]]] = []
+        self._future = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.last_run: Optional[float] = None
+        self.last_report: Dict[str, int] = {}
+        self.totals: Dict[str, int] = {}
+    
+    def register(self, name: str, sweeper: Callable[[Dict[str, Any]], Dict[str, int]]):
+        """注册清理函数，回收数量以 "名称.项目" 汇总"""
+        self._sweepers.append((name, sweeper))
+    
+    def configure(self, options: Optional[Dict[str, Any]] = None):
+        """更新清理策略（对应 config.json 的 janitor 部分），下一次清理时生效"""
+        policy = dict(DEFAULT_POLICY)
+        policy.update(options or {})
+        self.policy = policy
+        # 唤醒等待中的任务，按新的间隔重新计时
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """在给定的事件循环上启动维护任务，重复调用无效"""
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return
+            self._loop = loop
+            self._future = asyncio.run_coroutine_threadsafe(self._run(), loop)
+    
+    def _interval(self) -> float:
+        """当前策略的清理间隔，配置值无效时使用默认值，避免维护任务退出"""
+        try:
+            return max(1.0, float(self.policy.get("interval") or DEFAULT_POLICY["interval"]))
+        except (TypeError, ValueError):
+            print(format_log(MODULE_PROMPT, f"无效的清理间隔: {self.policy.get('interval')!r}，使用默认值", 'warning'))
+            return float(DEFAULT_POLICY["interval"])
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        last = time.monotonic()
+        while True:
+            interval = self._interval()
+            remaining = last + interval - time.monotonic()
+            if remaining > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            last = time.monotonic()
+            if not self.policy.get("enabled", True):
+                continue
+            try:
+                await loop.run_in_executor(None, self.sweep)
+            except Exception as e:
+                print(format_log(MODULE_PROMPT, f"后台清理出错: {e}", 'error'))
+    
+    def sweep(self) -> Dict[str, int]:
+        """执行一次清理，返回并记录各项回收数量"""
+        policy = self.policy
+        started = time.perf_counter()
+        report: Dict[str, int] = {}
+        for name, sweeper in self._sweepers:
+            try:
+                for item, count in sweeper(policy).items():
+                    report[f"{name}.{item}"] = count
+            except Exception as e:
+                print(format_log(MODULE_PROMPT, f"清理 {name} 时出错: {e}", 'error'))
+        
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_report = report
+        for item, count in report.items():
+            self.totals[item] = self.totals.get(item, 0) + count
+        
+        reclaimed = {item: count for item, count in report.items() if count}
+        if reclaimed:
+            elapsed = (time.perf_counter() - started) * 1000
+            summary = "，".join(f"{item}: {count}" for item, count in reclaimed.items())
+            print(format_log(MODULE_PROMPT, f"后台清理完成（{elapsed:.0f}ms）: {summary}", 'info'))
+        return report
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行次数、最近一次和累计的回收数量"""
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_report": self.last_report,
+            "totals": self.totals,
+            "policy": self.policy
+        }
+
+# 全局维护任务实例
+janitor = Janitor()
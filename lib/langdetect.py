@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# 文字类别在查找表中的编码，其余字符为 \x00
+HAN, KANA, HANGUL, LATIN = "\x01", "\x02", "\x03", "\x04"
+
+# 基本多文种平面内各文字的代码点区间
+SCRIPT_RANGES = (
+    (0x0041, 0x005A, LATIN),
+    (0x0061, 0x007A, LATIN),
+    (0x00C0, 0x024F, LATIN),    # 带变音符号的拉丁字母
+    (0x1100, 0x11FF, HANGUL),   # 谚文字母
+    (0x2E80, 0x2FDF, HAN),      # 部首
+    (0x3005, 0x3007, HAN),      # 々〆〇
+    (0x3040, 0x30FF, KANA),     # 平假名、片假名
+    (0x3130, 0x318F, HANGUL),   # 谚文兼容字母
+    (0x31F0, 0x31FF, KANA),     # 片假名音标扩展
+    (0x3400, 0x4DBF, HAN),      # 扩展A
+    (0x4E00, 0x9FFF, HAN),      # 基本区
+    (0xAC00, 0xD7AF, HANGUL),   # 谚文音节
+    (0xF900, 0xFAFF, HAN),      # 兼容汉字
+    (0xFF66, 0xFF9F, KANA),     # 半角片假名
+)
+
+# 扩展B及以后的汉字位于辅助平面，不在查找表中，出现时再单独统计
+_ASTRAL_HAN_RE = re.compile("[\U00020000-\U0003134F]")
+
+def _build_table() -> str:
+    table = ["\x00"] * 0x10000
+    for start, end, script in SCRIPT_RANGES:
+        table[start:end + 1] = [script] * (end - start + 1)
+    return "".join(table)
+
+# 下标为代码点的查找表，str.translate 一次遍历即可把文本映射为类别编码
+_TABLE = _build_table()
+
+class ScriptStats(NamedTuple):
+    """文本中各类文字的字符数"""
+    han: int
+    kana: int
+    hangul: int
+    latin: int
+    length: int  # 文本总长度
+    visible: int  # 去掉首尾空白后的长度
+
+@lru_cache(maxsize=256)
+def script_stats(text: str) -> ScriptStats:
+    """统计各类文字的字符数（按文本缓存，同一文本在多处检测时只计算一次）"""
+    mapped = text.translate(_TABLE)
+    han = mapped.count(HAN)
+    kana = mapped.count(KANA)
+    hangul = mapped.count(HANGUL)
+    latin = mapped.count(LATIN)
+    # 辅助平面的字符不在表中，保持原样
+    astral = len(mapped) - mapped.count("\x00") - han - kana - hangul - latin
+    if astral:
+        han += len(_ASTRAL_HAN_RE.findall(mapped))
+    return ScriptStats(han, kana, hangul, latin, len(text), len(text.strip()))
+
+def is_chinese(text: str, threshold: float = 0.2) -> bool:
+    """汉字占全文的比例是否超过阈值"""
+    stats = script_stats(text)
+    return stats.length > 0 and stats.han / stats.length > threshold
+
+def detect_language(text: str, threshold: float = 0.3) -> str:
+    """
+    判断文本的主要语言，返回 zh / ja / ko / en，空文本返回 unknown
+    含一定比例假名的判为日文，谚文超过阈值的判为韩文，汉字超过阈值的判为中文，其余视为英文
+    """
+    stats = script_stats(text)
+    if stats.visible == 0:
+        return "unknown"
+    cjk = stats.han + stats.kana
+    if stats.kana and cjk / stats.visible > threshold and stats.kana / cjk >= 0.2:
+        return "ja"
+    if stats.hangul / stats.visible > threshold:
+        return "ko"
+    if stats.han / stats.visible > threshold:
+        return "zh"
+    return "en"
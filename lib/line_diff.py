@@ -0,0 +1,66 @@
+import difflib
+from typing import Dict, Any, List, Optional
+
+class LineDiff:
+    """
+    新文本相对上次翻译记录的逐行比对
+    base_lines 为上次的对应文本（同方向为上次原文，反方向为上次译文），target_lines 为与之逐行对应的另一侧；
+    未改动的行按位置复用 target_lines 中的对应行，内容与上次某行相同的行（如调换了顺序）复用该行的对应行，
+    其余行需要翻译
+    """
+    
+    def __init__(self, base_lines: List[str], target_lines: List[str], new_lines: List[str]):
+        self.new_lines = new_lines
+        self._lines: List[Optional[str]] = [None] * len(new_lines)
+        same_content = dict(zip(base_lines, target_lines))
+        matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                self._lines[j1:j2] = target_lines[i1:i2]
+            else:
+                for j in range(j1, j2):
+                    self._lines[j] = same_content.get(new_lines[j])
+        # 需要翻译的行在 new_lines 中的下标
+        self.changed = [j for j, line in enumerate(self._lines) if line is None]
+    
+    @property
+    def reuse_ratio(self) -> float:
+        """可以复用上次结果的行占新文本的比例"""
+        if not self.new_lines:
+            return 1.0
+        return 1.0 - len(self.changed) / len(self.new_lines)
+    
+    def changed_lines(self) -> List[str]:
+        """需要翻译的行"""
+        return [self.new_lines[j] for j in self.changed]
+    
+    def merge(self, translated: List[str]) -> List[str]:
+        """将改动行的译文与复用的行按新文本的顺序拼接，translated 与 changed_lines() 一一对应"""
+        if len(translated) != len(self.changed):
+            raise ValueError(f"译文行数不匹配 ({len(translated)}/{len(self.changed)})")
+        lines = list(self._lines)
+        for j, line in zip(self.changed, translated):
+            lines[j] = line
+        return lines
+
+def make_patch(base_lines: List[str], lines: List[str]) -> Dict[str, Any]:
+    """
+    生成把 base_lines 变为 lines 的行补丁
+    hunks 按位置升序，每项把 base_lines[start:end] 替换为 lines；base_lines 记录基准的行数，供前端校验
+    """
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    hunks = [
+        {"start": i1, "end": i2, "lines": lines[j1:j2]}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"
+    ]
+    return {"base_lines": len(base_lines), "hunks": hunks}
+
+def apply_patch(base_lines: List[str], patch: Dict[str, Any]) -> List[str]:
+    """把行补丁应用到 base_lines，基准行数不符时抛出 ValueError"""
+    if patch["base_lines"] != len(base_lines):
+        raise ValueError(f"补丁基准行数不匹配 ({patch['base_lines']}/{len(base_lines)})")
+    lines = list(base_lines)
+    # 从后往前替换，前面的位置不受影响
+    for hunk in reversed(patch["hunks"]):
+        lines[hunk["start"]:hunk["end"]] = hunk["lines"]
+    return lines
@@ -0,0 +1,124 @@
+import json
+import asyncio
+import aiohttp
+
+# 导入颜色模块
+from .colors import Colors, MODULE_LLM, success, error, warning, info, content, format_log
+
+class LLMClient:
+    """
+    大模型API的共享异步HTTP客户端
+    所有扩写请求复用同一个带连接池的会话，保持长连接，避免每次请求重新握手
+    """
+
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_KEEPALIVE_TIMEOUT = 30
+
+    def __init__(self):
+        self._session = None
+        self._loop = None
+        self._pool_size = self.DEFAULT_POOL_SIZE
+        self._keepalive_timeout = self.DEFAULT_KEEPALIVE_TIMEOUT
+        self._debug = False
+
+    def set_debug(self, debug=False):
+        """设置是否输出详细调试信息"""
+        self._debug = debug
+        return self
+
+    def configure(self, pool_size=None, keepalive_timeout=None):
+        """
+        更新连接池配置
+        配置变化时，下次请求会以新参数重建会话
+        """
+        try:
+            pool_size = max(1, int(pool_size)) if pool_size is not None else self._pool_size
+            keepalive_timeout = float(keepalive_timeout) if keepalive_timeout is not None else self._keepalive_timeout
+        except (TypeError, ValueError):
+            print(format_log(MODULE_LLM, "连接池配置无效，使用默认值", 'warning'))
+            return self
+
+        if pool_size != self._pool_size or keepalive_timeout != self._keepalive_timeout:
+            self._pool_size = pool_size
+            self._keepalive_timeout = keepalive_timeout
+            self._retire_session()
+        return self
+
+    def _retire_session(self):
+        """关闭当前会话（在其所属事件循环上），下次请求时重建"""
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if session is None or session.closed:
+            return
+        try:
+            if loop is not None and loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+        except Exception as e:
+            print(format_log(MODULE_LLM, f"关闭旧会话时出错: {str(e)}", 'error'))
+
+    def _get_session(self):
+        """获取当前事件循环上的共享会话，不存在时创建"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                keepalive_timeout=self._keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+            if self._debug:
+                print(format_log(MODULE_LLM, f"创建连接池，大小: {self._pool_size}，保活: {self._keepalive_timeout}秒", 'info'))
+        return self._session
+
+    async def post_json(self, url, headers=None, payload=None, timeout=30):
+        """发送JSON请求并返回解析后的JSON响应"""
+        session = self._get_session()
+        async with session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def stream_sse(self, url, headers=None, payload=None, timeout=30):
+        """
+        发送流式请求，逐个产出服务端事件（SSE）中的JSON数据
+        timeout 为连接和两次读取之间的最长等待，不限制总时长，长输出不会超时
+        服务端未按流式返回普通JSON时，整体作为一个数据块产出
+        """
+        session = self._get_session()
+        async with session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        ) as response:
+            response.raise_for_status()
+            if response.content_type == "application/json":
+                yield await response.json(content_type=None)
+                return
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8", errors="replace").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    yield json.loads(data)
+                except ValueError:
+                    if self._debug:
+                        print(format_log(MODULE_LLM, f"无法解析的流式数据: {data[:100]}", 'warning'))
+    
+    async def close(self):
+        """关闭共享会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+# 创建全局客户端实例
+llm_client = LLMClient()
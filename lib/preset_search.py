@@ -0,0 +1,172 @@
+from collections import defaultdict
+from itertools import compress, repeat
+from operator import contains
+from typing import Dict, Any, List, Optional, Set
+
+SEARCH_FIELDS = ("content", "note", "type")
+
+# 拼接各字段时使用的分隔符，查询词不含该字符，因此不会跨字段匹配
+FIELD_SEPARATOR = "\x00"
+
+def _haystack(preset: Dict[str, Any]) -> str:
+    """拼接预设的可搜索字段并统一大小写"""
+    return FIELD_SEPARATOR.join(str(preset.get(name) or "") for name in SEARCH_FIELDS).casefold()
+
+def build_haystacks(presets: List[Dict[str, Any]]) -> List[str]:
+    """预先拼接每个预设的可搜索文本，与 presets 一一对应，供 scan 和 PresetIndex.rebuild 复用"""
+    return [_haystack(preset) for preset in presets]
+
+def _grams(text: str) -> Set[str]:
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+def _substrings(gram: str) -> Set[str]:
+    """三元组中的单字和双字子串"""
+    return {gram[0], gram[1], gram[2], gram[:2], gram[1:]}
+
+def _parse_terms(query: str) -> List[str]:
+    return [term.casefold() for term in query.split()]
+
+def scan(presets: List[Dict[str, Any]], query: str = "", preset_type: Optional[str] = None,
+         haystacks: Optional[List[str]] = None) -> Optional[Set[str]]:
+    """
+    不使用索引逐条匹配，返回值与 PresetIndex.match 相同，用于索引建立完成之前
+    haystacks 为与 presets 一一对应的预先拼接好的小写文本，省略时逐条计算
+    """
+    terms = _parse_terms(query)
+    if not terms and not preset_type:
+        return None
+    if haystacks is None:
+        haystacks = map(_haystack, presets)
+    return {
+        preset["id"] for preset, haystack in zip(presets, haystacks)
+        if (not preset_type or (preset.get("type") or "") == preset_type)
+        and all(term in haystack for term in terms)
+    }
+
+class PresetIndex:
+    """
+    预设的三元组倒排索引
+    对 content、note、type 按字符切分三元组（中英文通用），查询时取各三元组的倒排表求交集，
+    长于三个字符的查询词再用子串匹配确认。各字段之间有分隔符，任何字符都落在某个三元组内，
+    不足三个字符的查询词取包含它的所有三元组的倒排表并集，结果同样精确。索引随单条修改增量更新
+    """
+    
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._subgrams: Dict[str, Set[str]] = defaultdict(set)  # 单字/双字 -> 包含它的三元组
+        self._types: Dict[str, Set[str]] = defaultdict(set)
+        self._haystacks: Dict[str, str] = {}  # 预设ID -> 拼接后的小写文本
+        self._doc_types: Dict[str, str] = {}  # 预设ID -> 类型
+    
+    def rebuild(self, presets: List[Dict[str, Any]], haystacks: Optional[List[str]] = None):
+        """根据完整的预设列表重建索引，haystacks 为预先拼接好的小写文本（可省略）"""
+        self._postings = defaultdict(set)
+        self._subgrams = defaultdict(set)
+        self._types = defaultdict(set)
+        self._haystacks = {}
+        self._doc_types = {}
+        if haystacks is None:
+            haystacks = map(_haystack, presets)
+        for preset, haystack in zip(presets, haystacks):
+            self.add(preset, haystack)
+    
+    def add(self, preset: Dict[str, Any], haystack: Optional[str] = None):
+        """添加或更新一个预设的索引"""
+        preset_id = preset["id"]
+        if preset_id in self._haystacks:
+            self.remove(preset_id)
+        if haystack is None:
+            haystack = _haystack(preset)
+        preset_type = preset.get("type") or ""
+        self._haystacks[preset_id] = haystack
+        self._doc_types[preset_id] = preset_type
+        postings = self._postings
+        for gram in _grams(haystack):
+            ids = postings.get(gram)
+            if ids is None:
+                ids = postings[gram] = set()
+                for sub in _substrings(gram):
+                    self._subgrams[sub].add(gram)
+            ids.add(preset_id)
+        self._types[preset_type].add(preset_id)
+    
+    def remove(self, preset_id: str):
+        """移除一个预设的索引"""
+        haystack = self._haystacks.pop(preset_id, None)
+        if haystack is None:
+            return
+        preset_type = self._doc_types.pop(preset_id)
+        for gram in _grams(haystack):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(preset_id)
+                if not postings:
+                    del self._postings[gram]
+                    for sub in _substrings(gram):
+                        grams = self._subgrams.get(sub)
+                        if grams is not None:
+                            grams.discard(gram)
+                            if not grams:
+                                del self._subgrams[sub]
+        ids = self._types.get(preset_type)
+        if ids is not None:
+            ids.discard(preset_id)
+            if not ids:
+                del self._types[preset_type]
+    
+    def types(self) -> List[str]:
+        """所有出现过的预设类型"""
+        return list(self._types.keys())
+    
+    def _short_term_ids(self, term: str) -> Optional[Set[str]]:
+        """
+        不足三个字符的查询词：包含它的三元组的倒排表并集
+        并集规模接近全部预设时（如单个常见字母）返回 None，由调用方逐条匹配
+        """
+        postings = [self._postings[gram] for gram in self._subgrams.get(term, ())]
+        if sum(map(len, postings)) > len(self._haystacks):
+            return None
+        return set().union(*postings)
+    
+    def match(self, query: str = "", preset_type: Optional[str] = None) -> Optional[Set[str]]:
+        """
+        返回匹配的预设ID集合；查询按空白分词，各词都需命中（子串匹配，不区分大小写）
+        没有任何筛选条件时返回 None，表示全部预设
+        """
+        terms = _parse_terms(query)
+        if not terms and not preset_type:
+            return None
+        
+        # 参与求交集的集合：类型、各三元组的倒排表、短词的倒排表并集；需要逐条确认的词
+        sets = []
+        verify = []
+        if preset_type:
+            sets.append(self._types.get(preset_type, ()))
+        for term in dict.fromkeys(terms):
+            if len(term) >= 3:
+                sets.extend(self._postings.get(gram, ()) for gram in _grams(term))
+                if len(term) > 3:
+                    verify.append(term)
+            else:
+                ids = self._short_term_ids(term)
+                if ids is None:
+                    verify.append(term)
+                else:
+                    sets.append(ids)
+        
+        # 从最小的集合出发逐个检查其余集合的成员，不复制集合
+        haystacks = self._haystacks
+        if not sets:
+            # 没有可用的倒排表（如单个常见字母），先用第一个词按文本逐条匹配
+            term, verify = verify[0], verify[1:]
+            candidates = list(compress(haystacks.keys(), map(contains, haystacks.values(), repeat(term))))
+        else:
+            sets.sort(key=len)
+            candidates = iter(sets[0])
+            for ids in sets[1:]:
+                candidates = filter(ids.__contains__, candidates)
+        if verify:
+            candidates = list(candidates)
+            for term in verify:
+                candidates = list(compress(candidates, map(contains, map(haystacks.__getitem__, candidates), repeat(term))))
+        return set(candidates)
@@ -0,0 +1,462 @@
+import os
+import json
+import gzip
+import time
+import uuid
+import hashlib
+import itertools
+import threading
+from email.utils import formatdate
+from typing import Dict, Any, List, Optional, NamedTuple
+
+# 导入颜色模块
+from .colors import Colors, MODULE_PROMPT, success, error, warning, info, content, format_log
+from .preset_search import PresetIndex, scan, build_haystacks
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# 小于该字节数的响应不压缩
+GZIP_MIN_BYTES = 1024
+
+# 日志累积到该操作数后合并回预设文件
+COMPACT_OPS = 500
+
+# 搜索结果每页最多条数
+MAX_SEARCH_LIMIT = 500
+
+# 匹配数超过该值时按列表顺序扫描分页，否则按位置取最小的若干个
+SCAN_THRESHOLD = 2000
+
+# 可通过 update 操作修改的字段
+PRESET_FIELDS = ("type", "content", "note", "color_type")
+
+def new_preset_id() -> str:
+    """生成预设ID"""
+    return uuid.uuid4().hex[:12]
+
+def legacy_preset_id(index: int, preset: Dict[str, Any]) -> str:
+    """旧版预设没有ID，按位置和内容派生，文件不变时每次加载得到相同的ID"""
+    key = "\x1f".join([str(index)] + [str(preset.get(field, "")) for field in PRESET_FIELDS])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+def _digest(raw: bytes) -> str:
+    """预设文件内容的摘要，用于确认操作日志与文件对应"""
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+class PresetSnapshot(NamedTuple):
+    """预设列表的预序列化响应"""
+    body: bytes
+    gzip_body: Optional[bytes]
+    etag: str
+    last_modified: str
+    count: int
+
+class PresetStore:
+    """
+    预设列表的内存副本
+    文件修改时间变化时才重新解析；响应体预先序列化（可选gzip压缩）并带ETag，保存后失效
+    
+    单条修改（添加/更新/删除/移动）以操作日志追加写入，开销与修改量成正比；
+    日志累积到一定数量后合并进预设文件（先写临时文件再原子替换）。
+    每条日志记录其所基于的预设文件内容的摘要 base；文件被外部替换（git pull、手动覆盖）或合并中途崩溃时，
+    旧日志按预设ID重放到新文件上（已存在的新增跳过，找不到的ID忽略），随即合并，日志中不会留下未合并的用户修改
+    """
+    
+    def __init__(self, path: str, compact_ops: int = COMPACT_OPS):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.compact_ops = compact_ops
+        self._lock = threading.RLock()
+        self._presets: Optional[List[Dict[str, Any]]] = None
+        self._mtime: Optional[int] = None
+        self._modified_at = 0.0
+        self._snapshot: Optional[PresetSnapshot] = None
+        self._seq = 0  # 最后一条操作的序号
+        self._base: Optional[str] = None  # 当前预设文件内容的摘要，日志只对该文件有效
+        self._journal_ops = 0  # 日志中尚未合并的操作数
+        self._index: Optional[PresetIndex] = None  # 搜索索引，首次搜索时在后台建立
+        self._index_backlog: Optional[list] = None  # 索引建立期间发生的修改，建好后补上
+        self._index_generation = 0  # 整体替换预设时递增，丢弃过期的后台建立结果
+        self._positions: Optional[Dict[str, int]] = None  # 预设ID -> 列表位置
+        self._ids: Optional[List[str]] = None  # 按列表顺序的预设ID
+        self._scan_haystacks: Optional[tuple] = None  # 索引建立期间逐条匹配用的 (预设列表, 预先拼接的文本)
+        self._last_search: Optional[list] = None  # 上次搜索 [查询键, 匹配集合, 已按列表顺序找到的位置, 已扫描到的位置]
+    
+    def _stat_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _ensure_loaded(self) -> bool:
+        """文件有变化时重新加载，文件不存在时返回 False"""
+        mtime = self._stat_mtime()
+        if mtime is None:
+            self._presets = None
+            self._mtime = None
+            self._invalidate(reindex=True)
+            return False
+        if self._presets is None or mtime != self._mtime:
+            self._load()
+        return True
+    
+    def _load(self):
+        """加载预设文件并重放未合并的操作日志"""
+        mtime = self._stat_mtime()
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw.decode("utf-8"))
+        presets = data.get("presets", [])
+        
+        # 旧版预设没有ID，派生固定的ID，不写回文件，日志中的ID在重启后仍然有效；首次合并日志时随列表写入
+        for i, preset in enumerate(presets):
+            if not preset.get("id"):
+                preset["id"] = legacy_preset_id(i, preset)
+        
+        self._presets = presets
+        self._base = _digest(raw)
+        self._journal_ops = 0
+        self._mtime = mtime
+        self._modified_at = self._mtime / 1e9
+        self._invalidate(reindex=True)
+        
+        entries = self._read_journal()
+        stale = sum(1 for entry in entries if entry.get("base") != self._base)
+        if stale:
+            # 日志基于其他版本的预设文件，按ID而不是位置重放，保留用户的修改
+            print(format_log(MODULE_PROMPT, f"预设文件已被替换，按预设ID重放 {stale} 条旧的预设操作日志", 'warning'))
+        for entry in entries:
+            try:
+                # 合并中途崩溃时新文件已包含日志中添加的预设，不再重复添加
+                if entry.get("base") == self._base or not self._already_added(entry):
+                    self._apply(self._presets, entry)
+            except (KeyError, ValueError, TypeError) as e:
+                print(format_log(MODULE_PROMPT, f"跳过无效的预设操作日志 #{entry.get('seq')}: {e}", 'warning'))
+            self._seq = entry["seq"]
+            self._journal_ops += 1
+        
+        # 重放了旧日志时立即合并，使日志重新与文件对应
+        if stale or self._journal_ops >= self.compact_ops:
+            self.compact()
+    
+    def _already_added(self, entry: Dict[str, Any]) -> bool:
+        """add 操作的预设ID是否已在当前列表中"""
+        if entry.get("op") != "add":
+            return False
+        preset_id = entry["preset"].get("id")
+        return any(preset.get("id") == preset_id for preset in self._presets)
+    
+    def _invalidate(self, reindex: bool = False):
+        """列表变化后使预序列化响应和位置表失效，整体替换时同时丢弃搜索索引"""
+        self._snapshot = None
+        self._positions = None
+        self._ids = None
+        self._last_search = None
+        if reindex:
+            self._index = None
+            self._index_backlog = None
+            self._index_generation += 1
+    
+    def _start_index_build(self):
+        """在后台线程建立搜索索引，大型预设库建立期间搜索退回逐条匹配"""
+        if self._index is not None or self._index_backlog is not None:
+            return
+        self._index_backlog = []
+        # 可搜索文本只拼接一次，建立期间的逐条匹配和后台建立共用
+        presets = self._presets
+        haystacks = build_haystacks(presets)
+        self._scan_haystacks = (presets, haystacks)
+        threading.Thread(
+            target=self._build_index,
+            args=(list(presets), haystacks, self._index_generation),
+            name="preset_index",
+            daemon=True
+        ).start()
+    
+    def _build_index(self, presets: List[Dict[str, Any]], haystacks: List[str], generation: int):
+        index = PresetIndex()
+        index.rebuild(presets, haystacks)
+        with self._lock:
+            if generation != self._index_generation:
+                return
+            self._index = index
+            self._scan_haystacks = None
+            self._update_index(self._index_backlog)
+            self._index_backlog = None
+    
+    def _update_index(self, changes: list):
+        """将 (操作, 新预设) 列表增量应用到搜索索引"""
+        for entry, preset in changes:
+            if entry["op"] == "delete":
+                self._index.remove(entry["id"])
+            elif preset is not None:
+                self._index.add(preset)
+    
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        """读取操作日志，忽略写入中断造成的不完整行"""
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(format_log(MODULE_PROMPT, "预设操作日志末尾不完整，已忽略", 'warning'))
+                    break
+        return entries
+    
+    def _append_journal(self, entries: List[Dict[str, Any]]):
+        """追加写入操作日志并落盘"""
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _write_atomic(self, presets: List[Dict[str, Any]]) -> str:
+        """先写临时文件再原子替换预设文件，返回新文件内容的摘要"""
+        raw = json.dumps({"presets": presets}, ensure_ascii=False, indent=2).encode("utf-8")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return _digest(raw)
+    
+    @staticmethod
+    def _index_of(presets: List[Dict[str, Any]], preset_id: str) -> int:
+        for i, preset in enumerate(presets):
+            if preset.get("id") == preset_id:
+                return i
+        raise KeyError(f"预设不存在: {preset_id}")
+    
+    @staticmethod
+    def _clamp_index(index: Any, length: int) -> int:
+        if index is None:
+            return length
+        return max(0, min(int(index), length))
+    
+    def _apply(self, presets: List[Dict[str, Any]], entry: Dict[str, Any]):
+        """
+        将一条操作应用到预设列表（日志中的操作已带有确定的ID）
+        add/update 返回新的预设对象，其他操作返回 None
+        """
+        op = entry.get("op")
+        if op == "add":
+            preset = dict(entry["preset"])
+            presets.insert(self._clamp_index(entry.get("index"), len(presets)), preset)
+            return preset
+        elif op == "update":
+            i = self._index_of(presets, entry["id"])
+            updated = dict(presets[i])
+            updated.update({k: v for k, v in entry["fields"].items() if k in PRESET_FIELDS})
+            presets[i] = updated
+            return updated
+        elif op == "delete":
+            del presets[self._index_of(presets, entry["id"])]
+        elif op == "move":
+            preset = presets.pop(self._index_of(presets, entry["id"]))
+            presets.insert(self._clamp_index(entry.get("index"), len(presets)), preset)
+        else:
+            raise ValueError(f"未知的预设操作: {op}")
+        return None
+    
+    def _normalize_op(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        """校验前端提交的操作，补齐新预设的ID，返回写入日志的形式"""
+        kind = op.get("op")
+        if kind == "add":
+            preset = op.get("preset")
+            if not isinstance(preset, dict) or not str(preset.get("content", "")).strip():
+                raise ValueError("添加预设需要非空的 content")
+            preset = {k: preset[k] for k in PRESET_FIELDS if k in preset}
+            preset["id"] = new_preset_id()
+            return {"op": "add", "preset": preset, "index": op.get("index")}
+        if kind == "update":
+            fields = op.get("fields")
+            if not isinstance(fields, dict):
+                raise ValueError("更新预设需要 fields")
+            return {"op": "update", "id": op.get("id"), "fields": {k: v for k, v in fields.items() if k in PRESET_FIELDS}}
+        if kind == "delete":
+            return {"op": "delete", "id": op.get("id")}
+        if kind == "move":
+            if op.get("index") is None:
+                raise ValueError("移动预设需要 index")
+            return {"op": "move", "id": op.get("id"), "index": int(op["index"])}
+        raise ValueError(f"未知的预设操作: {kind}")
+    
+    def exists(self) -> bool:
+        """预设文件是否存在"""
+        with self._lock:
+            return self._ensure_loaded()
+    
+    def get_presets(self) -> List[Dict[str, Any]]:
+        """获取预设列表（共享对象，只读使用），文件不存在时返回空列表"""
+        with self._lock:
+            if not self._ensure_loaded():
+                return []
+            return self._presets
+    
+    def snapshot(self) -> Optional[PresetSnapshot]:
+        """获取预序列化的响应，文件不存在时返回 None"""
+        with self._lock:
+            if not self._ensure_loaded():
+                return None
+            if self._snapshot is None:
+                body = json.dumps({"presets": self._presets}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                gzip_body = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+                etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+                self._snapshot = PresetSnapshot(
+                    body=body,
+                    gzip_body=gzip_body,
+                    etag=etag,
+                    last_modified=formatdate(self._modified_at, usegmt=True),
+                    count=len(self._presets)
+                )
+            return self._snapshot
+    
+    def apply_ops(self, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量应用预设操作（add/update/delete/move），全部成功才生效
+        返回每条操作的结果，add 操作包含新预设的ID
+        """
+        with self._lock:
+            if not self._ensure_loaded():
+                raise FileNotFoundError("预设文件不存在")
+            
+            presets = list(self._presets)
+            entries = []
+            changes = []
+            results = []
+            seq = self._seq
+            for op in ops:
+                entry = self._normalize_op(op)
+                changes.append((entry, self._apply(presets, entry)))
+                seq += 1
+                entry["seq"] = seq
+                entry["base"] = self._base
+                entries.append(entry)
+                results.append({"id": entry["preset"]["id"]} if entry["op"] == "add" else {"id": entry["id"]})
+            
+            if entries:
+                self._append_journal(entries)
+                self._presets = presets
+                self._seq = seq
+                self._journal_ops += len(entries)
+                self._modified_at = time.time()
+                self._invalidate()
+                # 搜索索引只更新改动的预设
+                if self._index is not None:
+                    self._update_index(changes)
+                elif self._index_backlog is not None:
+                    self._index_backlog.extend(changes)
+                if self._journal_ops >= self.compact_ops:
+                    self.compact()
+            return results
+    
+    def compact(self):
+        """将操作日志合并进预设文件，并清空日志"""
+        with self._lock:
+            if self._presets is None:
+                return
+            self._base = self._write_atomic(self._presets)
+            self._mtime = self._stat_mtime()
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_ops = 0
+    
+    def replace(self, presets: List[Dict[str, Any]]):
+        """用新的预设列表覆盖文件并使缓存的响应失效"""
+        with self._lock:
+            for preset in presets:
+                if not preset.get("id"):
+                    preset["id"] = new_preset_id()
+            self._presets = presets
+            self._modified_at = time.time()
+            self._invalidate(reindex=True)
+            self.compact()
+    
+    def search_ready(self) -> bool:
+        """搜索索引已建立且预设文件未变化，此时搜索只访问内存，可以直接在事件循环中执行"""
+        with self._lock:
+            return self._index is not None and self._presets is not None and self._stat_mtime() == self._mtime
+    
+    def _match(self, query: str, preset_type: Optional[str]):
+        """匹配的预设ID集合（None 表示全部），索引建立期间逐条匹配"""
+        if self._index is None:
+            self._start_index_build()
+            source, haystacks = self._scan_haystacks or (None, None)
+            if source is not self._presets:
+                # 建立期间列表已被修改，预先拼接的文本不再对应
+                haystacks = None
+            matched = scan(self._presets, query, preset_type, haystacks)
+            types = list(dict.fromkeys(preset.get("type") or "" for preset in self._presets))
+        else:
+            matched = self._index.match(query, preset_type)
+            types = self._index.types()
+        return matched, types
+    
+    def search(self, query: str = "", preset_type: Optional[str] = None, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """
+        按子串搜索 content/note/type（不区分大小写，空格分隔的多个词需同时命中），可按类型筛选
+        结果按预设列表顺序分页返回，每条附带其在完整列表中的位置 index
+        同一查询的后续分页沿用上次的匹配结果，从上次停下的位置继续按列表顺序查找
+        """
+        offset = max(0, int(offset))
+        limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+        query = query or ""
+        with self._lock:
+            if not self._ensure_loaded():
+                return {"total": 0, "offset": offset, "limit": limit, "items": [], "types": []}
+            
+            key = (query, preset_type or None)
+            cached = self._last_search
+            if cached is None or cached[0] != key:
+                matched, types = self._match(query, preset_type)
+                cached = [key, matched, types, [], 0]
+                # 索引建立期间每次都重新匹配，不缓存
+                if self._index is not None:
+                    self._last_search = cached
+            _, matched, types, found, scanned = cached
+            
+            end = offset + limit
+            if matched is None:
+                total = len(self._presets)
+                positions = range(offset, min(end, total))
+            else:
+                total = len(matched)
+                presets = self._presets
+                if len(found) < end and scanned < len(presets):
+                    if total <= SCAN_THRESHOLD:
+                        # 结果较少时一次求出全部位置并排序
+                        if self._positions is None:
+                            self._positions = {preset["id"]: i for i, preset in enumerate(presets)}
+                        found[:] = sorted(map(self._positions.__getitem__, matched))
+                        scanned = len(presets)
+                    else:
+                        # 结果较多时从上次停下的位置按列表顺序扫描，取够当前页即停止
+                        if self._ids is None:
+                            self._ids = [preset["id"] for preset in presets]
+                        hits = itertools.compress(
+                            range(scanned, len(presets)),
+                            map(matched.__contains__, itertools.islice(self._ids, scanned, None))
+                        )
+                        found.extend(itertools.islice(hits, end - len(found)))
+                        scanned = found[-1] + 1 if len(found) >= end else len(presets)
+                    cached[4] = scanned
+                positions = found[offset:end]
+            
+            return {
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "items": [dict(self._presets[i], index=i) for i in positions],
+                "types": types
+            }
+
+# 创建全局预设存储实例
+preset_store = PresetStore(os.path.join(PLUGIN_DIR, "Prompt_Preset_List.json"))
@@ -0,0 +1,70 @@
+import time
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+class ProgressEmitter:
+    """
+    合并同一节点的进度事件，每个节点每秒最多发送 rate 次
+    间隔内的更新只保留最新一条，到期后补发；结束事件（成功或失败）总是立即发送，并丢弃尚未发送的进度
+    send(data, sid) 为实际发送事件的函数，sid 为目标客户端（None 表示广播）；rate 不大于 0 时不合并
+    """
+    
+    def __init__(self, send: Callable[[Dict[str, Any], Optional[str]], None], rate: float = 5.0):
+        self.send = send
+        self.rate = rate
+        self._last_sent: Dict[str, float] = {}
+        self._pending: Dict[str, Tuple[Dict[str, Any], Optional[str]]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.coalesced = 0
+    
+    def _send(self, data: Dict[str, Any], sid: Optional[str]):
+        """发送事件（调用方持有锁，保证同一节点的事件按顺序发出）"""
+        self.send(data, sid)
+        self.sent += 1
+    
+    def progress(self, node_id: str, data: Dict[str, Any], sid: Optional[str] = None):
+        """发送进度事件，距上次发送不足 1/rate 秒时合并，到期后发送最新一条"""
+        with self._lock:
+            if self.rate <= 0:
+                self._send(data, sid)
+                return
+            now = time.monotonic()
+            wait = self._last_sent.get(node_id, 0.0) + 1.0 / self.rate - now
+            if wait > 0:
+                if node_id in self._pending:
+                    self.coalesced += 1
+                self._pending[node_id] = (data, sid)
+                if node_id not in self._timers:
+                    timer = threading.Timer(wait, self._flush, (node_id,))
+                    timer.daemon = True
+                    self._timers[node_id] = timer
+                    timer.start()
+                return
+            self._last_sent[node_id] = now
+            self._send(data, sid)
+    
+    def _flush(self, node_id: str):
+        """补发间隔内合并的最新进度"""
+        with self._lock:
+            self._timers.pop(node_id, None)
+            pending = self._pending.pop(node_id, None)
+            if pending is None:
+                return
+            self._last_sent[node_id] = time.monotonic()
+            self._send(*pending)
+    
+    def final(self, node_id: str, data: Dict[str, Any], sid: Optional[str] = None):
+        """立即发送结束事件，丢弃该节点尚未发送的进度"""
+        with self._lock:
+            timer = self._timers.pop(node_id, None)
+            if timer is not None:
+                timer.cancel()
+            if self._pending.pop(node_id, None) is not None:
+                self.coalesced += 1
+            self._last_sent.pop(node_id, None)
+            self._send(data, sid)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"sent": self.sent, "coalesced": self.coalesced, "rate": self.rate}
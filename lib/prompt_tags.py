@@ -0,0 +1,68 @@
+"""
+提示词标签模块 - 拆分和重建逗号分隔的SD提示词
+"""
+import re
+
+# 标签 = 前缀（空白和左括号） + 核心文本 + 后缀（权重、右括号和空白）
+_TAG_RE = re.compile(r"^(\s*[\(\[\{]*\s*)(.*?)(\s*(?:[:：]\s*-?\d+(?:\.\d+)?)?\s*[\)\]\}]*\s*)$", re.S)
+_OPEN_BRACKETS = "([{<"
+_CLOSE_BRACKETS = ")]}>"
+_SEPARATORS = ",，"
+
+def is_translatable(core):
+    """判断标签核心是否需要翻译：LoRA/嵌入语法、纯数字和符号不翻译"""
+    if not core or core.startswith("<"):
+        return False
+    return any(ch.isalpha() for ch in core)
+
+def split_tags(line):
+    """
+    按顶层逗号拆分一行提示词
+    括号内的逗号不拆分，如 (a, b:1.2) 作为一个标签
+    返回片段列表：{"type": "tag", "prefix", "core", "suffix"} 或 {"type": "sep", "text"}
+    """
+    segments = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(line):
+        if ch in _OPEN_BRACKETS:
+            depth += 1
+        elif ch in _CLOSE_BRACKETS and depth > 0:
+            depth -= 1
+        elif ch in _SEPARATORS and depth == 0:
+            segments.append(_parse_tag(line[start:i]))
+            segments.append({"type": "sep", "text": ch})
+            start = i + 1
+    segments.append(_parse_tag(line[start:]))
+    return segments
+
+def _parse_tag(text):
+    """拆出标签的前缀、核心和后缀"""
+    match = _TAG_RE.match(text)
+    prefix, core, suffix = match.groups() if match else ("", text, "")
+    return {"type": "tag", "prefix": prefix, "core": core, "suffix": suffix}
+
+def iter_cores(segments):
+    """产出需要翻译的标签核心"""
+    for segment in segments:
+        if segment["type"] == "tag" and is_translatable(segment["core"]):
+            yield segment["core"]
+
+def join_tags(segments, translations, to_lang="auto"):
+    """
+    用译文重建一行提示词，保留括号和权重语法
+    目标语言为英文时，中文逗号和权重中的中文冒号替换为英文符号
+    """
+    parts = []
+    for i, segment in enumerate(segments):
+        if segment["type"] == "sep":
+            separator = segment["text"]
+            if to_lang == "en" and separator == "，":
+                following = segments[i + 1]["prefix"] if i + 1 < len(segments) else ""
+                separator = "," if following[:1].isspace() else ", "
+            parts.append(separator)
+        else:
+            core = segment["core"]
+            suffix = segment["suffix"].replace("：", ":") if to_lang == "en" else segment["suffix"]
+            parts.append(segment["prefix"] + translations.get(core, core) + suffix)
+    return "".join(parts)
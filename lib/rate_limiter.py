@@ -0,0 +1,104 @@
+import threading
+import time
+
+# 导入颜色模块
+from .colors import Colors, MODULE_BAIDU, success, error, warning, info, content, format_log
+
+class TokenBucket:
+    """
+    令牌桶限流器（线程安全）
+    请求按到达顺序预约令牌，令牌不足时排队等待而不是直接失败
+    """
+    
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        """按流逝时间补充令牌"""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+    
+    def acquire(self, tokens=1, timeout=None):
+        """
+        获取令牌，必要时阻塞等待
+        超过 timeout 秒仍无法获得时放弃预约并返回 False
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            # 先预约（允许令牌为负），再按欠额计算等待时间，保证先到先得
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if timeout is not None and wait > timeout:
+                self._tokens += tokens
+                return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+    
+    def drain(self):
+        """清空令牌，用于上游返回频率受限时让后续请求多等待一个周期"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+    
+    def update(self, rate=None, capacity=None):
+        """更新速率和桶容量"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if rate is not None:
+                self.rate = float(rate)
+            if capacity is not None:
+                self.capacity = max(1.0, float(capacity))
+                self._tokens = min(self._tokens, self.capacity)
+        return self
+
+class RateLimiterRegistry:
+    """按账号（appid）管理进程内共享的令牌桶"""
+    
+    # 百度通用文本翻译各版本的QPS
+    TIER_QPS = {
+        "standard": 1,
+        "advanced": 10,
+        "premium": 100
+    }
+    DEFAULT_TIER = "standard"
+    
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def resolve_qps(cls, tier=None, qps=None):
+        """根据版本或显式QPS确定速率，显式QPS优先"""
+        if qps:
+            try:
+                qps = float(qps)
+                if qps > 0:
+                    return qps
+            except (TypeError, ValueError):
+                pass
+        tier = (tier or cls.DEFAULT_TIER).lower()
+        if tier not in cls.TIER_QPS:
+            print(format_log(MODULE_BAIDU, f"未知的账号版本: {tier}，按标准版限流", 'warning'))
+            tier = cls.DEFAULT_TIER
+        return cls.TIER_QPS[tier]
+    
+    def get(self, account, rate, capacity=1):
+        """获取账号对应的令牌桶，速率变化时原地更新"""
+        with self._lock:
+            bucket = self._buckets.get(account)
+            if bucket is None:
+                bucket = TokenBucket(rate, capacity)
+                self._buckets[account] = bucket
+            elif bucket.rate != float(rate) or bucket.capacity != max(1.0, float(capacity)):
+                bucket.update(rate=rate, capacity=capacity)
+            return bucket
+
+# 创建全局限流器注册表
+rate_limiters = RateLimiterRegistry()
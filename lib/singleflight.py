@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+class SingleFlight:
+    """
+    合并相同的并发调用（线程安全）
+    同一个键同时只执行一次，期间到达的相同调用等待并共享这次的结果或异常
+    """
+    
+    class _Call:
+        __slots__ = ("event", "result", "error")
+        
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+    
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._coalesced = 0
+    
+    def do(self, key, fn):
+        """执行 fn()，已有相同键的调用在进行时直接等待其结果"""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = self._Call()
+            else:
+                self._coalesced += 1
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+    
+    def stats(self):
+        """返回进行中的调用数和被合并的调用数"""
+        with self._lock:
+            return {"inflight": len(self._inflight), "coalesced": self._coalesced}
+
+class AsyncSingleFlight:
+    """
+    合并相同的并发协程调用（在同一事件循环中使用）
+    同一个键同时只执行一次，期间到达的相同调用等待并共享这次的结果或异常
+    上游调用作为独立任务运行，所有调用方（包括发起者）都通过 shield 等待；
+    某个调用方被取消时只影响它自己，最后一个调用方离开后才取消上游任务
+    """
+    
+    class _Call:
+        __slots__ = ("task", "waiters")
+        
+        def __init__(self, task):
+            self.task = task
+            self.waiters = 0
+    
+    def __init__(self):
+        self._inflight = {}
+        self._coalesced = 0
+    
+    def _done(self, key, call, task):
+        """上游任务结束时移除记录，并标记异常已读取，没有等待者时不产生未处理异常的警告"""
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+    
+    async def do(self, key, coro_factory):
+        """执行 coro_factory() 返回的协程，已有相同键的调用在进行时直接等待其结果"""
+        call = self._inflight.get(key)
+        if call is not None:
+            self._coalesced += 1
+        else:
+            call = self._Call(asyncio.ensure_future(coro_factory()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda task: self._done(key, call, task))
+        
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            # 上游任务仍在运行说明是调用方自己被取消
+            if not call.task.done():
+                call.waiters -= 1
+                if call.waiters == 0:
+                    if self._inflight.get(key) is call:
+                        del self._inflight[key]
+                    call.task.cancel()
+            raise
+    
+    def stats(self):
+        """返回进行中的调用数和被合并的调用数"""
+        return {"inflight": len(self._inflight), "coalesced": self._coalesced}
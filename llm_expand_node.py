@@ -1,26 +1,63 @@
-import json
-import os
-import requests
-import re
+import asyncio
 import time
 import hmac
 import base64
 import hashlib
-from .lib.cache import cache_manager
+import server
+from .lib.cache import cache_manager, ExpansionCache, workflow_id
+from .lib.llm_client import llm_client
+from .lib.singleflight import AsyncSingleFlight
+from .lib.config_store import config_store
+from .lib.langdetect import detect_language
+
+class _StreamForwarder:
+    """
+    将流式扩写的增量文本合并后通过 websocket 推送给节点，约每50毫秒发送一次
+    sid 为发起请求的客户端，None 时广播
+    """
+    
+    interval = 0.05
+    
+    def __init__(self, node_id, sid=None):
+        self.node_id = node_id
+        self.sid = sid
+        self._buffer = []
+        self._last_sent = 0.0
+    
+    def __call__(self, delta):
+        self._buffer.append(delta)
+        if time.monotonic() - self._last_sent >= self.interval:
+            self.flush()
+    
+    def flush(self):
+        """发送缓冲区中的增量"""
+        if not self._buffer:
+            return
+        server.PromptServer.instance.send_sync("prompt_expand_update", {
+            "node_id": self.node_id,
+            "status": "streaming",
+            "delta": "".join(self._buffer)
+        }, self.sid)
+        self._buffer = []
+        self._last_sent = time.monotonic()
 
 class LLMExpandNode:
     # 添加类变量
     _debug = False
-    
-    def __init__(self):
-        self.config = self.load_config()
+    _flights = AsyncSingleFlight()  # 合并相同的进行中扩写请求
     
     @classmethod
     def set_debug(cls, debug=False):
         """设置调试模式"""
         cls._debug = debug
+        llm_client.set_debug(debug)
         return cls
     
+    @classmethod
+    def get_coalescing_stats(cls):
+        """获取请求合并的统计信息"""
+        return cls._flights.stats()
+    
     def log(self, *args, force=False):
         """有条件地打印日志"""
         if self._debug or force:
@@ -34,7 +71,12 @@ class LLMExpandNode:
                 "text": ("STRING", {"multiline": True}),
             },
             "optional": {
+                "seed": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),  # -1 表示不固定种子
+                "use_cache": ("BOOLEAN", {"default": True}),  # 关闭后每次都请求新的扩写结果
                 "_node_id": ("STRING", {"default": "", "hidden": True})  # 添加隐藏的节点ID输入
+            },
+            "hidden": {
+                "extra_pnginfo": "EXTRA_PNGINFO"  # 用于取工作流ID，与前端的历史记录对应
             }
         }
     
@@ -43,30 +85,20 @@ class LLMExpandNode:
     CATEGORY = "text"
     FUNCTION = "expand_text"
     
+    @property
+    def config(self):
+        """当前配置（来自共享配置存储，只读）"""
+        return config_store.get()
+    
     def load_config(self):
-        config_path = os.path.join(os.path.dirname(__file__), "config.json")
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return config_store.get()
     
     def detect_language(self, text):
         """
         检测文本语言
-        简单实现：通过中文字符比例判断是否为中文
+        按文字比例判断中文、日文、韩文或英文，阈值 30%
         """
-        # 计算中文字符的比例
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        total_chars = len(text.strip())
-        
-        if total_chars == 0:
-            return "unknown"
-        
-        chinese_ratio = chinese_chars / total_chars
-        
-        # 如果中文字符比例超过30%，认为是中文
-        if chinese_ratio > 0.3:
-            return "zh"
-        else:
-            return "en"
+        return detect_language(text)
     
     def generate_zhipu_auth_header(self, api_key):
         """生成智谱API的认证头"""
@@ -93,9 +125,26 @@ class LLMExpandNode:
         auth_header = f"Bearer {api_key_id}.{timestamp}.{signature_base64}"
         return auth_header
     
-    def call_llm_api(self, text):
-        """调用大模型API"""
+    def _expansion_cache_key(self, text, seed=None):
+        """根据接口、模型、系统提示词、采样参数、原文和种子生成扩写缓存键"""
         config = self.config["llm_expand"]
+        return ExpansionCache.make_key(
+            config["api_base"],
+            config["model"],
+            config["system_prompt"],
+            config["temperature"],
+            config["max_tokens"],
+            text,
+            seed
+        )
+    
+    async def call_llm_api_async(self, text, seed=None, on_delta=None):
+        """
+        调用大模型API（异步，使用共享连接池）
+        传入 on_delta 且 llm_expand.stream 未关闭时以流式请求，每收到一段增量文本即回调
+        """
+        config = self.config["llm_expand"]
+        stream = on_delta is not None and config.get("stream", True)
         api_base = config["api_base"]
         api_key = config["api_key"]
         
@@ -111,6 +160,10 @@ class LLMExpandNode:
         # 如果检测到语言，添加一条语言设置消息
         if detected_language == "zh":
             messages.append({"role": "user", "content": "请使用中文回答我的问题。"})
+        elif detected_language == "ja":
+            messages.append({"role": "user", "content": "日本語で答えてください。"})
+        elif detected_language == "ko":
+            messages.append({"role": "user", "content": "한국어로 답변해 주세요."})
         elif detected_language == "en":
             messages.append({"role": "user", "content": "Please answer my questions in English."})
         
@@ -131,17 +184,29 @@ class LLMExpandNode:
             "temperature": config["temperature"],
             "max_tokens": config["max_tokens"]
         }
+        if seed is not None:
+            data["seed"] = seed
         
         try:
             self.log(f"调用API: {api_base}")
-            response = requests.post(
-                api_base,
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.json()
+            if stream:
+                data["stream"] = True
+                headers["Accept"] = "text/event-stream"
+                parts = []
+                async for chunk in llm_client.stream_sse(api_base, headers=headers, payload=data, timeout=30):
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                    # 流式数据在 delta 中，服务端不支持流式时完整结果在 message 中
+                    delta = (choices[0].get("delta") or choices[0].get("message") or {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        on_delta(delta)
+                if not parts:
+                    raise Exception("API未返回任何内容")
+                return "".join(parts)
+            
+            result = await llm_client.post_json(api_base, headers=headers, payload=data, timeout=30)
             
             # 返回生成的文本
             if "choices" in result and len(result["choices"]) > 0:
@@ -152,7 +217,41 @@ class LLMExpandNode:
         except Exception as e:
             raise Exception(f"API调用失败: {str(e)}")
     
-    def expand_text(self, text, _node_id=""):
+    def _run_on_server_loop(self, coro):
+        """
+        在服务器事件循环上运行协程并等待结果
+        供图执行线程使用，使其与路由共享同一个连接池
+        """
+        loop = server.PromptServer.instance.loop
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            coro.close()
+            raise RuntimeError("不能在服务器事件循环中同步等待扩写结果，请使用 expand_text_async")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    
+    def call_llm_api(self, text, seed=None):
+        """调用大模型API（同步）"""
+        return self._run_on_server_loop(self.call_llm_api_async(text, seed))
+    
+    @staticmethod
+    async def _record_history_async(node_id, text, workflow=""):
+        """记录历史（可能从历史日志恢复，在线程池中执行，不阻塞事件循环）"""
+        def record():
+            cache_manager.init_history(node_id, workflow)
+            cache_manager.record_history(node_id, text, workflow)
+        await asyncio.get_running_loop().run_in_executor(None, record)
+    
+    async def expand_text_async(self, text, _node_id="", seed=-1, use_cache=True, stream_to=None, workflow="", sid=None):
+        """
+        异步扩写
+        seed 为 -1 或 None 时不固定种子；use_cache 为 False 时跳过缓存，获取新的扩写结果
+        stream_to 为节点ID时以流式请求，并通过 prompt_expand_update 事件逐段推送给该节点
+        workflow 为前端工作流ID，与 _node_id 一起区分历史记录；sid 为接收流式增量的客户端，None 时广播
+        相同缓存键的扩写正在进行时不再重复请求，等待并共享其结果（流式增量只推送给发起请求的节点）
+        """
         try:
             # 检查API密钥是否已配置
             api_key = self.config["llm_expand"]["api_key"]
@@ -160,13 +259,37 @@ class LLMExpandNode:
                 print("扩写失败: 请在设置界面配置LLM API密钥")
                 return (f"【扩写失败: 请在设置界面配置LLM API密钥】\n{text}",)
             
+            if seed is not None and int(seed) < 0:
+                seed = None
+            
+            # 查询扩写缓存
+            cache_key = None
+            if use_cache and self.config["llm_expand"].get("cache_enabled", True):
+                cache_key = self._expansion_cache_key(text, seed)
+                cached_text = cache_manager.get_expansion_cache(cache_key)
+                if cached_text:
+                    self.log("使用缓存的扩写结果")
+                    if _node_id:
+                        await self._record_history_async(_node_id, text, workflow)
+                    return (cached_text,)
+            
             # 调用API进行扩写
-            expanded_text = self.call_llm_api(text)
+            forwarder = _StreamForwarder(stream_to, sid) if stream_to else None
+            request = lambda: self.call_llm_api_async(text, seed, on_delta=forwarder)
+            if cache_key:
+                expanded_text = await self._flights.do(cache_key, request)
+            else:
+                expanded_text = await request()
+            if forwarder:
+                forwarder.flush()
+            
+            # 写入扩写缓存
+            if cache_key and expanded_text:
+                cache_manager.set_expansion_cache(cache_key, expanded_text)
             
             # 记录历史
             if _node_id:
-                cache_manager.init_history(_node_id)
-                cache_manager.record_history(_node_id, text)
+                await self._record_history_async(_node_id, text, workflow)
             
             return (expanded_text,)
         except Exception as e:
@@ -176,36 +299,35 @@ class LLMExpandNode:
                 return (f"【扩写失败: LLM认证错误】\n{text}",)
             else:
                 return (f"【扩写失败: {error_msg}】\n{text}",)
+    
+    def expand_text(self, text, _node_id="", seed=-1, use_cache=True, extra_pnginfo=None):
+        """图执行入口：在服务器事件循环上执行异步扩写，历史记录按工作流区分，与界面扩写使用同一个键"""
+        workflow = workflow_id(extra_pnginfo)
+        return self._run_on_server_loop(self.expand_text_async(text, _node_id, seed, use_cache, workflow=workflow))
 
     @classmethod
     def update_config(cls, config):
         """
-        更新节点配置
-        @param config: 新的配置字典
+        应用新的LLM配置（配置存储加载或重新加载时调用）
+        请求参数每次直接读取共享配置，这里只同步扩写缓存和连接池设置
+        @param config: llm_expand 部分的配置字典
         """
         try:
             if not config:
                 return False
-                
-            # 更新LLM配置
-            if "api_key" in config:
-                cls.API_KEY = config["api_key"]
-            if "api_base" in config:
-                cls.API_BASE = config["api_base"]
-            if "model" in config:
-                cls.MODEL = config["model"]
-            if "temperature" in config:
-                cls.TEMPERATURE = float(config["temperature"])
-            if "max_tokens" in config:
-                cls.MAX_TOKENS = int(config["max_tokens"])
-            if "system_prompt" in config:
-                cls.SYSTEM_PROMPT = config["system_prompt"]
-                
+            
+            cache_manager.configure_expansion_cache(config)
+            llm_client.configure(
+                pool_size=config.get("pool_size"),
+                keepalive_timeout=config.get("keepalive_timeout")
+            )
             return True
         except Exception as e:
             print(f"更新LLM节点配置时出错: {str(e)}")
             return False
 
+config_store.add_listener(lambda config: LLMExpandNode.update_config(config.get("llm_expand", {})))
+
 NODE_CLASS_MAPPINGS = {
     "LLMExpandNode": LLMExpandNode
 }
@@ -2,8 +2,15 @@ import server
 from aiohttp import web
 import os
 import json
+import asyncio
+import functools
 from .translate_node import PromptWidget
 from .llm_expand_node import LLMExpandNode
+from .lib.cache import cache_manager
+from .lib.baidutranslation import translator
+from .lib.config_store import config_store
+from .lib.presets import preset_store
+from .lib.janitor import janitor
 from .lib import Colors, MODULE_ROUTE, success, error, warning, info, content, format_log
 
 # 日志控制
@@ -15,36 +22,56 @@ def log(*args, force=False):
         message = ' '.join(str(arg) for arg in args)
         print(f"{MODULE_ROUTE} {message}")
 
+def client_sid(data):
+    """
+    请求体中 client_id 对应的 websocket 客户端ID
+    该客户端当前已连接时返回它，事件只发给该客户端；否则返回 None，事件广播给所有客户端
+    """
+    sid = data.get("client_id") if isinstance(data, dict) else None
+    if sid and sid in getattr(server.PromptServer.instance, "sockets", {}):
+        return sid
+    return None
+
 # 添加获取预设列表的路由
 @server.PromptServer.instance.routes.get("/prompt_widget/presets")
 async def get_presets(request):
     """
     处理预设列表请求
-    返回预设列表的JSON数据
+    返回预序列化的预设列表JSON，带 ETag/Last-Modified，未变化时返回 304
     """
     try:
-        # 获取插件目录路径
-        plugin_dir = os.path.dirname(os.path.abspath(__file__))
-        preset_file = os.path.join(plugin_dir, "Prompt_Preset_List.json")
+        log(f"请求预设文件: {preset_store.path}")
         
-        log(f"请求预设文件: {preset_file}")
-        
-        # 检查文件是否存在
-        if not os.path.exists(preset_file):
-            log(error(f"预设文件不存在: {preset_file}"))
+        snapshot = preset_store.snapshot()
+        if snapshot is None:
+            log(error(f"预设文件不存在: {preset_store.path}"))
             return web.json_response({
                 "status": "error",
                 "message": "预设文件不存在"
             }, status=404)
         
-        # 读取文件内容
-        with open(preset_file, "r", encoding="utf-8") as f:
-            presets_data = json.load(f)
+        # no-cache 让浏览器每次带上验证头重新确认，未变化时只返回 304
+        headers = {
+            "ETag": snapshot.etag,
+            "Last-Modified": snapshot.last_modified,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding"
+        }
+        
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            not_modified = if_none_match.strip() == "*" or snapshot.etag in [tag.strip() for tag in if_none_match.split(",")]
+        else:
+            not_modified = request.headers.get("If-Modified-Since") == snapshot.last_modified
+        if not_modified:
+            return web.Response(status=304, headers=headers)
         
-        log(success(f"成功读取预设文件: 找到 {len(presets_data.get('presets', []))} 个预设"))
+        log(success(f"成功读取预设文件: 找到 {snapshot.count} 个预设"))
         
-        # 返回JSON响应
-        return web.json_response(presets_data)
+        if snapshot.gzip_body is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return web.Response(body=snapshot.gzip_body, content_type="application/json", charset="utf-8", headers=headers)
+        return web.Response(body=snapshot.body, content_type="application/json", charset="utf-8", headers=headers)
         
     except Exception as e:
         log(error(f"读取预设文件时出错: {str(e)}"))
@@ -53,6 +80,108 @@ async def get_presets(request):
             "message": str(e)
         }, status=500)
 
+@server.PromptServer.instance.routes.get("/prompt_widget/presets/search")
+async def search_presets(request):
+    """
+    搜索预设并分页返回
+    查询参数: q（子串，空格分隔多个词），type（类型筛选），offset，limit
+    返回匹配总数、当前页预设（附带在完整列表中的位置 index）和所有类型
+    """
+    try:
+        query = request.query.get("q", "")
+        preset_type = request.query.get("type") or None
+        try:
+            offset = int(request.query.get("offset", 0))
+            limit = int(request.query.get("limit", 50))
+        except ValueError:
+            return web.json_response({
+                "status": "error",
+                "message": "offset 和 limit 必须是整数"
+            }, status=400)
+        
+        if preset_store.search_ready():
+            result = preset_store.search(query, preset_type, offset, limit)
+        else:
+            # 首次搜索需要加载预设文件并逐条匹配，不在事件循环中执行
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                None,
+                functools.partial(preset_store.search, query, preset_type, offset, limit)
+            )
+        return web.json_response({"status": "success", **result})
+        
+    except Exception as e:
+        log(error(f"搜索预设时出错: {str(e)}"))
+        return web.json_response({
+            "status": "error",
+            "message": str(e)
+        }, status=500)
+
+@server.PromptServer.instance.routes.post("/prompt_widget/presets/ops")
+async def apply_preset_ops(request):
+    """
+    按操作修改预设，只写入操作日志，不重写整个预设文件
+    请求体: {"ops": [{"op": "add", "preset": {...}, "index": 0}, {"op": "update", "id": ..., "fields": {...}},
+                      {"op": "delete", "id": ...}, {"op": "move", "id": ..., "index": 0}]}
+    所有操作全部成功才生效，返回各操作结果（add 返回新预设ID）
+    """
+    try:
+        data = await request.json()
+        ops = data.get("ops")
+        if not isinstance(ops, list):
+            log(error("缺少必要参数: ops"))
+            return web.json_response({
+                "status": "error",
+                "message": "缺少必要参数: ops"
+            }, status=400)
+        
+        try:
+            results = preset_store.apply_ops(ops)
+        except (KeyError, ValueError, TypeError) as e:
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            log(error(f"预设操作无效: {message}"))
+            return web.json_response({
+                "status": "error",
+                "message": message
+            }, status=400)
+        except FileNotFoundError as e:
+            return web.json_response({
+                "status": "error",
+                "message": str(e)
+            }, status=404)
+        
+        log(success(f"已应用 {len(results)} 个预设操作"))
+        
+        return web.json_response({
+            "status": "success",
+            "results": results
+        })
+        
+    except Exception as e:
+        log(error(f"修改预设时出错: {str(e)}"))
+        return web.json_response({
+            "status": "error",
+            "message": str(e)
+        }, status=500)
+
+@server.PromptServer.instance.routes.get("/prompt_widget/cache_stats")
+async def get_cache_stats(request):
+    """
+    返回翻译缓存的统计信息
+    包含条目数、占用字节数、命中/未命中/淘汰计数，合并的并发请求数，历史记录的内存占用，翻译进度事件的发送与合并数，以及后台清理的回收情况
+    """
+    return web.json_response({
+        "status": "success",
+        "translation_cache": cache_manager.get_cache_stats(),
+        "history": cache_manager.get_history_stats(),
+        "janitor": janitor.stats(),
+        "progress_events": PromptWidget.get_progress_stats(),
+        "coalesced_requests": {
+            "translate": translator.get_coalescing_stats(),
+            "expand": LLMExpandNode.get_coalescing_stats()
+        }
+    })
+
 @server.PromptServer.instance.routes.post("/expand_text")
 async def handle_expand_request(request):
     """
@@ -71,6 +200,10 @@ async def handle_expand_request(request):
         
         text = data.get("text", "")
         node_id = data.get("node_id")
+        seed = data.get("seed")
+        use_cache = data.get("use_cache", True)
+        stream_to = node_id if data.get("stream") else None
+        sid = client_sid(data)
         
         # 请求唯一ID，用于日志跟踪
         import time
@@ -86,8 +219,8 @@ async def handle_expand_request(request):
         # 创建扩写节点实例
         expand_node = LLMExpandNode()
         
-        # 调用扩写
-        expanded_text = expand_node.expand_text(text)[0]
+        # 调用扩写（异步，复用共享连接池）
+        expanded_text = (await expand_node.expand_text_async(text, seed=seed, use_cache=use_cache, stream_to=stream_to, sid=sid))[0]
         
         # 检查返回的文本是否包含错误信息
         if "【扩写失败:" in expanded_text:
@@ -149,6 +282,9 @@ async def handle_translate_request(request):
         node_id = data.get("node_id")
         from_lang = data.get("from_lang", "auto")
         to_lang = data.get("to_lang", "auto")
+        tag_mode = data.get("tag_mode")
+        incremental = data.get("incremental")
+        workflow = data.get("workflow") or ""
         
         # 请求唯一ID，用于日志跟踪
         import time
@@ -168,12 +304,16 @@ async def handle_translate_request(request):
         # 自动检测语言
         detected_to_lang = prompt_node.auto_detect_language(text, to_lang)
         
-        # 调用翻译器进行翻译
-        result = prompt_node.process_translation(
+        # 调用翻译器进行翻译（在线程池中执行，不阻塞事件循环）
+        result = await prompt_node.process_translation_async(
             text, 
             from_lang=from_lang, 
             to_lang=detected_to_lang, 
-            node_id=node_id
+            node_id=node_id,
+            tag_mode=tag_mode,
+            incremental=incremental,
+            workflow=workflow,
+            sid=client_sid(data)
         )
         
         if result["status"] == "success":
@@ -203,6 +343,60 @@ async def handle_translate_request(request):
             "message": str(e)
         }, status=500)
 
+@server.PromptServer.instance.routes.get("/prompt_widget/history")
+async def get_node_history(request):
+    """
+    获取节点的历史记录，参数为 node_id 和可选的 workflow
+    内存中没有时从历史日志恢复，重启服务后前端可据此还原撤销/重做
+    """
+    node_id = request.query.get("node_id")
+    if not node_id:
+        return web.json_response({"status": "error", "message": "缺少必要参数: node_id"}, status=400)
+    workflow = request.query.get("workflow", "")
+    # 恢复历史可能读取日志文件，并等待后台写入线程释放文件锁，不在事件循环中执行
+    loop = asyncio.get_running_loop()
+    history = await loop.run_in_executor(None, cache_manager.get_history, node_id, workflow)
+    return web.json_response({"status": "success", "history": history})
+
+def _apply_history_action(node_id, action, text, workflow):
+    """执行历史操作并返回操作后的历史记录（在线程池中运行）"""
+    if action == "record":
+        cache_manager.record_history(node_id, text, workflow)
+    elif action == "undo":
+        cache_manager.undo(node_id, workflow)
+    elif action == "redo":
+        cache_manager.redo(node_id, workflow)
+    else:
+        cache_manager.clear_history(node_id, workflow)
+    return cache_manager.get_history(node_id, workflow)
+
+@server.PromptServer.instance.routes.post("/prompt_widget/history")
+async def update_node_history(request):
+    """
+    对节点历史执行操作并写入历史日志
+    请求体包含 node_id、workflow 和 action（record / undo / redo / clear），record 需附带 text
+    """
+    try:
+        data = await request.json()
+        node_id = data.get("node_id")
+        action = data.get("action")
+        workflow = data.get("workflow") or ""
+        if not node_id or action not in ("record", "undo", "redo", "clear"):
+            return web.json_response({"status": "error", "message": "缺少 node_id 或 action 无效"}, status=400)
+        
+        loop = asyncio.get_running_loop()
+        history = await loop.run_in_executor(
+            None,
+            functools.partial(_apply_history_action, node_id, action, data.get("text", ""), workflow)
+        )
+        return web.json_response({"status": "success", "history": history})
+    except Exception as e:
+        log(error(f"更新历史记录时出错: {str(e)}"))
+        return web.json_response({
+            "status": "error",
+            "message": str(e)
+        }, status=500)
+
 @server.PromptServer.instance.routes.post("/prompt_widget/save_presets")
 async def save_presets(request):
     """
@@ -223,15 +417,10 @@ async def save_presets(request):
         
         presets = data["presets"]
         
-        # 获取插件目录路径
-        plugin_dir = os.path.dirname(os.path.abspath(__file__))
-        preset_file = os.path.join(plugin_dir, "Prompt_Preset_List.json")
+        log(f"正在保存预设到文件: {preset_store.path}")
         
-        log(f"正在保存预设到文件: {preset_file}")
-        
-        # 保存到文件
-        with open(preset_file, "w", encoding="utf-8") as f:
-            json.dump({"presets": presets}, f, ensure_ascii=False, indent=2)
+        # 保存到文件，同时使缓存的预设响应失效
+        preset_store.replace(presets)
         
         log(success(f"成功保存 {len(presets)} 个预设到文件"))
         
@@ -257,40 +446,10 @@ async def load_config(request):
     返回配置的JSON数据
     """
     try:
-        # 获取插件目录路径
-        plugin_dir = os.path.dirname(os.path.abspath(__file__))
-        config_file = os.path.join(plugin_dir, "config.json")
-        
-        log(f"请求配置文件: {config_file}")
-        
-        # 检查文件是否存在
-        if not os.path.exists(config_file):
-            # 如果文件不存在，返回默认配置
-            default_config = {
-                "prompt_translate": {
-                    "appid": "",
-                    "key": ""
-                },
-                "llm_expand": {
-                    "api_key": "",
-                    "api_base": "https://api.openai.com/v1",
-                    "model": "gpt-3.5-turbo",
-                    "temperature": 0.7,
-                    "max_tokens": 1000,
-                    "system_prompt": "你是一个专业的写作助手，擅长对文本进行扩写和润色。请对用户输入的文本进行扩写，使其更加丰富和生动。"
-                }
-            }
-            
-            # 创建默认配置文件
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(default_config, f, ensure_ascii=False, indent=2)
-            
-            log(success(f"创建默认配置文件: {config_file}"))
-            return web.json_response(default_config)
+        log(f"请求配置文件: {config_store.path}")
         
-        # 读取文件内容
-        with open(config_file, "r", encoding="utf-8") as f:
-            config_data = json.load(f)
+        # 从共享配置存储读取，文件不存在时会创建默认配置
+        config_data = config_store.get()
         
         log(success(f"成功读取配置文件"))
         
@@ -313,21 +472,18 @@ async def save_config(request):
     try:
         # 解析请求体
         data = await request.json()
+        sid = client_sid(data)
+        data.pop("client_id", None)
         
-        # 获取插件目录路径
-        plugin_dir = os.path.dirname(os.path.abspath(__file__))
-        config_file = os.path.join(plugin_dir, "config.json")
+        log(f"正在保存配置到文件: {config_store.path}")
         
-        log(f"正在保存配置到文件: {config_file}")
-        
-        # 保存到文件
-        with open(config_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 合并到现有配置，保留设置界面未包含的高级选项；保存后各节点立即使用新配置
+        config_store.save(data)
         
         log(success(f"成功保存配置到文件"))
         
-        # 重新加载配置并通知节点
-        reload_node_configs()
+        # 通知保存配置的客户端
+        reload_node_configs(sid)
         
         return web.json_response({
             "status": "success",
@@ -415,34 +571,29 @@ async def set_debug_mode(request):
         }, status=500)
 
 # 添加配置重新加载函数
-def reload_node_configs():
+def reload_node_configs(sid=None):
     """
     重新加载节点配置
-    通知所有相关节点更新其配置
+    节点通过共享配置存储的监听器同步更新，这里只通知前端
+    sid 为接收通知的客户端，None 时广播
     """
     try:
-        # 获取插件目录路径
-        plugin_dir = os.path.dirname(os.path.abspath(__file__))
-        config_file = os.path.join(plugin_dir, "config.json")
-        
-        # 读取最新配置
-        with open(config_file, "r", encoding="utf-8") as f:
-            config_data = json.load(f)
-            
-        # 更新翻译节点配置
-        PromptWidget.update_config(config_data.get("prompt_translate", {}))
-        # 更新LLM节点配置
-        LLMExpandNode.update_config(config_data.get("llm_expand", {}))
+        # 读取最新配置（文件有变化时重新加载并通知各节点）
+        config_data = config_store.get()
         
         # 发送WebSocket事件通知前端
         server.PromptServer.instance.send_sync("prompt_widget_config_update", {
             "status": "success",
             "message": "配置已更新",
             "config": config_data
-        })
+        }, sid)
         
         log(success("节点配置已重新加载"))
         return True
     except Exception as e:
         log(error(f"重新加载配置时出错: {str(e)}"))
-        return False 
\ No newline at end of file
+        return False 
+
+
+# 在服务器事件循环上启动后台维护任务
+janitor.start(server.PromptServer.instance.loop)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接导入 lib 下的模块；插件入口依赖 ComfyUI 的 server 模块，不在测试中加载
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import pytest
+
+from lib.baidutranslation import BaiduTranslator
+
+class FakeTranslator(BaiduTranslator):
+    """不发送网络请求，按 responses 返回 trans_result，并记录每次请求的 query"""
+    
+    def __init__(self, respond):
+        super().__init__()
+        self.respond = respond
+        self.queries = []
+    
+    def _check_credentials(self):
+        return True
+    
+    def _request(self, query, from_lang, to_lang, retry_count=3):
+        self.queries.append(query)
+        return {"status": "success", "trans_result": [{"src": line, "dst": line.upper()} for line in self.respond(query)]}
+
+def test_pack_respects_byte_limit_for_multibyte_text():
+    # 每个汉字 3 字节，每行 10 个汉字加换行符共 31 字节
+    texts = ["汉" * 10] * 7
+    batches = BaiduTranslator.pack_batches(texts, max_bytes=100)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    for batch in batches:
+        assert sum(len(texts[i].encode("utf-8")) + 1 for i in batch) <= 100
+
+def test_pack_puts_oversized_line_in_its_own_batch():
+    texts = ["a", "b" * 500, "c"]
+    assert BaiduTranslator.pack_batches(texts, max_bytes=100) == [[0], [1], [2]]
+
+def test_pack_counts_empty_lines_and_keeps_order():
+    texts = ["", "abc", "", ""]
+    assert BaiduTranslator.pack_batches(texts, max_bytes=6) == [[0, 1, 2], [3]]
+    assert BaiduTranslator.pack_batches([]) == []
+
+def test_pack_default_limit():
+    texts = ["x" * 999] * 6
+    assert BaiduTranslator.pack_batches(texts) == [[0, 1, 2, 3, 4], [5]]
+
+def test_batch_maps_lines_in_order():
+    translator = FakeTranslator(lambda query: query.split("\n"))
+    result = translator.translate_batch(["a", "b", "c"])
+    assert result == {"status": "success", "texts": ["A", "B", "C"]}
+    assert translator.queries == ["a\nb\nc"]
+
+def test_batch_falls_back_to_single_lines_when_line_count_differs():
+    # 模拟百度合并或丢弃空行，返回行数与请求不一致
+    translator = FakeTranslator(lambda query: [line for line in query.split("\n") if line])
+    result = translator.translate_batch(["a", "", "b"])
+    assert result == {"status": "success", "texts": ["A", "", "B"]}
+    assert translator.queries == ["a\n\nb", "a", "b"]
+
+def test_batch_error_is_returned():
+    translator = FakeTranslator(lambda query: query.split("\n"))
+    translator._request = lambda *args, **kwargs: {"status": "error", "message": "boom"}
+    assert translator.translate_batch(["a", "b"]) == {"status": "error", "message": "boom"}
+
+@pytest.mark.parametrize("texts", [[], ["only"]])
+def test_batch_small_inputs(texts):
+    translator = FakeTranslator(lambda query: query.split("\n"))
+    assert translator.translate_batch(texts) == {"status": "success", "texts": [text.upper() for text in texts]}
@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+
+from lib.batch_pool import BatchPool
+
+def test_results_follow_input_order_when_concurrent():
+    pool = BatchPool()
+    delays = [random.uniform(0, 0.02) for _ in range(20)]
+    # 越靠前的批次越慢，完成顺序与提交顺序相反
+    delays.sort(reverse=True)
+    threads = set()
+    
+    def work(i, scale):
+        threads.add(threading.current_thread().name)
+        time.sleep(delays[i])
+        return i * scale
+    
+    results = list(pool.map_ordered(work, range(20), 4, 10))
+    assert results == [i * 10 for i in range(20)]
+    assert pool.size == 4
+    assert len(threads) > 1
+
+def test_resize_does_not_break_inflight_submissions():
+    pool = BatchPool()
+    errors = []
+    results = {}
+    
+    def work(i):
+        time.sleep(0.001)
+        return i
+    
+    def run(n, concurrency):
+        try:
+            for _ in range(10):
+                results[n] = list(pool.map_ordered(work, range(8), concurrency))
+        except Exception as e:
+            errors.append(e)
+    
+    # 并发数交替变化，线程池在其他线程提交期间反复重建
+    threads = [threading.Thread(target=run, args=(n, 2 + n % 3)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert errors == []
+    assert all(result == list(range(8)) for result in results.values())
+
+def test_closing_early_cancels_pending_batches():
+    pool = BatchPool()
+    release = threading.Event()
+    started = []
+    
+    def work(i):
+        started.append(i)
+        if i:
+            release.wait(5)
+        return i
+    
+    runner = pool.map_ordered(work, range(10), 2)
+    assert next(runner) == 0
+    runner.close()
+    release.set()
+    time.sleep(0.05)
+    # 关闭时尚未开始的批次被取消
+    assert len(started) < 10
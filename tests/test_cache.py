@@ -0,0 +1,195 @@
+import os
+
+from lib import cache
+from lib.cache import (
+    TranslationStore,
+    TranslationLRU,
+    ExpansionCache,
+    CacheManager,
+    normalize_prompt_text,
+    make_translation_key,
+    reverse_direction,
+    workflow_id
+)
+
+def test_store_pending_writes_are_visible_before_flush(tmp_path):
+    store = TranslationStore(str(tmp_path / "cache.db"), flush_interval=60)
+    store.put("key", "value")
+    assert store.get("key") == "value"
+    assert store.get("missing") is None
+    store.close()
+
+def test_store_persists_across_instances(tmp_path):
+    path = str(tmp_path / "nested" / "cache.db")
+    store = TranslationStore(path, flush_interval=60)
+    store.put("猫", "cat")
+    store.close()
+    
+    reopened = TranslationStore(path)
+    assert reopened.get("猫") == "cat"
+    reopened.close()
+
+def test_store_trims_oldest_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    store = TranslationStore(str(tmp_path / "cache.db"), max_entries=2, flush_interval=60)
+    for i in range(3):
+        store.put(f"k{i}", f"v{i}")
+        store.flush()
+        now[0] += 1
+    assert store.get("k0") is None
+    assert (store.get("k1"), store.get("k2")) == ("v1", "v2")
+    store.close()
+
+def test_store_clear_drops_pending_and_stored(tmp_path):
+    store = TranslationStore(str(tmp_path / "cache.db"), flush_interval=60)
+    store.put("a", "1")
+    store.flush()
+    store.put("b", "2")
+    store.clear()
+    assert store.get("a") is None and store.get("b") is None
+    store.close()
+
+def test_lru_serves_both_directions():
+    lru = TranslationLRU()
+    lru.put("zh:猫", "cat", "en:cat", "猫")
+    assert lru.get("zh:猫") == "cat"
+    assert lru.get("en:cat") == "猫"
+    assert lru.get("en:dog") is None
+    assert (lru.hits, lru.misses) == (2, 1)
+
+def test_lru_evicts_pairs_least_recently_used_first():
+    lru = TranslationLRU(max_entries=2, max_bytes=0)
+    lru.put("a", "A", "A", "a")
+    lru.put("b", "B", "B", "b")
+    lru.get("a")
+    lru.put("c", "C", "C", "c")
+    assert len(lru) == 2
+    # 整对淘汰，两个方向都不再命中
+    assert lru.get("b") is None and lru.get("B") is None
+    assert lru.get("a") == "A"
+    assert lru.evictions == 1
+
+def test_lru_byte_limit_and_replacement():
+    lru = TranslationLRU(max_entries=0, max_bytes=20)
+    lru.put("k1", "v1", "r1", "s1")
+    lru.put("k1", "new", "r1", "s1")
+    assert len(lru) == 1 and lru.get("k1") == "new"
+    lru.put("k2", "v2", "r2", "s2")
+    lru.put("k3", "v3", "r3", "s3")
+    assert lru.stats()["bytes"] <= 20
+    assert lru.get("k1") is None
+
+def test_lru_resize_and_purge_idle(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    lru = TranslationLRU()
+    lru.put("a", "A", "A", "a")
+    now[0] += 100
+    lru.put("b", "B", "B", "b")
+    assert lru.purge_idle(50) == 1
+    assert lru.get("a") is None and lru.get("b") == "B"
+    lru.resize(0, 1)
+    assert len(lru) == 0
+
+def test_normalize_unifies_width_punctuation_and_spacing():
+    assert normalize_prompt_text("  一只猫 ，  红色。 \n\n  ａｂｃ  ,x  ") == "一只猫, 红色.\n\nabc, x"
+    assert normalize_prompt_text("1girl,solo") == normalize_prompt_text("1girl , solo")
+
+def test_translation_key_separates_language_pair_and_backend():
+    key = make_translation_key("a , b", "auto", "en", "baidu:1")
+    assert key == make_translation_key("a, b", "auto", "en", "baidu:1")
+    assert key != make_translation_key("a, b", "auto", "zh", "baidu:1")
+    assert key != make_translation_key("a, b", "auto", "en", "baidu:2")
+
+def test_reverse_direction():
+    assert reverse_direction("zh", "en") == ("en", "zh")
+    assert reverse_direction("auto", "en") == ("auto", "zh")
+    assert reverse_direction("auto", "zh") == ("auto", "en")
+    assert reverse_direction("auto", "auto") == ("auto", "auto")
+
+def test_expansion_key_covers_endpoint_model_and_sampling():
+    base = ("https://api", "model", "system", 0.7, 512, "cat", None)
+    key = ExpansionCache.make_key(*base)
+    assert key == ExpansionCache.make_key(*base)
+    for i, changed in enumerate(["https://other", "model2", "system2", 0.8, 1024, "dog", 42]):
+        assert ExpansionCache.make_key(*base[:i], changed, *base[i + 1:]) != key
+
+def test_expansion_cache_ttl_and_capacity(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    expansions = ExpansionCache(max_entries=2, ttl=10)
+    expansions.put("a", "A")
+    expansions.put("b", "B")
+    expansions.get("a")
+    expansions.put("c", "C")
+    assert expansions.get("b") is None
+    now[0] += 11
+    assert expansions.get("a") is None
+    expansions.put("d", "D")
+    assert expansions.purge_expired() == 1
+    assert expansions.get("d") == "D"
+
+def test_expansion_cache_dump_and_load_skip_expired(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    expansions = ExpansionCache(ttl=10)
+    expansions.put("a", "A")
+    data = expansions.dump()
+    data["old"] = ["X", 1.0]
+    data["bad"] = "not a pair"
+    restored = ExpansionCache()
+    restored.load(data)
+    assert restored.get("a") == "A"
+    assert restored.get("old") is None and restored.get("bad") is None
+
+def test_cache_dir_defaults_to_plugin_directory():
+    assert cache.cache_manager.cache_dir == os.path.join(cache.PLUGIN_DIR, "cache")
+
+def test_save_cache_writes_atomically(tmp_path):
+    manager = CacheManager(str(tmp_path / "cache"))
+    manager.save_cache("expansion", {"k": ["v", 0]})
+    assert manager.load_cache("expansion") == {"k": ["v", 0]}
+    assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == ["expansion_cache.json"]
+
+def test_sweep_coerces_policy_values(tmp_path):
+    manager = CacheManager(str(tmp_path / "cache"))
+    policy = {key: str(value) for key, value in {
+        "history_max_age": 0,
+        "history_max_nodes": 0,
+        "journal_max_age": 100,
+        "state_max_age": 1,
+        "state_max_nodes": 10,
+        "cache_max_age": 5
+    }.items()}
+    report = manager.sweep(policy)
+    assert report["translation_cache"] == 0 and report["last_translations"] == 0
+
+def test_stats_count_a_miss_only_when_both_tiers_miss(tmp_path):
+    manager = CacheManager(str(tmp_path / "cache"))
+    manager.configure({"path": str(tmp_path / "store.db")})
+    manager.set_translation_cache("你好", "hello", "zh", "en", "b")
+    # 清空内存层，下一次查询由持久化存储命中
+    manager._memory_cache.clear()
+    assert manager.get_translation_cache("你好", "zh", "en", "b") == "hello"
+    assert manager.get_translation_cache("你好", "zh", "en", "b") == "hello"
+    assert manager.get_translation_cache("再见", "zh", "en", "b") is None
+    stats = manager.get_cache_stats()
+    assert stats["store_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["memory_misses"] == 2
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+def test_stats_without_store_count_memory_misses(tmp_path):
+    manager = CacheManager(str(tmp_path / "cache"))
+    manager.configure({"persistent": False})
+    assert manager.get_translation_cache("a", "en", "zh") is None
+    stats = manager.get_cache_stats()
+    assert stats["misses"] == 1 and stats["store_hits"] == 0
+
+def test_workflow_id_from_extra_pnginfo():
+    assert workflow_id({"workflow": {"id": "abc-123", "nodes": []}}) == "abc-123"
+    assert workflow_id({"workflow": {"nodes": []}}) == ""
+    assert workflow_id({"workflow": "not a dict"}) == ""
+    assert workflow_id(None) == ""
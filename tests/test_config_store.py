@@ -0,0 +1,45 @@
+import json
+import os
+
+from lib.config_store import ConfigStore, DEFAULT_CONFIG
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    assert store.get() == DEFAULT_CONFIG
+    assert json.loads(path.read_text(encoding="utf-8")) == DEFAULT_CONFIG
+
+def test_get_is_shared_until_the_file_changes(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"a": {"x": 1}}), encoding="utf-8")
+    store = ConfigStore(str(path))
+    first = store.get()
+    assert store.get() is first
+    
+    path.write_text(json.dumps({"a": {"x": 2}}), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert store.section("a") == {"x": 2}
+    assert store.section("missing") == {}
+
+def test_save_merges_sections_and_notifies_listeners(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"a": {"x": 1, "y": 2}}), encoding="utf-8")
+    store = ConfigStore(str(path))
+    seen = []
+    store.add_listener(lambda config: seen.append(config["a"]["x"]))
+    
+    store.save({"a": {"x": 3}, "b": True})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": {"x": 3, "y": 2}, "b": True}
+    assert seen == [1, 3]
+    assert not os.path.exists(str(path) + ".tmp")
+
+def test_invalid_file_keeps_last_good_config(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"a": 1}), encoding="utf-8")
+    store = ConfigStore(str(path))
+    assert store.get() == {"a": 1}
+    path.write_text("{broken", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert store.get() == {"a": 1}
@@ -0,0 +1,171 @@
+import random
+import sys
+
+from lib import history as history_module
+from lib.history import HistoryStore, NodeHistory, SNAPSHOT_INTERVAL, make_delta, _patch
+
+def state(store, node_id="n"):
+    data = store.get(node_id).to_dict()
+    return data["past"], data["current"], data["future"]
+
+def test_record_undo_redo():
+    store = HistoryStore()
+    for text in ("a", "b", "c"):
+        store.record("n", text)
+    assert state(store) == (["", "a", "b"], "c", [])
+    assert store.undo("n") == "b"
+    assert store.undo("n") == "a"
+    assert state(store) == ([""], "a", ["c", "b"])
+    assert store.redo("n") == "b"
+    # 新记录丢弃重做栈
+    store.record("n", "d")
+    assert state(store) == (["", "a", "b"], "d", [])
+    assert store.redo("n") is None
+
+def test_duplicates_are_not_recorded():
+    store = HistoryStore()
+    store.record("n", "a")
+    store.record("n", "b")
+    store.record("n", "b")
+    store.record("n", "a")
+    assert state(store) == (["", "a"], "b", [])
+
+def test_depth_limits_past():
+    store = HistoryStore(depth=2)
+    for text in "abcde":
+        store.record("n", text)
+    assert state(store) == (["c", "d"], "e", [])
+    store.configure(1, 0)
+    assert state(store) == (["d"], "e", [])
+
+def test_unknown_node():
+    store = HistoryStore()
+    assert store.undo("missing") is None
+    assert store.redo("missing") is None
+    assert store.get("missing") is None
+
+def test_byte_budget_evicts_least_recently_updated_nodes():
+    store = HistoryStore(max_bytes=0)
+    for node_id in ("a", "b", "c"):
+        store.record(node_id, node_id * 1000)
+    total = store.stats()["bytes"]
+    assert total == sum(store.get(node_id).size for node_id in ("a", "b", "c"))
+    
+    store.configure(20, total - 1)
+    assert store.get("a") is None
+    assert store.get("b") is not None and store.get("c") is not None
+    assert store.stats()["bytes"] == store.get("b").size + store.get("c").size
+
+def test_clear_and_sweep(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(history_module.time, "time", lambda: now[0])
+    store = HistoryStore()
+    store.record("old", "x")
+    now[0] += 100
+    store.record("new", "y")
+    store.clear("new")
+    assert state(store, "new") == ([], "", [])
+    
+    old_size = store.get("old").size
+    assert store.sweep(max_age=50) == (1, old_size)
+    assert store.stats()["nodes"] == 1
+    assert store.sweep(max_nodes=1) == (0, 0)
+    store.record("other", "z")
+    assert store.sweep(max_nodes=1)[0] == 1
+    assert store.get("other") is not None
+
+class ReferenceHistory:
+    """不压缩的参考实现，保存每个版本的完整文本"""
+    
+    def __init__(self):
+        self.past, self.current, self.future = [], "", []
+    
+    def record(self, text, depth):
+        if text == self.current or text in self.past:
+            return
+        self.past.append(self.current)
+        self.current, self.future = text, []
+        del self.past[:-depth]
+    
+    def undo(self):
+        if not self.past:
+            return None
+        self.future.append(self.current)
+        self.current = self.past.pop()
+        return self.current
+    
+    def redo(self):
+        if not self.future:
+            return None
+        self.past.append(self.current)
+        self.current = self.future.pop()
+        return self.current
+
+def test_delta_round_trips_in_both_directions():
+    rng = random.Random(3)
+    words = ["cat", "dog", "红色", "sky", "(blue:1.2)", "，", ", ", "。", "\n"]
+    for _ in range(300):
+        previous = "".join(rng.choice(words) for _ in range(rng.randrange(30)))
+        tokens = list(previous)
+        for _ in range(rng.randrange(4)):
+            position = rng.randrange(len(tokens) + 1)
+            tokens[position:position + rng.randrange(3)] = rng.choice(words)
+        text = "".join(tokens)
+        delta = make_delta(previous, text)
+        assert _patch(previous, delta, True) == text
+        assert _patch(text, delta, False) == previous
+
+def test_delta_keeps_only_changed_tags():
+    previous = "masterpiece, best quality, red dress, blue sky, 1girl"
+    delta = make_delta(previous, previous.replace("red dress", "green dress").replace("1girl", "2girls"))
+    changes = [item for item in delta if isinstance(item, tuple)]
+    assert all(len(old) < 12 for old, _ in changes)
+
+def test_history_matches_reference_model():
+    rng = random.Random(1)
+    words = "cat dog red blue sky sun moon tree big small".split()
+    for depth in (1, 3, 20):
+        store = HistoryStore(depth=depth, max_bytes=0)
+        reference = ReferenceHistory()
+        store.init("n")
+        base = [rng.choice(words) for _ in range(30)]
+        for step in range(300):
+            roll = rng.random()
+            if roll < 0.5:
+                base[rng.randrange(len(base))] = rng.choice(words)
+                text = rng.choice(reference.past) if reference.past and rng.random() < 0.1 else ", ".join(base)
+                store.record("n", text)
+                reference.record(text, depth)
+            elif roll < 0.75:
+                assert store.undo("n") == reference.undo()
+            else:
+                assert store.redo("n") == reference.redo()
+            assert state(store) == (reference.past, reference.current, reference.future)
+            node = store.get("n")
+            assert store.stats()["bytes"] == node.size
+            if step % 50 == 0:
+                replayed = NodeHistory.replay([node.snapshot()], depth=1000).to_dict()
+                assert (replayed["past"], replayed["current"], replayed["future"]) == (reference.past, reference.current, reference.future)
+
+def test_full_snapshots_bound_delta_chains():
+    node = NodeHistory()
+    text = ", ".join(f"tag{i}" for i in range(200))
+    for i in range(SNAPSHOT_INTERVAL * 3):
+        text = text.replace(f"tag{i}", f"edit{i}")
+        node.record(text, 100)
+    chain = longest = 0
+    for entry in node.versions:
+        chain = chain + 1 if entry.text is None else 0
+        longest = max(longest, chain)
+    assert longest < SNAPSHOT_INTERVAL
+    assert node.versions[0].text is not None
+
+def test_small_edits_use_less_memory_than_full_copies():
+    node = NodeHistory()
+    text = ", ".join(f"tag{i}" for i in range(300))
+    full_copies = 0
+    for i in range(20):
+        text = text.replace(f"tag{i},", f"edited{i},")
+        node.record(text, 20)
+        full_copies += sys.getsizeof(text)
+    assert node.size < full_copies / 3
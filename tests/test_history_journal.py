@@ -0,0 +1,70 @@
+import os
+import time
+
+from lib.history import HistoryStore
+from lib.history_journal import HistoryJournal
+
+def make_store(directory, **options):
+    store = HistoryStore()
+    store.attach_journal(HistoryJournal(str(directory), flush_interval=60, **options))
+    return store
+
+def state(store, node_id):
+    data = store.get(node_id).to_dict()
+    return data["past"], data["current"], data["future"]
+
+def test_history_is_recovered_from_the_journal(tmp_path):
+    store = make_store(tmp_path)
+    for text in ("a", "b", "c"):
+        store.record("wf\x1f1", text)
+    store.undo("wf\x1f1")
+    expected = state(store, "wf\x1f1")
+    store.journal.flush()
+    
+    recovered = make_store(tmp_path)
+    assert recovered.stats()["nodes"] == 0
+    assert state(recovered, "wf\x1f1") == expected
+    assert recovered.get("other") is None
+
+def test_unflushed_events_are_visible_to_read(tmp_path):
+    journal = HistoryJournal(str(tmp_path), flush_interval=60)
+    journal.append("n", {"op": "record", "text": "a"})
+    assert journal.read("n") == [{"op": "record", "text": "a"}]
+
+def test_removed_nodes_come_back_from_the_journal(tmp_path):
+    store = make_store(tmp_path)
+    store.record("n", "a")
+    store.record("n", "b")
+    expected = state(store, "n")
+    assert store.remove("n")
+    assert state(store, "n") == expected
+
+def test_truncated_line_is_ignored(tmp_path):
+    store = make_store(tmp_path)
+    store.record("n", "a")
+    store.journal.flush()
+    with open(store.journal._path("n"), "a", encoding="utf-8") as f:
+        f.write('{"op": "rec')
+    assert state(make_store(tmp_path), "n") == ([""], "a", [])
+
+def test_compaction_keeps_state_and_shrinks_file(tmp_path):
+    store = make_store(tmp_path, compact_threshold=5)
+    for i in range(12):
+        store.record("n", f"text {i}")
+        store.journal.flush()
+    store.undo("n")
+    store.journal.flush()
+    with open(store.journal._path("n"), encoding="utf-8") as f:
+        assert len(f.readlines()) <= 5
+    assert state(make_store(tmp_path), "n") == state(store, "n")
+
+def test_purge_removes_stale_files(tmp_path):
+    store = make_store(tmp_path)
+    store.record("old", "a")
+    store.record("new", "b")
+    store.journal.flush()
+    stale = time.time() - 3600
+    os.utime(store.journal._path("old"), (stale, stale))
+    assert store.journal.purge(60) == 1
+    assert not os.path.exists(store.journal._path("old"))
+    assert os.path.exists(store.journal._path("new"))
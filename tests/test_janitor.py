@@ -0,0 +1,55 @@
+import asyncio
+
+from lib.janitor import Janitor, DEFAULT_POLICY
+
+def test_sweep_aggregates_reports_and_survives_failing_sweepers():
+    janitor = Janitor()
+    seen = []
+    
+    def sweeper(policy):
+        seen.append(policy["interval"])
+        return {"items": 2, "bytes": 0}
+    
+    def failing(policy):
+        raise RuntimeError("boom")
+    
+    janitor.register("a", sweeper)
+    janitor.register("b", failing)
+    janitor.configure({"interval": 5})
+    assert janitor.sweep() == {"a.items": 2, "a.bytes": 0}
+    janitor.sweep()
+    assert seen == [5, 5]
+    stats = janitor.stats()
+    assert stats["runs"] == 2
+    assert stats["totals"] == {"a.items": 4, "a.bytes": 0}
+
+def test_configure_merges_with_defaults():
+    janitor = Janitor()
+    janitor.configure({"state_max_age": 10})
+    assert janitor.policy["state_max_age"] == 10
+    assert janitor.policy["interval"] == DEFAULT_POLICY["interval"]
+    janitor.configure(None)
+    assert janitor.policy == DEFAULT_POLICY
+
+def test_invalid_interval_falls_back_to_default():
+    janitor = Janitor()
+    janitor.configure({"interval": "soon"})
+    assert janitor._interval() == DEFAULT_POLICY["interval"]
+    janitor.configure({"interval": "0.1"})
+    assert janitor._interval() == 1.0
+
+def test_background_task_runs_sweeps_on_the_loop():
+    async def main():
+        janitor = Janitor()
+        swept = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        janitor.register("a", lambda policy: loop.call_soon_threadsafe(swept.set) or {})
+        janitor.configure({"interval": 1})
+        task = asyncio.ensure_future(janitor._run())
+        try:
+            await asyncio.wait_for(swept.wait(), 5)
+        finally:
+            task.cancel()
+        return swept.is_set()
+    
+    assert asyncio.run(main())
@@ -0,0 +1,23 @@
+from lib.langdetect import script_stats, is_chinese, detect_language
+
+def test_script_stats_counts_each_script():
+    stats = script_stats("一只猫 cat ねこ 고양이 𠀀")
+    assert (stats.han, stats.kana, stats.hangul, stats.latin) == (4, 2, 3, 3)
+    assert stats.length == len("一只猫 cat ねこ 고양이 𠀀")
+
+def test_script_stats_is_memoized():
+    text = "masterpiece, 红色的裙子"
+    assert script_stats(text) is script_stats(text)
+
+def test_is_chinese_threshold():
+    assert is_chinese("一只可爱的猫")
+    assert not is_chinese("a cute cat")
+    assert not is_chinese("a beautiful girl wearing a dress, 红色")
+    assert not is_chinese("")
+
+def test_detect_language():
+    assert detect_language("一只可爱的猫，红色的裙子") == "zh"
+    assert detect_language("a cute cat") == "en"
+    assert detect_language("猫がかわいいです") == "ja"
+    assert detect_language("고양이가 귀엽다") == "ko"
+    assert detect_language("   ") == "unknown"
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from lib.line_diff import LineDiff, make_patch, apply_patch
+
+# 上次翻译记录：原文与译文逐行对应
+SOURCE = ["红色连衣裙", "蓝天", "", "猫咪", "杰作"]
+TRANSLATED = ["red dress", "blue sky", "", "kitten", "masterpiece"]
+
+def translate(lines):
+    return [f"<{line}>" for line in lines]
+
+def run(new_lines):
+    diff = LineDiff(SOURCE, TRANSLATED, new_lines)
+    changed = diff.changed_lines()
+    return diff, changed, diff.merge(translate(changed))
+
+def test_changed_line_is_the_only_one_translated():
+    diff, changed, lines = run(["红色连衣裙", "阴天", "", "猫咪", "杰作"])
+    assert changed == ["阴天"]
+    assert lines == ["red dress", "<阴天>", "", "kitten", "masterpiece"]
+    assert diff.reuse_ratio == 0.8
+
+def test_inserted_lines_keep_surrounding_translations():
+    _, changed, lines = run(["新的一行", "红色连衣裙", "蓝天", "", "猫咪", "草地", "杰作"])
+    assert changed == ["新的一行", "草地"]
+    assert lines == ["<新的一行>", "red dress", "blue sky", "", "kitten", "<草地>", "masterpiece"]
+
+def test_removed_lines_need_no_translation():
+    diff, changed, lines = run(["红色连衣裙", "猫咪", "杰作"])
+    assert changed == []
+    assert lines == ["red dress", "kitten", "masterpiece"]
+    assert diff.reuse_ratio == 1.0
+
+def test_reordered_lines_reuse_previous_translations():
+    diff, changed, lines = run(["杰作", "猫咪", "", "蓝天", "红色连衣裙"])
+    assert changed == []
+    assert lines == ["masterpiece", "kitten", "", "blue sky", "red dress"]
+
+def test_reverse_direction_compares_against_translation():
+    # 文本框中是上次的译文，编辑后译回中文
+    diff = LineDiff(TRANSLATED, SOURCE, ["red dress", "blue sky", "", "puppy", "masterpiece"])
+    assert diff.changed_lines() == ["puppy"]
+    assert diff.merge(["小狗"]) == ["红色连衣裙", "蓝天", "", "小狗", "杰作"]
+
+def test_merge_rejects_wrong_line_count():
+    diff = LineDiff(SOURCE, TRANSLATED, ["新的一行"])
+    with pytest.raises(ValueError):
+        diff.merge([])
+
+def test_patch_only_touches_changed_lines():
+    base = ["红色连衣裙", "", "<lora:style:0.8>", "猫咪"]
+    lines = ["red dress", "", "<lora:style:0.8>", "kitten"]
+    patch = make_patch(base, lines)
+    assert patch == {"base_lines": 4, "hunks": [
+        {"start": 0, "end": 1, "lines": ["red dress"]},
+        {"start": 3, "end": 4, "lines": ["kitten"]}
+    ]}
+    assert apply_patch(base, patch) == lines
+
+def test_patch_round_trips_random_edits():
+    rng = random.Random(11)
+    for _ in range(300):
+        base = [rng.choice("abc") for _ in range(rng.randint(0, 8))]
+        lines = [rng.choice("abxy") for _ in range(rng.randint(0, 8))]
+        assert apply_patch(base, make_patch(base, lines)) == lines
+
+def test_patch_rejects_other_base():
+    patch = make_patch(["a", "b"], ["a", "c"])
+    with pytest.raises(ValueError):
+        apply_patch(["a", "b", "c"], patch)
@@ -0,0 +1,129 @@
+import json
+import os
+import random
+import time
+
+from lib import presets as presets_module
+from lib.preset_search import PresetIndex, scan
+from lib.presets import PresetStore
+
+PRESETS = [
+    {"id": "1", "type": "质量", "content": "Masterpiece, best quality", "note": "通用质量"},
+    {"id": "2", "type": "负面", "content": "lowres, blurry, bad hands", "note": ""},
+    {"id": "3", "type": "质量", "content": "ultra detailed, 8k", "note": "细节"},
+    {"id": "4", "type": "风格", "content": "水彩风格, watercolor", "note": "质量一般"},
+]
+
+QUERIES = ["", "quality", "QUALITY best", "质量", "通用质量", "ds", "8k", "a", "hands bad", "zz", "质量 8k"]
+
+def test_index_matches_scan():
+    index = PresetIndex()
+    index.rebuild(PRESETS)
+    for query in QUERIES:
+        for preset_type in (None, "质量", "负面", "没有"):
+            assert index.match(query, preset_type) == scan(PRESETS, query, preset_type), (query, preset_type)
+
+def test_no_filter_means_all():
+    index = PresetIndex()
+    index.rebuild(PRESETS)
+    assert index.match("  ") is None
+    assert scan(PRESETS, "") is None
+
+def test_terms_do_not_match_across_fields():
+    index = PresetIndex()
+    index.rebuild([{"id": "1", "type": "ab", "content": "cd", "note": ""}])
+    assert index.match("cdab") == set()
+
+def test_incremental_updates_match_rebuild():
+    rng = random.Random(7)
+    words = ["cat", "dog", "猫咪", "red dress", "blue sky", "quality"]
+    index = PresetIndex()
+    presets = {}
+    for step in range(200):
+        preset_id = str(rng.randrange(20))
+        if rng.random() < 0.3:
+            presets.pop(preset_id, None)
+            index.remove(preset_id)
+        else:
+            preset = {"id": preset_id, "type": rng.choice(["a", "b"]), "content": " ".join(rng.sample(words, 2)), "note": ""}
+            presets[preset_id] = preset
+            index.add(preset)
+    rebuilt = PresetIndex()
+    rebuilt.rebuild(list(presets.values()))
+    for query in ["cat", "猫咪", "sky dog", "quality", "og"]:
+        assert index.match(query) == rebuilt.match(query) == scan(list(presets.values()), query)
+    assert sorted(index.types()) == sorted(rebuilt.types())
+
+def test_store_search_pages_in_list_order(tmp_path):
+    path = tmp_path / "Prompt_Preset_List.json"
+    presets = [{"id": str(i), "type": "t", "content": f"tag {i}", "note": ""} for i in range(30)]
+    path.write_text(json.dumps({"presets": presets}), encoding="utf-8")
+    store = PresetStore(str(path))
+    page = store.search("tag", offset=5, limit=10)
+    assert page["total"] == 30
+    assert [item["index"] for item in page["items"]] == list(range(5, 15))
+    assert store.search("tag 2")["total"] == 12  # 2、12 和 20-29
+    assert store.search(preset_type="t", limit=1000)["limit"] == 500
+
+def test_short_terms_use_postings_and_match_scan():
+    rng = random.Random(3)
+    chars = "abcde猫咪水彩"
+    presets = [
+        {"id": str(i), "type": rng.choice(["x", "y"]), "content": "".join(rng.choice(chars) for _ in range(rng.randint(0, 6))), "note": rng.choice(["", "q"])}
+        for i in range(300)
+    ]
+    index = PresetIndex()
+    index.rebuild(presets)
+    for i in range(0, 300, 7):
+        index.remove(str(i))
+    remaining = [preset for preset in presets if int(preset["id"]) % 7]
+    for query in ["a", "q", "猫", "水彩", "ab", "b c", "咪 de", "x", "猫咪水"]:
+        for preset_type in (None, "x"):
+            assert index.match(query, preset_type) == scan(remaining, query, preset_type), (query, preset_type)
+    # 倒排表为空的三元组同时从短词映射中移除
+    assert all(gram in index._postings for grams in index._subgrams.values() for gram in grams)
+
+def test_scan_with_precomputed_haystacks():
+    haystacks = [preset["content"].casefold() + "\x00" + preset["note"] + "\x00" + preset["type"] for preset in PRESETS]
+    for query in QUERIES:
+        assert scan(PRESETS, query, None, haystacks) == scan(PRESETS, query)
+
+def wait_for_index(store):
+    deadline = time.monotonic() + 5
+    while store._index is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.search_ready()
+
+def test_store_pages_resume_and_follow_list_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(presets_module, "SCAN_THRESHOLD", 10)
+    path = tmp_path / "Prompt_Preset_List.json"
+    presets = [{"id": str(i), "type": "t", "content": f"tag {i}" if i % 3 else "other", "note": ""} for i in range(300)]
+    path.write_text(json.dumps({"presets": presets}), encoding="utf-8")
+    store = PresetStore(str(path))
+    expected = [i for i in range(300) if i % 3]
+    store.search("tag")
+    wait_for_index(store)
+    
+    # 深分页先于浅分页请求，之后的分页沿用已扫描的结果
+    for offset in (150, 0, 30, 190, 195):
+        page = store.search("tag", offset=offset, limit=20)
+        assert page["total"] == 200
+        assert [item["index"] for item in page["items"]] == expected[offset:offset + 20]
+    
+    # 修改后旧的分页结果失效
+    store.apply_ops([{"op": "move", "id": "1", "index": 300}])
+    page = store.search("tag", offset=190, limit=20)
+    assert [item["id"] for item in page["items"]][-1] == "1"
+    assert store.search("tag 29")["total"] == sum(1 for i in expected if "29" in str(i))
+
+def test_search_not_ready_until_file_is_loaded_and_indexed(tmp_path):
+    path = tmp_path / "Prompt_Preset_List.json"
+    path.write_text(json.dumps({"presets": [{"id": "1", "content": "a"}]}), encoding="utf-8")
+    store = PresetStore(str(path))
+    assert not store.search_ready()
+    store.search("a")
+    wait_for_index(store)
+    path.write_text(json.dumps({"presets": [{"id": "1", "content": "b"}]}), encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not store.search_ready()
@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from lib.presets import PresetStore, GZIP_MIN_BYTES
+
+def write_presets(path, presets):
+    path.write_text(json.dumps({"presets": presets}, ensure_ascii=False), encoding="utf-8")
+    # 保证修改时间变化，避免同一时间粒度内的两次写入被视为未修改
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+@pytest.fixture
+def preset_file(tmp_path):
+    path = tmp_path / "Prompt_Preset_List.json"
+    write_presets(path, [
+        {"type": "质量", "content": "masterpiece, best quality", "note": "通用", "color_type": "blue"},
+        {"type": "负面", "content": "lowres, blurry", "note": "", "color_type": "red"}
+    ])
+    return path
+
+def test_snapshot_is_cached_until_file_changes(preset_file):
+    store = PresetStore(str(preset_file))
+    snapshot = store.snapshot()
+    assert store.snapshot() is snapshot
+    assert snapshot.count == 2
+    assert [p["content"] for p in json.loads(snapshot.body)["presets"]] == ["masterpiece, best quality", "lowres, blurry"]
+    
+    write_presets(preset_file, [{"type": "a", "content": "x" * GZIP_MIN_BYTES}])
+    changed = store.snapshot()
+    assert changed.etag != snapshot.etag
+    assert gzip.decompress(changed.gzip_body) == changed.body
+
+def test_missing_file():
+    store = PresetStore("/nonexistent/Prompt_Preset_List.json")
+    assert not store.exists()
+    assert store.snapshot() is None
+    assert store.get_presets() == []
+
+def test_replace_rewrites_file_and_assigns_ids(preset_file):
+    store = PresetStore(str(preset_file))
+    etag = store.snapshot().etag
+    store.replace([{"type": "t", "content": "new"}])
+    assert store.snapshot().etag != etag
+    saved = json.loads(preset_file.read_text(encoding="utf-8"))["presets"]
+    assert saved[0]["content"] == "new" and saved[0]["id"]
+
+def test_reading_legacy_file_does_not_rewrite_it(preset_file):
+    before = preset_file.read_bytes()
+    store = PresetStore(str(preset_file))
+    ids = [preset["id"] for preset in store.get_presets()]
+    store.snapshot()
+    store.search("quality")
+    assert preset_file.read_bytes() == before
+    # 派生的ID在重新加载后保持不变
+    assert [preset["id"] for preset in PresetStore(str(preset_file)).get_presets()] == ids
+
+def test_ops_are_journaled_and_replayed(preset_file):
+    store = PresetStore(str(preset_file))
+    first, second = [preset["id"] for preset in store.get_presets()]
+    results = store.apply_ops([
+        {"op": "add", "preset": {"type": "t", "content": "added"}, "index": 0},
+        {"op": "update", "id": second, "fields": {"note": "edited", "id": "ignored"}},
+        {"op": "move", "id": first, "index": 2},
+    ])
+    assert results[1] == {"id": second}
+    expected = [(p["id"], p["content"], p.get("note")) for p in store.get_presets()]
+    assert expected[0][0] == results[0]["id"]
+    assert [content for _, content, _ in expected] == ["added", "lowres, blurry", "masterpiece, best quality"]
+    assert expected[1][2] == "edited"
+    
+    reloaded = PresetStore(str(preset_file))
+    assert [(p["id"], p["content"], p.get("note")) for p in reloaded.get_presets()] == expected
+
+def test_failed_batch_is_not_applied(preset_file):
+    store = PresetStore(str(preset_file))
+    first = store.get_presets()[0]["id"]
+    with pytest.raises(KeyError):
+        store.apply_ops([{"op": "delete", "id": first}, {"op": "delete", "id": "missing"}])
+    assert len(store.get_presets()) == 2
+    assert not os.path.exists(store.journal_path)
+
+def test_compaction_merges_journal_into_file(preset_file):
+    store = PresetStore(str(preset_file), compact_ops=2)
+    store.apply_ops([{"op": "add", "preset": {"content": "a"}}])
+    assert os.path.exists(store.journal_path)
+    store.apply_ops([{"op": "add", "preset": {"content": "b"}}])
+    assert not os.path.exists(store.journal_path)
+    saved = json.loads(preset_file.read_text(encoding="utf-8"))
+    assert [p["content"] for p in saved["presets"]][-2:] == ["a", "b"]
+    assert all(p["id"] for p in saved["presets"])
+    assert len(PresetStore(str(preset_file)).get_presets()) == 4
+
+def test_journal_is_replayed_by_id_when_file_is_replaced(preset_file):
+    original = json.loads(preset_file.read_text(encoding="utf-8"))["presets"]
+    store = PresetStore(str(preset_file))
+    first, second = [preset["id"] for preset in store.get_presets()]
+    added = store.apply_ops([
+        {"op": "delete", "id": first},
+        {"op": "update", "id": second, "fields": {"note": "edited"}},
+        {"op": "add", "preset": {"content": "mine"}}
+    ])[2]["id"]
+    # 例如 git pull 带来的新版本，在开头插入了一条预设，位置都变了
+    write_presets(preset_file, [{"id": "new", "content": "three"}] + [dict(p, id=i) for p, i in zip(original, (first, second))])
+    
+    reloaded = PresetStore(str(preset_file))
+    presets = reloaded.get_presets()
+    assert [p["content"] for p in presets] == ["three", "lowres, blurry", "mine"]
+    assert presets[1]["note"] == "edited" and presets[2]["id"] == added
+    # 重放后立即合并，日志不再保留未合并的修改
+    assert not os.path.exists(reloaded.journal_path)
+    saved = json.loads(preset_file.read_text(encoding="utf-8"))["presets"]
+    assert [p["content"] for p in saved] == ["three", "lowres, blurry", "mine"]
+
+def test_replay_after_interrupted_compaction_does_not_duplicate(preset_file):
+    store = PresetStore(str(preset_file))
+    store.apply_ops([{"op": "add", "preset": {"content": "a"}}])
+    journal = open(store.journal_path, encoding="utf-8").read()
+    # 模拟预设文件已写入而日志尚未删除时崩溃
+    store.compact()
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        f.write(journal)
+    
+    reloaded = PresetStore(str(preset_file))
+    assert [p["content"] for p in reloaded.get_presets()].count("a") == 1
+    assert not os.path.exists(reloaded.journal_path)
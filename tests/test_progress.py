@@ -0,0 +1,55 @@
+import threading
+
+from lib import progress
+from lib.progress import ProgressEmitter
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.sent = threading.Event()
+    
+    def __call__(self, data, sid):
+        self.events.append((data, sid))
+        self.sent.set()
+
+def test_updates_within_the_interval_are_coalesced(monkeypatch):
+    monkeypatch.setattr(progress.time, "monotonic", lambda: 1e6)
+    recorder = Recorder()
+    emitter = ProgressEmitter(recorder, rate=1000.0)
+    emitter.progress("n", {"p": 1}, "sid")
+    for i in range(2, 6):
+        emitter.progress("n", {"p": i}, "sid")
+    assert recorder.events == [({"p": 1}, "sid")]
+    
+    # 到期后只补发最新一条
+    recorder.sent.clear()
+    assert recorder.sent.wait(1)
+    assert recorder.events == [({"p": 1}, "sid"), ({"p": 5}, "sid")]
+    assert emitter.stats()["coalesced"] == 3
+
+def test_final_event_is_immediate_and_drops_pending(monkeypatch):
+    monkeypatch.setattr(progress.time, "monotonic", lambda: 1e6)
+    recorder = Recorder()
+    emitter = ProgressEmitter(recorder, rate=0.001)
+    emitter.progress("n", {"p": 1})
+    emitter.progress("n", {"p": 2})
+    emitter.final("n", {"status": "success"}, "sid")
+    assert recorder.events == [({"p": 1}, None), ({"status": "success"}, "sid")]
+    assert emitter.stats() == {"sent": 2, "coalesced": 1, "rate": 0.001}
+    assert not emitter._timers and not emitter._pending
+
+def test_nodes_are_limited_independently():
+    recorder = Recorder()
+    emitter = ProgressEmitter(recorder, rate=0.001)
+    emitter.progress("a", {"node": "a"})
+    emitter.progress("b", {"node": "b"})
+    assert [data["node"] for data, _ in recorder.events] == ["a", "b"]
+    emitter.final("a", {})
+    emitter.final("b", {})
+
+def test_zero_rate_disables_coalescing():
+    recorder = Recorder()
+    emitter = ProgressEmitter(recorder, rate=0)
+    for i in range(5):
+        emitter.progress("n", {"p": i})
+    assert len(recorder.events) == 5
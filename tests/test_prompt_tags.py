@@ -0,0 +1,23 @@
+from lib.prompt_tags import split_tags, iter_cores, join_tags, is_translatable
+
+def test_split_keeps_bracketed_commas_and_weights():
+    segments = split_tags("(红色, 裙子:1.2), <lora:abc:0.8>, 1girl")
+    tags = [segment for segment in segments if segment["type"] == "tag"]
+    assert [tag["core"] for tag in tags] == ["红色, 裙子", "<lora:abc:0.8>", "1girl"]
+    assert (tags[0]["prefix"], tags[0]["suffix"]) == ("(", ":1.2)")
+
+def test_iter_cores_skips_untranslatable_tags():
+    segments = split_tags("猫, <lora:x:1>, 1.5, ((狗：1.1))")
+    assert list(iter_cores(segments)) == ["猫", "狗"]
+    assert not is_translatable("")
+    assert not is_translatable("123")
+
+def test_join_round_trips_without_translations():
+    line = " (masterpiece:1.2),best quality ,[blur] "
+    assert join_tags(split_tags(line), {}) == line
+
+def test_join_to_english_rewrites_chinese_punctuation():
+    segments = split_tags("((红色：1.1))，猫， 狗")
+    translations = {"红色": "red", "猫": "cat", "狗": "dog"}
+    assert join_tags(segments, translations, "en") == "((red:1.1)), cat, dog"
+    assert join_tags(segments, translations, "zh") == "((red：1.1))，cat， dog"
@@ -0,0 +1,77 @@
+import pytest
+
+from lib import rate_limiter
+from lib.rate_limiter import TokenBucket, RateLimiterRegistry
+
+class FakeClock:
+    """替换 time.monotonic / time.sleep，sleep 只推进时间"""
+    
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    return clock
+
+def test_burst_up_to_capacity_does_not_wait(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        assert bucket.acquire()
+    assert clock.sleeps == []
+
+def test_requests_queue_in_arrival_order(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    assert bucket.acquire()
+    assert bucket.acquire()
+    assert bucket.acquire()
+    # 第二、三个请求分别预约到 0.5 秒和 1 秒之后的令牌
+    assert clock.sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+def test_timeout_releases_reservation(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0.5)
+    clock.now += 1.0
+    assert bucket.acquire()
+    assert clock.sleeps == []
+
+def test_drain_makes_next_request_wait(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+    bucket.drain()
+    assert bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+def test_update_clamps_tokens_to_new_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=10)
+    bucket.update(rate=5, capacity=2)
+    assert bucket.rate == 5
+    assert bucket.acquire() and bucket.acquire()
+    assert clock.sleeps == []
+    assert bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.2)]
+
+def test_resolve_qps():
+    assert RateLimiterRegistry.resolve_qps("advanced") == 10
+    assert RateLimiterRegistry.resolve_qps("Premium") == 100
+    assert RateLimiterRegistry.resolve_qps("advanced", qps="3") == 3.0
+    assert RateLimiterRegistry.resolve_qps(None, qps="bad") == 1
+    assert RateLimiterRegistry.resolve_qps("unknown") == 1
+
+def test_registry_shares_and_updates_buckets():
+    registry = RateLimiterRegistry()
+    bucket = registry.get("appid", 1)
+    assert registry.get("appid", 1) is bucket
+    assert registry.get("appid", 10, capacity=2) is bucket
+    assert (bucket.rate, bucket.capacity) == (10.0, 2.0)
+    assert registry.get("other", 1) is not bucket
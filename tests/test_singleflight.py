@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from lib.singleflight import SingleFlight, AsyncSingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("key", work)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flights.do("key", work)))
+    follower.start()
+    # 等待跟随者进入等待状态
+    while flights.stats()["coalesced"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ["result", "result"]
+    assert len(calls) == 1
+    assert flights.stats() == {"inflight": 0, "coalesced": 1}
+
+def test_errors_propagate_and_key_is_released():
+    flights = SingleFlight()
+    
+    def fail():
+        raise ValueError("boom")
+    
+    with pytest.raises(ValueError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: "ok") == "ok"
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_async_followers_share_result():
+    async def main():
+        flights = AsyncSingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+        
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(3)))
+        return results, calls, flights.stats()
+    
+    results, calls, stats = run(main())
+    assert results == ["result"] * 3
+    assert len(calls) == 1
+    assert stats == {"inflight": 0, "coalesced": 2}
+
+def test_async_leader_cancellation_does_not_cancel_followers():
+    async def main():
+        flights = AsyncSingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.05)
+            return "result"
+        
+        leader = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+    
+    assert run(main()) == "result"
+
+def test_async_upstream_cancelled_when_all_callers_leave():
+    async def main():
+        flights = AsyncSingleFlight()
+        cancelled = asyncio.Event()
+        
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        callers = [asyncio.ensure_future(flights.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flights.stats()
+    
+    assert run(main())["inflight"] == 0
+
+def test_async_errors_propagate_to_all_callers():
+    async def main():
+        flights = AsyncSingleFlight()
+        
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+        
+        return await asyncio.gather(*(flights.do("key", fail) for _ in range(2)), return_exceptions=True)
+    
+    assert [type(result) for result in run(main())] == [ValueError, ValueError]
@@ -1,8 +1,18 @@
 import server
 import re
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from .lib.baidutranslation import translator
 from .lib import Colors, MODULE_PROMPT, success, error, warning, info, content, format_log
-from .lib.cache import cache_manager
+from .lib.cache import cache_manager, reverse_direction, workflow_id
+from .lib.prompt_tags import split_tags, iter_cores, join_tags
+from .lib.config_store import config_store
+from .lib.janitor import janitor
+from .lib.progress import ProgressEmitter
+from .lib.batch_pool import batch_pool
+from .lib.langdetect import is_chinese
+from .lib.line_diff import LineDiff, make_patch
 
 class PromptWidget:
     
@@ -11,8 +21,22 @@ class PromptWidget:
     
     # 记录上次翻译时间，防止频繁请求
     _last_translation_time = {}
+    _last_text = {}
     _min_translation_interval = 1.0  # 最小翻译间隔（秒）
     
+    # 当前使用的翻译账号，变化时清空节流记录
+    _credentials = None
+    
+    # 翻译专用线程池，避免同步网络请求阻塞服务器事件循环
+    _executor = None
+    _default_max_workers = 4
+    
+    # 增量翻译要求的可复用行最低占比，低于该值时完整翻译
+    _incremental_min_ratio = 0.5
+    
+    # 翻译进度事件按节点合并限速，结束事件总是发送
+    _progress = ProgressEmitter(lambda data, sid: server.PromptServer.instance.send_sync("prompt_translate_update", data, sid))
+    
     def __init__(self):
         # 保存节点ID的属性
         self.id = None
@@ -27,6 +51,9 @@ class PromptWidget:
             "optional": {
                 "to_lang": (["auto", "en", "zh"], {"default": "auto"}),
                 "_node_id": ("STRING", {"default": "", "hidden": True})  # 添加隐藏的节点ID输入
+            },
+            "hidden": {
+                "extra_pnginfo": "EXTRA_PNGINFO"  # 用于取工作流ID，与前端的历史记录对应
             }
         }
     
@@ -50,22 +77,70 @@ class PromptWidget:
             print(f"{MODULE_PROMPT} {message}")
     
     @classmethod
-    def _get_from_cache(cls, text):
-        """从缓存中获取翻译结果"""
+    def _get_executor(cls):
+        """获取或创建翻译线程池，线程数由 prompt_translate.max_workers 配置"""
+        if cls._executor is None:
+            max_workers = config_store.section("prompt_translate").get("max_workers", cls._default_max_workers)
+            try:
+                max_workers = max(1, int(max_workers))
+            except (TypeError, ValueError):
+                max_workers = cls._default_max_workers
+            cls._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prompt_translate")
+            cls.log(f"翻译线程池已创建，线程数: {max_workers}")
+        return cls._executor
+    
+    @classmethod
+    def _get_concurrency(cls):
+        """获取批次并发数，由 prompt_translate.concurrency 配置，1 表示逐批顺序翻译"""
+        concurrency = config_store.section("prompt_translate").get("concurrency", 1)
+        try:
+            return max(1, int(concurrency))
+        except (TypeError, ValueError):
+            return 1
+    
+    @classmethod
+    def _get_progress_rate(cls, config):
+        """获取进度事件限速（每节点每秒次数），由 prompt_translate.progress_rate 配置，无效值时使用默认的 5"""
+        try:
+            return float(config.get("progress_rate", 5))
+        except (TypeError, ValueError):
+            return 5.0
+    
+    @classmethod
+    def _incremental_enabled(cls, incremental=None):
+        """是否启用增量翻译，未指定时使用 prompt_translate.incremental 配置（默认开启）"""
+        if incremental is None:
+            incremental = config_store.section("prompt_translate").get("incremental", True)
+        return bool(incremental)
+    
+    @classmethod
+    def _get_batch_bytes(cls):
+        """获取批量翻译的字节上限，由 prompt_translate.batch_bytes 配置，0 表示不合并"""
+        batch_bytes = config_store.section("prompt_translate").get("batch_bytes", translator.MAX_QUERY_BYTES)
+        try:
+            batch_bytes = int(batch_bytes)
+        except (TypeError, ValueError):
+            return translator.MAX_QUERY_BYTES
+        # 0 或负数时每个段落单独请求
+        return batch_bytes if batch_bytes > 0 else 1
+    
+    @classmethod
+    def _get_from_cache(cls, text, from_lang="auto", to_lang="auto"):
+        """从缓存中获取翻译结果，键包含语言对和翻译账号"""
         if not text:
             return None
-        result = cache_manager.get_translation_cache(text)
+        result = cache_manager.get_translation_cache(text, from_lang, to_lang, translator.backend_id)
         if result:
             cls.log(success(f"缓存命中: '{text[:20]}...'"))
         return result
     
     @classmethod
-    def _add_to_cache(cls, original_text, translated_text):
+    def _add_to_cache(cls, original_text, translated_text, from_lang="auto", to_lang="auto"):
         """添加翻译结果到缓存"""
         if not original_text or not translated_text:
             return
             
-        cache_manager.set_translation_cache(original_text, translated_text)
+        cache_manager.set_translation_cache(original_text, translated_text, from_lang, to_lang, translator.backend_id)
         cls.log(success(f"已添加到缓存"))
     
     @staticmethod
@@ -152,7 +227,7 @@ class PromptWidget:
             return {"status": "success", "text": "", "paragraph": paragraph}
         
         # 检查缓存
-        cached_result = self._get_from_cache(text)
+        cached_result = self._get_from_cache(text, from_lang, to_lang)
         if cached_result:
             self.log(success("使用缓存的翻译结果"))
             return {"status": "success", "text": cached_result, "paragraph": paragraph, "from_cache": True}
@@ -172,7 +247,7 @@ class PromptWidget:
             translated_text = self._clean_colon_spaces(translated_text)
             
             # 添加到缓存
-            self._add_to_cache(text, translated_text)
+            self._add_to_cache(text, translated_text, from_lang, to_lang)
             
             # 使用绿色显示成功信息，棕色显示翻译内容
             if self._debug:
@@ -184,13 +259,146 @@ class PromptWidget:
             self.log(error(f"翻译失败: {result['message']}"), force=True)
             return {"status": "error", "message": result["message"], "paragraph": paragraph}
     
+    def translate_paragraphs(self, paragraphs, from_lang, to_lang):
+        """
+        批量翻译多个段落
+        将段落文本按行合并为一次API请求，再按顺序映射回各段落
+        成功时返回与 paragraphs 一一对应的结果列表，失败时返回只含一个错误结果的列表
+        """
+        if len(paragraphs) == 1:
+            return [self.translate_paragraph(paragraphs[0], from_lang, to_lang)]
+        
+        first_index = paragraphs[0].get("line_index", 0)
+        translator.set_paragraph_index(first_index + 1)
+        
+        result = translator.translate_batch([p["text"] for p in paragraphs], from_lang=from_lang, to_lang=to_lang)
+        if result["status"] != "success":
+            self.log(error(f"翻译失败: {result['message']}"), force=True)
+            return [{"status": "error", "message": result["message"], "paragraph": paragraphs[0]}]
+        
+        results = []
+        for paragraph, translated_text in zip(paragraphs, result["texts"]):
+            # 处理冒号后的空格
+            translated_text = self._clean_colon_spaces(translated_text)
+            self._add_to_cache(paragraph["text"], translated_text, from_lang, to_lang)
+            results.append({"status": "success", "text": translated_text, "paragraph": paragraph})
+        
+        if self._debug:
+            self.log(success(f"批量翻译成功，{len(paragraphs)} 个段落"))
+        return results
+    
+    def _run_batches(self, batches, from_lang, to_lang):
+        """
+        按原始顺序逐批产出翻译结果
+        并发数大于1时各批在线程池中并行翻译，结果仍按提交顺序返回
+        """
+        concurrency = self._get_concurrency()
+        if concurrency <= 1 or len(batches) <= 1:
+            for batch in batches:
+                yield self.translate_paragraphs(batch, from_lang, to_lang)
+            return
+        
+        # 批次共享全局线程池，提前结束（如某批失败）时取消尚未开始的批次
+        yield from batch_pool.map_ordered(self.translate_paragraphs, batches, concurrency, from_lang, to_lang)
+    
+    def _iter_batches(self, paragraphs, pending, from_lang, to_lang):
+        """
+        将待翻译段落按字节上限打包翻译
+        按原始顺序产出 (段落下标列表, 结果列表)
+        """
+        batches = translator.pack_batches(
+            [paragraphs[i]["text"] for i in pending],
+            max_bytes=self._get_batch_bytes()
+        )
+        self.log(f"{len(pending)} 个段落需要翻译，打包为 {len(batches)} 个请求")
+        
+        batch_indices = [[pending[j] for j in batch] for batch in batches]
+        batch_runner = self._run_batches(
+            [[paragraphs[i] for i in indices] for indices in batch_indices],
+            from_lang,
+            to_lang
+        )
+        try:
+            yield from zip(batch_indices, batch_runner)
+        finally:
+            batch_runner.close()
+    
+    def _iter_tag_batches(self, paragraphs, pending, from_lang, to_lang):
+        """
+        标签模式：按顶层逗号拆分段落，只翻译翻译记忆中没有的标签
+        新标签去重后打包批量翻译，再用逐标签的译文重建整行，权重语法保持不变
+        按原始顺序产出 (段落下标列表, 结果列表)
+        """
+        parsed = {i: split_tags(paragraphs[i]["text"]) for i in pending}
+        translations = {}
+        missing = {}
+        core_lines = {}
+        new_cores = []
+        for i in pending:
+            missing[i] = set()
+            for core in iter_cores(parsed[i]):
+                if core in translations:
+                    continue
+                if core not in core_lines:
+                    cached_core = self._get_from_cache(core, from_lang, to_lang)
+                    if cached_core:
+                        translations[core] = cached_core
+                        continue
+                    core_lines[core] = []
+                    new_cores.append(core)
+                core_lines[core].append(i)
+                missing[i].add(core)
+        
+        batches = translator.pack_batches(new_cores, max_bytes=self._get_batch_bytes())
+        self.log(f"标签模式: {len(new_cores)} 个新标签需要翻译，打包为 {len(batches)} 个请求")
+        
+        def build_line(i):
+            line_text = join_tags(parsed[i], translations, to_lang)
+            self._add_to_cache(paragraphs[i]["text"], line_text, from_lang, to_lang)
+            return {"status": "success", "text": line_text, "paragraph": paragraphs[i]}
+        
+        next_line = 0
+        def ready_lines():
+            # 产出从 next_line 开始、所需标签均已翻译的连续段落
+            nonlocal next_line
+            indices = []
+            while next_line < len(pending) and not missing[pending[next_line]]:
+                indices.append(pending[next_line])
+                next_line += 1
+            return indices, [build_line(i) for i in indices]
+        
+        batch_runner = self._run_batches(
+            [[{"text": new_cores[j], "line_index": paragraphs[core_lines[new_cores[j]][0]]["line_index"],
+               "is_split": False, "is_line_end": True} for j in batch] for batch in batches],
+            from_lang,
+            to_lang
+        )
+        try:
+            indices, results = ready_lines()
+            if indices:
+                yield indices, results
+            for batch_results in batch_runner:
+                if batch_results[0]["status"] != "success":
+                    yield [], batch_results
+                    return
+                for result in batch_results:
+                    core = result["paragraph"]["text"]
+                    translations[core] = result["text"]
+                    for i in core_lines[core]:
+                        missing[i].discard(core)
+                indices, results = ready_lines()
+                if indices:
+                    yield indices, results
+        finally:
+            batch_runner.close()
+    
     def should_throttle(self, node_id, text):
         """检查是否应该限制翻译频率"""
         import time
         
         current_time = time.time()
         last_time = self._last_translation_time.get(node_id, 0)
-        last_text = getattr(self, '_last_text', {}).get(node_id, '')
+        last_text = self._last_text.get(node_id, '')
         
         # 如果是相同文本且时间间隔过短，则限制请求
         if text == last_text and current_time - last_time < self._min_translation_interval:
@@ -199,64 +407,54 @@ class PromptWidget:
             
         # 更新时间和文本记录
         self._last_translation_time[node_id] = current_time
-        if not hasattr(self, '_last_text'):
-            self._last_text = {}
         self._last_text[node_id] = text
         
         return False
     
-    def process_translation(self, text, from_lang="auto", to_lang="auto", node_id=None):
-        """执行翻译，逐段翻译并保留原始格式"""
-        if not text.strip():
-            return {"status": "error", "message": "翻译文本为空"}
-        
-        # 限制请求频率
-        if node_id and self.should_throttle(node_id, text):
-            return {"status": "error", "message": "请求过于频繁，请稍后再试"}
-        
-        # 保留原始文本
-        original_text = text
-        
-        # 检查当前文本在缓存中是否存在
-        cached_result = self._get_from_cache(text)
-        if cached_result:
-            # 确保实例历史记录存在
-            if node_id:
-                cache_manager.init_history(node_id)
-                cache_manager.record_history(node_id, text)
-            
-            # 确定当前操作是恢复原文还是恢复译文
-            operation_desc = "恢复译文" if text == original_text else "恢复原文"
-            
-            self.log(success(f"从缓存中{operation_desc}"))
-            
-            if node_id:
-                server.PromptServer.instance.send_sync(
-                    "prompt_translate_update",
-                    {
-                        "node_id": node_id,
-                        "status": "success",
-                        "original_text": text,
-                        "translated_text": cached_result,
-                        "operation_type": "restore",
-                        "operation_desc": operation_desc
-                    }
-                )
-                
-            return {"status": "success", "text": cached_result, "from_cache": True, "operation_desc": operation_desc}
+    @classmethod
+    def get_progress_stats(cls):
+        """获取进度事件的发送与合并统计"""
+        return cls._progress.stats()
+    
+    @classmethod
+    def sweep_throttle_state(cls, policy):
+        """
+        清理节流记录，由后台维护任务调用
+        移除超过 state_max_age 秒的记录，并只保留最近的 state_max_nodes 个节点
+        """
+        import time
         
+        max_age = float(policy.get("state_max_age", 0))
+        max_nodes = int(policy.get("state_max_nodes", 0))
+        cutoff = time.time() - max_age
+        ordered = sorted(list(cls._last_translation_time.items()), key=lambda item: item[1])
+        excess = len(ordered) - max_nodes if max_nodes > 0 else 0
+        removed = 0
+        for index, (node_id, last_time) in enumerate(ordered):
+            if index < excess or (max_age > 0 and last_time < cutoff):
+                cls._last_translation_time.pop(node_id, None)
+                cls._last_text.pop(node_id, None)
+                removed += 1
+        return {"throttle_entries": removed}
+    
+    def _translate_body(self, text, from_lang, to_lang, node_id=None, tag_mode=None, progress=True, sid=None):
+        """
+        分段翻译文本并按原始换行格式重建
+        progress 为 False 时不发送进度事件；sid 为接收事件的客户端，None 时广播
+        返回 {"status": "success", "text", "from_cache"} 或错误信息
+        """
         # 详细输出原始文本信息
         self.log("包含: {} 字符，{} 个换行符".format(len(text), text.count('\n')))
         
         # 按段落拆分文本
-        paragraphs = self._split_paragraphs(original_text, max_length=2000)
+        paragraphs = self._split_paragraphs(text, max_length=2000)
         if not paragraphs:
             return {"status": "error", "message": "文本分段后为空"}
         
         # 发送翻译开始通知
-        if node_id:
-            server.PromptServer.instance.send_sync(
-                "prompt_translate_update",
+        if node_id and progress:
+            self._progress.progress(
+                node_id,
                 {
                     "node_id": node_id, 
                     "progress": {
@@ -265,51 +463,74 @@ class PromptWidget:
                     },
                     "status": "translating",
                     "operation_type": "translate"
-                }
+                },
+                sid
             )
         
-        # 逐段翻译
-        translated_paragraphs = []
-        all_from_cache = True  # 标记是否所有段落都来自缓存
-        
+        # 空段落和缓存命中的段落直接得到结果，其余段落打包批量翻译
+        results = [None] * len(paragraphs)
+        pending = []
         for i, paragraph in enumerate(paragraphs):
-            # 发送进度通知
-            if node_id:
-                server.PromptServer.instance.send_sync(
-                    "prompt_translate_update",
+            paragraph_text = paragraph["text"]
+            if not paragraph_text.strip():
+                results[i] = {"status": "success", "text": "", "paragraph": paragraph}
+                continue
+            cached_paragraph = self._get_from_cache(paragraph_text, from_lang, to_lang)
+            if cached_paragraph:
+                results[i] = {"status": "success", "text": cached_paragraph, "paragraph": paragraph, "from_cache": True}
+            else:
+                pending.append(i)
+        
+        all_from_cache = not pending  # 标记是否所有段落都来自缓存
+        
+        if tag_mode is None:
+            tag_mode = bool(config_store.section("prompt_translate").get("tag_mode", False))
+        if tag_mode:
+            batch_stream = self._iter_tag_batches(paragraphs, pending, from_lang, to_lang)
+        else:
+            batch_stream = self._iter_batches(paragraphs, pending, from_lang, to_lang)
+        
+        completed = len(paragraphs) - len(pending)
+        for indices, batch_results in batch_stream:
+            completed += len(indices)
+            
+            # 发送进度通知（按节点合并限速）
+            if node_id and progress:
+                self._progress.progress(
+                    node_id,
                     {
                         "node_id": node_id, 
                         "progress": {
-                            "current": i + 1, 
+                            "current": completed, 
                             "total": len(paragraphs)
                         },
                         "status": "translating",
                         "operation_type": "translate"
-                    }
+                    },
+                    sid
                 )
             
-            # 翻译段落
-            result = self.translate_paragraph(paragraph, from_lang, to_lang)
-            
-            # 检查是否使用了缓存
-            if result.get("from_cache") is not True:
-                all_from_cache = False
-            
             # 处理翻译结果
-            if result["status"] == "success":
-                translated_paragraphs.append(result)
-            else:
+            if batch_results[0]["status"] != "success":
+                batch_stream.close()
+                message = batch_results[0]["message"]
                 # 翻译失败，通知客户端
                 if node_id:
-                    server.PromptServer.instance.send_sync(
-                        "prompt_translate_update",
+                    self._progress.final(
+                        node_id,
                         {
                             "node_id": node_id,
                             "status": "error",
-                            "message": result["message"]
-                        }
+                            "message": message
+                        },
+                        sid
                     )
-                return {"status": "error", "message": result["message"]}
+                return {"status": "error", "message": message}
+            
+            for i, result in zip(indices, batch_results):
+                results[i] = result
+        
+        translated_paragraphs = results
         
         # 重建文本，保留原始换行格式
         lines = [""] * (max(p["paragraph"]["line_index"] for p in translated_paragraphs) + 1)
@@ -329,19 +550,133 @@ class PromptWidget:
         
         # 合并所有行
         final_text = "\n".join(lines)
+        return {"status": "success", "text": final_text, "from_cache": all_from_cache}
+    
+    def _translate_incremental(self, text, from_lang, to_lang, node_id, tag_mode=None, progress=True, sid=None, workflow=""):
+        """
+        增量翻译
+        与该节点上次翻译的原文和译文逐行比对（同方向比原文，反方向比译文），只翻译新增或修改的行，
+        未改动或只调换了顺序的行复用上次的对应行
+        结果附带相对本次请求文本（即前端文本框中的内容）的行补丁，前端文本未变时只替换有变化的行
+        没有可用记录或改动过大时返回 None，由调用方完整翻译
+        """
+        record = cache_manager.get_last_translation(node_id, workflow)
+        if not record:
+            return None
+        
+        source_lines = record["source"].split("\n")
+        translated_lines = record["translated"].split("\n")
+        if len(source_lines) != len(translated_lines):
+            return None
+        
+        candidates = []
+        if (record["from_lang"], record["to_lang"]) == (from_lang, to_lang):
+            candidates.append((source_lines, translated_lines))
+        if reverse_direction(record["from_lang"], record["to_lang"]) == (from_lang, to_lang):
+            candidates.append((translated_lines, source_lines))
+        
+        new_lines = text.split("\n")
+        diff = None
+        for base_lines, target_lines in candidates:
+            candidate = LineDiff(base_lines, target_lines, new_lines)
+            if diff is None or candidate.reuse_ratio > diff.reuse_ratio:
+                diff = candidate
+        if diff is None or diff.reuse_ratio < self._incremental_min_ratio:
+            return None
+        
+        changed = diff.changed_lines()
+        self.log(f"增量翻译: {len(new_lines)} 行中 {len(changed)} 行有改动")
+        
+        # 只翻译改动的行
+        changed_translated = [""] * len(changed)
+        if "\n".join(changed).strip():
+            result = self._translate_body("\n".join(changed), from_lang, to_lang, node_id, tag_mode, progress, sid)
+            if result["status"] != "success":
+                return result
+            changed_translated = result["text"].split("\n")
+            if len(changed_translated) != len(changed):
+                return None
+        
+        lines = diff.merge(changed_translated)
+        return {
+            "status": "success",
+            "text": "\n".join(lines),
+            "from_cache": not changed,
+            "patch": make_patch(new_lines, lines)
+        }
+    
+    def process_translation(self, text, from_lang="auto", to_lang="auto", node_id=None, tag_mode=None, incremental=None, workflow="", progress=True, sid=None):
+        """
+        执行翻译，逐段翻译并保留原始格式
+        tag_mode 为 True 时按标签翻译，为 None 时使用 prompt_translate.tag_mode 配置
+        incremental 为 True 时只翻译相对上次翻译改动的行，为 None 时使用 prompt_translate.incremental 配置
+        workflow 为前端工作流ID，与 node_id 一起区分历史记录
+        progress 为 False 时不发送进度事件，只发送最终结果
+        sid 为发起请求的 websocket 客户端ID，事件只发给该客户端；未知时广播
+        """
+        if not text.strip():
+            return {"status": "error", "message": "翻译文本为空"}
+        
+        # 限制请求频率
+        if node_id and self.should_throttle(node_id, text):
+            return {"status": "error", "message": "请求过于频繁，请稍后再试"}
+        
+        # 保留原始文本
+        original_text = text
+        
+        # 检查当前文本在缓存中是否存在
+        cached_result = self._get_from_cache(text, from_lang, to_lang)
+        if cached_result:
+            # 确保实例历史记录存在
+            if node_id:
+                cache_manager.init_history(node_id, workflow)
+                cache_manager.record_history(node_id, text, workflow)
+            
+            # 确定当前操作是恢复原文还是恢复译文
+            operation_desc = "恢复译文" if text == original_text else "恢复原文"
+            
+            self.log(success(f"从缓存中{operation_desc}"))
+            
+            if node_id:
+                cache_manager.set_last_translation(node_id, text, cached_result, from_lang, to_lang, workflow)
+            
+            if node_id:
+                self._progress.final(
+                    node_id,
+                    {
+                        "node_id": node_id,
+                        "status": "success",
+                        "original_text": text,
+                        "translated_text": cached_result,
+                        "operation_type": "restore",
+                        "operation_desc": operation_desc
+                    },
+                    sid
+                )
+                
+            return {"status": "success", "text": cached_result, "from_cache": True, "operation_desc": operation_desc}
+        
+        # 增量翻译：只翻译相对该节点上次翻译有改动的行
+        result = None
+        if node_id and self._incremental_enabled(incremental):
+            result = self._translate_incremental(text, from_lang, to_lang, node_id, tag_mode, progress, sid, workflow)
+        if result is None:
+            result = self._translate_body(text, from_lang, to_lang, node_id, tag_mode, progress, sid)
+        if result["status"] != "success":
+            return result
+        
+        final_text = result["text"]
+        all_from_cache = result["from_cache"]
         
         self.log("翻译完成，结果字符数: {}，{} 个换行符".format(len(final_text), final_text.count('\n')))
         
         # 添加到缓存
         if not all_from_cache:
-            self._add_to_cache(original_text, final_text)
-        
-        # 检测翻译后的文本语言特征，确定翻译方向
-        chinese_chars_original = sum(1 for char in original_text if '\u4e00' <= char <= '\u9fff')
-        chinese_chars_final = sum(1 for char in final_text if '\u4e00' <= char <= '\u9fff')
+            self._add_to_cache(original_text, final_text, from_lang, to_lang)
         
-        is_chinese_original = chinese_chars_original / len(original_text) > 0.2 if len(original_text) > 0 else False
-        is_chinese_final = chinese_chars_final / len(final_text) > 0.2 if len(final_text) > 0 else False
+        # 检测翻译前后的文本语言特征，确定翻译方向（原文的统计结果已在检测目标语言时缓存）
+        is_chinese_original = is_chinese(original_text)
+        is_chinese_final = is_chinese(final_text)
         
         # 确定翻译方向
         if is_chinese_original and not is_chinese_final:
@@ -353,13 +688,14 @@ class PromptWidget:
         
         # 记录此次翻译的原文，即发送给后端进行翻译的文本
         if node_id:
-            cache_manager.init_history(node_id)
-            cache_manager.record_history(node_id, original_text)
+            cache_manager.init_history(node_id, workflow)
+            cache_manager.record_history(node_id, original_text, workflow)
+            cache_manager.set_last_translation(node_id, original_text, final_text, from_lang, to_lang, workflow)
         
         # 发送成功通知
         if node_id:
-            server.PromptServer.instance.send_sync(
-                "prompt_translate_update",
+            self._progress.final(
+                node_id,
                 {
                     "node_id": node_id,
                     "status": "success",
@@ -367,23 +703,38 @@ class PromptWidget:
                     "translated_text": final_text,
                     "operation_type": "translate",
                     "translate_direction": translate_direction,
-                    "from_cache": all_from_cache
-                }
+                    "from_cache": all_from_cache,
+                    "patch": result.get("patch")
+                },
+                sid
             )
         
-        return {"status": "success", "text": final_text, "from_cache": all_from_cache, "translate_direction": translate_direction}
+        response = {"status": "success", "text": final_text, "from_cache": all_from_cache, "translate_direction": translate_direction}
+        if "patch" in result:
+            # 相对请求文本（original_text）的行补丁，前端文本框仍是该文本时可只替换有变化的行
+            response["patch"] = result["patch"]
+        return response
+    
+    async def process_translation_async(self, text, from_lang="auto", to_lang="auto", node_id=None, tag_mode=None, incremental=None, workflow="", sid=None):
+        """
+        异步执行翻译
+        在专用线程池中运行 process_translation，等待期间不占用事件循环
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(self.process_translation, text, from_lang=from_lang, to_lang=to_lang, node_id=node_id, tag_mode=tag_mode, incremental=incremental, workflow=workflow, sid=sid)
+        )
     
     def auto_detect_language(self, text, to_lang="auto"):
         """自动检测语言"""
         if to_lang == "auto":
-            chinese_chars = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
-            is_chinese = chinese_chars / len(text) > 0.2 if len(text) > 0 else False
-            to_lang = "en" if is_chinese else "zh"
+            to_lang = "en" if is_chinese(text) else "zh"
         
         self.log(f"目标语言: {to_lang}")
         return to_lang
     
-    def translate(self, text, auto_translate=True, to_lang="auto", _node_id=""):
+    def translate(self, text, auto_translate=True, to_lang="auto", _node_id="", extra_pnginfo=None):
         """执行翻译"""
         if not text.strip():
             return (text,)
@@ -398,8 +749,13 @@ class PromptWidget:
         # 自动检测语言
         detected_to_lang = self.auto_detect_language(text, to_lang)
         
-        # 调用翻译方法并返回结果
-        result = self.process_translation(text, from_lang="auto", to_lang=detected_to_lang, node_id=_node_id)
+        # 调用翻译方法并返回结果（图执行时不推送逐段进度，prompt_translate.graph_progress 可开启）
+        progress = bool(config_store.section("prompt_translate").get("graph_progress", False))
+        # 事件只发给提交本次执行的客户端
+        sid = getattr(server.PromptServer.instance, "client_id", None)
+        # 历史记录和增量翻译记录按工作流区分，与界面翻译使用同一个键
+        workflow = workflow_id(extra_pnginfo)
+        result = self.process_translation(text, from_lang="auto", to_lang=detected_to_lang, node_id=_node_id, workflow=workflow, progress=progress, sid=sid)
         
         # 检查翻译结果
         if result["status"] == "success":
@@ -413,40 +769,36 @@ class PromptWidget:
     @classmethod
     def update_config(cls, config):
         """
-        更新节点配置
-        @param config: 新的配置字典
+        应用新的翻译配置（配置存储加载或重新加载时调用）
+        翻译器直接读取共享配置，这里只同步进度事件的限速（progress_rate，每节点每秒次数），并在账号变化时清空节流记录
+        缓存键包含账号，无需清空翻译缓存
+        @param config: prompt_translate 部分的配置字典
         """
         try:
             if not config:
                 return False
-                
-            # 更新百度翻译配置
-            if "appid" in config and "key" in config:
-                # 更新翻译器配置
-                translator.update_config(
-                    appid=config["appid"],
-                    appkey=config["key"]
-                )
-                
-                # 更新类属性（用于新实例化的对象）
-                cls.BAIDU_APP_ID = config["appid"]
-                cls.BAIDU_APP_KEY = config["key"]
-                
-                # 清空翻译缓存，确保使用新配置
-                if hasattr(cache_manager, 'clear_translation_cache'):
-                    cache_manager.clear_translation_cache()
-                
-                # 清空节流记录
-                cls._last_translation_time = {}
-                if hasattr(cls, '_last_text'):
-                    cls._last_text = {}
-                
-                cls.log(success("翻译配置已更新"))
-                return True
             
-            return False
+            cls._progress.rate = cls._get_progress_rate(config)
+            
+            credentials = (config.get("appid", ""), config.get("key", ""))
+            if credentials != cls._credentials:
+                changed = cls._credentials is not None
+                cls._credentials = credentials
+                cls._last_translation_time = {}
+                cls._last_text = {}
+                if changed:
+                    cls.log(success("翻译配置已更新"))
+            return True
         except Exception as e:
-            # 只在真正出错时才输出错误日志
-            if str(e) != "'CacheManager' object has no attribute 'clear_translation_cache'":
-                cls.log(error(f"更新翻译节点配置时出错: {str(e)}"))
-            return False 
\ No newline at end of file
+            cls.log(error(f"更新翻译节点配置时出错: {str(e)}"), force=True)
+            return False
+
+def _apply_config(config):
+    """配置加载或变化时同步翻译缓存、历史记录、后台清理策略和节点设置"""
+    cache_manager.configure(config.get("cache", {}))
+    cache_manager.configure_history(config.get("history", {}))
+    janitor.configure(config.get("janitor", {}))
+    PromptWidget.update_config(config.get("prompt_translate", {}))
+
+config_store.add_listener(_apply_config)
+janitor.register("prompt", PromptWidget.sweep_throttle_state) 
\ No newline at end of file
@@ -234,6 +234,7 @@ function addStylesheet() {
 const TranslateManager = {
     instances: new Map(),
     history: new Map(),
+    historySync: new Map(),
     activeHistoryPopup: null,
     activePresetPopup: null,
     translationCache: new Map(),
@@ -263,6 +264,11 @@ const TranslateManager = {
                 this.handleConfigUpdate(data);
             });
 
+
+            api.addEventListener("prompt_expand_update", (event) => {
+                this.handleExpandUpdate(event);
+            });
+
             this.socketInitialized = true;
             logger.info("WebSocket监听已初始化");
         } catch (error) {
@@ -320,7 +326,7 @@ const TranslateManager = {
 
                 if (instance.text_element) {
 
-                this.updateTextValue(instance.text_element, translated_text);
+                this.applyTextPatch(instance.text_element, original_text, translated_text, data.patch);
 
 
                 this.recordHistory(node_id, translated_text);
@@ -365,6 +371,25 @@ const TranslateManager = {
     },
 
 
+    handleExpandUpdate(event) {
+        try {
+            const data = event?.detail || event;
+            const { node_id, status, delta } = data || {};
+            if (!node_id || status !== "streaming" || !delta) return;
+
+            const instance = this.getInstance(node_id);
+            if (!instance?.text_element || !instance.isExpanding) return;
+
+
+            instance.streamingText = (instance.streamingText || "") + delta;
+            instance.text_element.value = instance.streamingText;
+            instance.text_element.scrollTop = instance.text_element.scrollHeight;
+        } catch (error) {
+            logger.error("处理扩写流式更新失败:", error);
+        }
+    },
+
+
     handleConfigUpdate(data) {
         try {
             logger.info("收到配置更新:", data);
@@ -414,6 +439,8 @@ const TranslateManager = {
                 body: JSON.stringify({
                     text: text,
                     node_id: nodeId,
+                    workflow: this.getWorkflowId(),
+                    client_id: api.clientId,
                     from_lang: from_lang,
                     to_lang: to_lang
                 })
@@ -484,6 +511,7 @@ const TranslateManager = {
 
         if (shouldClear) {
 
+                this.syncServerHistory(key, 'clear');
                 this.closeHistoryPopup();
             this.updateButtonStates(nodeId);
             logger.log(`已${shouldClear ? '清空' : '初始化'}节点 ${nodeId} 的历史记录`);
@@ -527,6 +555,7 @@ const TranslateManager = {
         }
 
 
+        this.syncServerHistory(key, 'record', text);
         this.updateButtonStates(nodeId);
         } catch (error) {
             logger.error(`记录节点 ${nodeId} 的历史时出错:`, error);
@@ -534,6 +563,61 @@ const TranslateManager = {
     },
 
 
+    getWorkflowId() {
+        return app.graph?.id || "";
+    },
+
+
+    queueHistorySync(key, task) {
+        // 同一节点的历史请求按顺序执行，保证服务端日志与本地操作顺序一致
+        const previous = this.historySync.get(key) || Promise.resolve();
+        const request = previous.then(task).catch(error => {
+            logger.error(`同步节点 ${key} 的历史记录失败:`, error);
+        });
+        this.historySync.set(key, request);
+        request.then(() => {
+            if (this.historySync.get(key) === request) {
+                this.historySync.delete(key);
+            }
+        });
+        return request;
+    },
+
+
+    syncServerHistory(nodeId, action, text) {
+        if (!nodeId || !FEATURES.history) return;
+        const key = String(nodeId);
+        const workflow = this.getWorkflowId();
+        return this.queueHistorySync(key, () => api.fetchApi("/prompt_widget/history", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json"
+            },
+            body: JSON.stringify({ node_id: key, workflow, action, text })
+        }));
+    },
+
+
+    restoreHistory(nodeId) {
+        if (!nodeId || !FEATURES.history) return;
+        const key = String(nodeId);
+        const params = new URLSearchParams({ node_id: key, workflow: this.getWorkflowId() });
+        return this.queueHistorySync(key, async () => {
+            const response = await api.fetchApi(`/prompt_widget/history?${params}`);
+            if (!response.ok) return;
+            const saved = (await response.json()).history;
+            const history = this.history.get(key);
+
+            // 仅在本地尚无其他操作时采用服务端保存的历史（服务重启或重新打开工作流后）
+            if (!saved || !history || saved.current !== history.current) return;
+            if (history.past.length > 1 || history.future.length) return;
+            history.past = saved.past.slice(-20);
+            history.future = saved.future.slice();
+            this.updateButtonStates(key);
+        });
+    },
+
+
     clearHistory(nodeId) {
         return this.initOrClearHistory(nodeId, true);
     },
@@ -864,6 +948,58 @@ const TranslateManager = {
     },
 
 
+    applyTextPatch(element, baseText, newText, patch) {
+        // 文本框仍是发送请求时的文本时，按服务端返回的行补丁只替换有变化的行，其余情况整体替换
+        if (!element) return;
+        if (element.value === newText) return;
+
+        const baseLines = baseText.split("\n");
+        if (!patch || !Array.isArray(patch.hunks) || element.value !== baseText || patch.base_lines !== baseLines.length) {
+            this.updateTextValue(element, newText);
+            return;
+        }
+
+        // 每行在文本末尾补一个虚拟换行后的起始位置，lineStarts[baseLines.length] 为虚拟文本的总长度
+        const lineStarts = [0];
+        baseLines.forEach(line => lineStarts.push(lineStarts[lineStarts.length - 1] + line.length + 1));
+        const length = baseText.length;
+
+        try {
+            // 从后往前替换，前面的位置不受影响
+            [...patch.hunks].reverse().forEach(hunk => {
+                let start = lineStarts[hunk.start];
+                let end = lineStarts[hunk.end];
+                let replacement = hunk.lines.map(line => line + "\n").join("");
+                if (end > length) {
+                    // 涉及最后一行时去掉虚拟换行
+                    end = length;
+                    if (start > length) {
+                        start = length;
+                        replacement = "\n" + replacement.slice(0, -1);
+                    } else if (replacement) {
+                        replacement = replacement.slice(0, -1);
+                    } else {
+                        start = Math.max(0, start - 1);
+                    }
+                }
+                element.setRangeText(replacement, start, end, "preserve");
+            });
+        } catch (error) {
+            logger.warn("应用翻译补丁失败，整体替换文本:", error);
+        }
+
+        if (element.value !== newText) {
+            this.updateTextValue(element, newText);
+            return;
+        }
+
+        const event = new Event('input', { bubbles: true });
+        element.dispatchEvent(event);
+
+        this.showEffect(element, 'prompt_text_updated');
+    },
+
+
     createHistoryPopup(nodeId, history, anchorElement) {
 
         this.closeHistoryPopup();
@@ -1490,6 +1626,7 @@ const TranslateManager = {
             const current = history.current;
             history.future.push(current);
             history.current = history.past.pop();
+            this.syncServerHistory(key, 'undo');
 
 
         this.updateButtonStates(nodeId);
@@ -1523,6 +1660,7 @@ const TranslateManager = {
             const current = history.current;
             history.past.push(current);
             history.current = history.future.pop();
+            this.syncServerHistory(key, 'redo');
 
 
         this.updateButtonStates(nodeId);
@@ -1980,7 +2118,7 @@ const TranslateManager = {
                 }
 
 
-                this.updateTextValue(instance.text_element, translatedText);
+                this.applyTextPatch(instance.text_element, currentText, translatedText, result.patch);
 
 
                 this.translationCache.set(currentText, translatedText);
@@ -2062,6 +2200,7 @@ const TranslateManager = {
 
 
         instance.isExpanding = true;
+        instance.streamingText = "";
 
 
         if (expandButton) {
@@ -2083,12 +2222,15 @@ const TranslateManager = {
                 },
                 body: JSON.stringify({
                     text: currentText,
-                    node_id: nodeId
+                    node_id: nodeId,
+                    stream: true,
+                    client_id: api.clientId
                 })
             });
 
 
             instance.isExpanding = false;
+            instance.streamingText = "";
 
 
             textElement.style.border = originalBorder;
@@ -2128,6 +2270,12 @@ const TranslateManager = {
         } catch (error) {
 
             instance.isExpanding = false;
+            instance.streamingText = "";
+
+
+            if (textElement.value !== currentText) {
+                textElement.value = currentText;
+            }
 
 
             textElement.style.border = originalBorder;
@@ -3057,6 +3205,7 @@ function TranslateWidget(node, inputName, inputData, widgetsText) {
     if (widget.text_element) {
         TranslateManager.initOrClearHistory(widgetKey);
         TranslateManager.recordHistory(widgetKey, widget.text_element.value || "");
+        TranslateManager.restoreHistory(widgetKey);
     }
 
 
@@ -4387,10 +4536,21 @@ async function showPresetManagerDialog() {
         content.className = "prompt-preset-manager-content";
 
 
+        let view = null;
+        const closeManager = async () => {
+            document.body.removeChild(dialog);
+            document.body.removeChild(overlay);
+
+            if (view?.changed) {
+                await TranslateManager.reloadConfig();
+            }
+        };
+
+
         const closeButton = document.createElement("button");
         closeButton.className = "preset-close-button";
         closeButton.innerHTML = "&#215;";
-        closeButton.onclick = () => handleClose(dialog, overlay);
+        closeButton.onclick = closeManager;
         content.appendChild(closeButton);
 
 
@@ -4401,12 +4561,32 @@ async function showPresetManagerDialog() {
 
 
         const description = document.createElement("p");
-        description.textContent = "您可以在这里管理提示词预设，修改后请点击保存按钮。注意：结尾不要加逗号！！";
+        description.textContent = "您可以在这里管理提示词预设，修改会立即保存。注意：结尾不要加逗号！！";
         description.style.marginBottom = "20px";
         description.style.color = "#aaa";
         content.appendChild(description);
 
 
+        const searchBar = document.createElement("div");
+        searchBar.className = "preset-search-bar";
+
+        const searchInput = document.createElement("input");
+        searchInput.type = "text";
+        searchInput.className = "preset-search-input";
+        searchInput.placeholder = "搜索内容、说明或类型";
+
+        const typeFilter = document.createElement("select");
+        typeFilter.className = "preset-type-filter";
+
+        const resultCount = document.createElement("span");
+        resultCount.className = "preset-result-count";
+
+        searchBar.appendChild(searchInput);
+        searchBar.appendChild(typeFilter);
+        searchBar.appendChild(resultCount);
+        content.appendChild(searchBar);
+
+
         const loadingIndicator = document.createElement("div");
         loadingIndicator.className = "preset-loading-indicator";
         loadingIndicator.textContent = "正在加载预设数据...";
@@ -4442,16 +4622,25 @@ async function showPresetManagerDialog() {
         content.appendChild(tableContainer);
 
 
+        // 添加新预设的行放在滚动区域之外，始终可见
+        const addTable = document.createElement("table");
+        addTable.className = "preset-table preset-add-table";
+        const addBody = document.createElement("tbody");
+        addTable.appendChild(addBody);
+        addTable.style.display = "none";
+        content.appendChild(addTable);
+
+
         const footer = document.createElement("div");
         footer.className = "preset-manager-footer";
 
 
-        const saveButton = document.createElement("button");
-        saveButton.className = "preset-save-button";
-        saveButton.textContent = "保存";
-        saveButton.onclick = () => handleSave(dialog, overlay, tbody);
+        const doneButton = document.createElement("button");
+        doneButton.className = "preset-save-button";
+        doneButton.textContent = "完成";
+        doneButton.onclick = closeManager;
 
-        footer.appendChild(saveButton);
+        footer.appendChild(doneButton);
         content.appendChild(footer);
 
 
@@ -4469,7 +4658,7 @@ async function showPresetManagerDialog() {
 
         dialog.addEventListener("mouseup", (e) => {
             if (e.target === dialog && mouseDownOnDialog) {
-                handleClose(dialog, overlay);
+                closeManager();
             }
             mouseDownOnDialog = false;
         });
@@ -4480,18 +4669,32 @@ async function showPresetManagerDialog() {
         });
 
         try {
-            const presets = await loadPresetData();
-            await displayPresetData(tbody, presets);
+            view = createPresetTableView(tableContainer, tbody);
+            view.onUpdate = () => {
+                resultCount.textContent = `共 ${view.total} 个预设`;
+                updateTypeFilter(typeFilter, view.types, view.type);
+            };
+            await view.reset("", "");
+            renderPresetAddRow(addBody, view);
 
 
-            const inputs = tbody.querySelectorAll('input, select');
-            inputs.forEach(input => {
-                input.addEventListener('change', trackChanges);
-            });
+            let searchTimer = null;
+            const applySearch = () => {
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => {
+                    view.reset(searchInput.value, typeFilter.value).catch(error => {
+                        console.error("搜索预设失败:", error);
+                    });
+                }, 150);
+            };
+            searchInput.addEventListener("input", applySearch);
+            typeFilter.addEventListener("change", applySearch);
 
 
             loadingIndicator.style.display = "none";
             tableContainer.style.display = "block";
+            addTable.style.display = "";
+            view.render(true);
             if (DEBUG) console.log("预设数据加载完成");
         } catch (error) {
 
@@ -4527,262 +4730,257 @@ const PRESET_COLORS = {
 };
 
 
-async function loadPresetData(tbody) {
-    try {
-
-        if (tbody) {
-            const presets = [];
-
-            const rows = Array.from(tbody.getElementsByTagName('tr')).slice(0, -1);
-
-            for (const row of rows) {
-
-                const colorSelect = row.querySelector('.preset-color-select');
-                const typeSelect = row.querySelector('.preset-type-select');
-                const contentInput = row.querySelector('.preset-content-input');
-                const noteInput = row.querySelector('.preset-note-input');
+const PRESET_ROW_HEIGHT = 40;
+const PRESET_PAGE_SIZE = 100;
+const PRESET_OVERSCAN = 8;
 
 
-                if (contentInput && contentInput.value.trim()) {
-                    presets.push({
-                        color_type: colorSelect ? colorSelect.value : 'default',
-                        type: typeSelect ? typeSelect.value : '未分类',
-                        content: contentInput.value.trim(),
-                        note: noteInput ? noteInput.value.trim() : ''
-                    });
-                }
-            }
-
-            return presets;
-        }
-
+async function fetchPresetPage(query, type, offset, limit) {
+    const params = new URLSearchParams({ q: query || "", offset, limit });
+    if (type) params.set("type", type);
 
-        const response = await fetch('/prompt_widget/presets');
-        if (!response.ok) {
-            throw new Error(`Failed to load presets: ${response.status} ${response.statusText}`);
-        }
+    const response = await fetch(`/prompt_widget/presets/search?${params}`);
+    if (!response.ok) {
+        throw new Error(`Failed to load presets: ${response.status} ${response.statusText}`);
+    }
 
-        const data = await response.json();
-        return data.presets || [];
-    } catch (error) {
-        console.error("加载预设数据失败:", error);
-        throw error;
+    const data = await response.json();
+    if (data.status !== "success") {
+        throw new Error(data.message || "加载预设失败");
     }
+    return data;
 }
 
 
-function movePreset(index, direction, tbody, presets) {
-    try {
-
-        const newIndex = index + direction;
-
-
-        if (newIndex < 0 || newIndex >= presets.length) {
-            return false;
-        }
-
-
-        [presets[index], presets[newIndex]] = [presets[newIndex], presets[index]];
+async function postPresetOps(ops) {
+    const response = await fetch('/prompt_widget/presets/ops', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ ops })
+    });
 
+    const result = await response.json();
+    if (!response.ok || result.status !== "success") {
+        throw new Error(result.message || `保存失败: ${response.status} ${response.statusText}`);
+    }
+    return result.results || [];
+}
 
-        const rows = Array.from(tbody.getElementsByTagName('tr')).slice(0, -1);
 
+function showPresetError(title, error) {
+    console.error(`${title}:`, error);
+    showCustomDialog({
+        title,
+        content: error.message,
+        confirmText: "确定"
+    });
+}
 
-        const row1 = rows[index];
-        const row2 = rows[newIndex];
 
-        if (!row1 || !row2) {
-            console.error("找不到要交换的行:", index, newIndex);
-            return false;
-        }
+function updateTypeFilter(select, types, current) {
+    select.innerHTML = "";
 
+    const allOption = document.createElement("option");
+    allOption.value = "";
+    allOption.textContent = "全部类型";
+    select.appendChild(allOption);
 
-        if (direction < 0) {
-            tbody.insertBefore(row1, row2);
-        }
+    types.forEach(type => {
+        const option = document.createElement("option");
+        option.value = type;
+        option.textContent = type;
+        select.appendChild(option);
+    });
 
-        else {
-            tbody.insertBefore(row2, row1);
-        }
+    select.value = types.includes(current) ? current : "";
+}
 
 
-        row1.dataset.index = newIndex;
-        row2.dataset.index = index;
+function createPresetTableView(scroller, tbody) {
+    // 虚拟滚动的预设表格：只渲染可见区域的行，按页从服务端加载，修改时只更新受影响的行
+    const topSpacer = document.createElement("tr");
+    topSpacer.className = "preset-spacer-row";
+    const bottomSpacer = document.createElement("tr");
+    bottomSpacer.className = "preset-spacer-row";
+
+    const view = {
+        rows: [],
+        total: 0,
+        types: [],
+        query: "",
+        type: "",
+        generation: 0,
+        loadingPages: new Set(),
+        rowElements: new Map(),
+        renderedStart: 0,
+        renderedEnd: 0,
+        renderPending: false,
+        changed: false,
+        onUpdate: null,
+
+
+        get filtered() {
+            return Boolean(this.query.trim() || this.type);
+        },
 
 
-        updatePresetRows(tbody, presets);
+        async reset(query, type) {
+            this.query = query || "";
+            this.type = type || "";
+            const generation = ++this.generation;
+            this.loadingPages.clear();
 
-        return true;
-    } catch (error) {
-        console.error("移动预设时出错:", error);
-        return false;
-    }
-}
+            const data = await fetchPresetPage(this.query, this.type, 0, PRESET_PAGE_SIZE);
+            if (generation !== this.generation) return;
 
+            this.total = data.total;
+            this.types = data.types || [];
+            this.rows = new Array(this.total);
+            data.items.forEach((item, i) => {
+                this.rows[i] = item;
+            });
 
-function updatePresetRows(tbody, presets) {
-    try {
+            scroller.scrollTop = 0;
+            this.render(true);
+            this.onUpdate?.();
+        },
 
-        const rows = Array.from(tbody.getElementsByTagName('tr')).slice(0, -1);
 
-        rows.forEach((row, index) => {
+        async loadPage(page) {
+            if (this.loadingPages.has(page)) return;
+            this.loadingPages.add(page);
 
-            const moveTopButton = row.querySelector('.move-top-button');
-            if (moveTopButton) {
-                moveTopButton.disabled = index === 0;
-                if (moveTopButton.disabled) {
-                    moveTopButton.classList.add('widget_button_disabled');
-                } else {
-                    moveTopButton.classList.remove('widget_button_disabled');
+            const generation = this.generation;
+            const offset = page * PRESET_PAGE_SIZE;
+            try {
+                const data = await fetchPresetPage(this.query, this.type, offset, PRESET_PAGE_SIZE);
+                if (generation !== this.generation) return;
+
+                data.items.forEach((item, i) => {
+                    const position = offset + i;
+                    if (position < this.total && this.rows[position] === undefined) {
+                        this.rows[position] = item;
+                        this.patchRow(position);
+                    }
+                });
+            } catch (error) {
+                console.error("加载预设分页失败:", error);
+            } finally {
+                if (generation === this.generation) {
+                    this.loadingPages.delete(page);
                 }
             }
+        },
 
 
-            const upButton = row.querySelector('.up-button');
-            if (upButton) {
-                upButton.disabled = index === 0;
-                if (upButton.disabled) {
-                    upButton.classList.add('widget_button_disabled');
-                } else {
-                    upButton.classList.remove('widget_button_disabled');
-                }
-            }
+        scheduleRender() {
+            if (this.renderPending) return;
+            this.renderPending = true;
+            requestAnimationFrame(() => {
+                this.renderPending = false;
+                this.render();
+            });
+        },
 
 
-            const downButton = row.querySelector('.down-button');
-            if (downButton) {
-                downButton.disabled = index === presets.length - 1;
-                if (downButton.disabled) {
-                    downButton.classList.add('widget_button_disabled');
-                } else {
-                    downButton.classList.remove('widget_button_disabled');
-                }
+        render(force = false) {
+            const viewportHeight = scroller.clientHeight || 400;
+            const start = Math.max(0, Math.floor(scroller.scrollTop / PRESET_ROW_HEIGHT) - PRESET_OVERSCAN);
+            const end = Math.min(this.total, Math.ceil((scroller.scrollTop + viewportHeight) / PRESET_ROW_HEIGHT) + PRESET_OVERSCAN);
+
+            if (this.total === 0) {
+                const emptyRow = document.createElement("tr");
+                const emptyCell = document.createElement("td");
+                emptyCell.colSpan = 5;
+                emptyCell.textContent = "没有找到任何预设";
+                emptyCell.style.textAlign = "center";
+                emptyRow.appendChild(emptyCell);
+                tbody.replaceChildren(emptyRow);
+                this.rowElements.clear();
+                this.renderedStart = this.renderedEnd = 0;
+                return;
             }
 
+            if (!force && start === this.renderedStart && end === this.renderedEnd && tbody.contains(topSpacer)) return;
 
-            row.dataset.index = index;
+            if (force || !tbody.contains(topSpacer) || end <= this.renderedStart || start >= this.renderedEnd) {
+                // 与当前窗口没有重叠时整体重建
+                const fragment = document.createDocumentFragment();
+                this.rowElements.clear();
+                for (let i = start; i < end; i++) {
+                    const row = this.createRow(i);
+                    this.rowElements.set(i, row);
+                    fragment.appendChild(row);
+                }
+                tbody.replaceChildren(topSpacer, fragment, bottomSpacer);
+            } else {
+                // 只移除离开窗口的行，并在两端补上新进入窗口的行
+                for (const [position, row] of this.rowElements) {
+                    if (position < start || position >= end) {
+                        row.remove();
+                        this.rowElements.delete(position);
+                    }
+                }
 
+                const keptStart = Math.max(start, this.renderedStart);
+                const keptEnd = Math.min(end, this.renderedEnd);
+                const head = document.createDocumentFragment();
+                for (let i = start; i < keptStart; i++) {
+                    const row = this.createRow(i);
+                    this.rowElements.set(i, row);
+                    head.appendChild(row);
+                }
+                topSpacer.after(head);
 
-            if (moveTopButton) {
-                moveTopButton.onclick = () => movePresetToTop(index, tbody, presets);
-            }
-            if (upButton) {
-                upButton.onclick = () => movePreset(index, -1, tbody, presets);
-            }
-            if (downButton) {
-                downButton.onclick = () => movePreset(index, 1, tbody, presets);
+                const tail = document.createDocumentFragment();
+                for (let i = keptEnd; i < end; i++) {
+                    const row = this.createRow(i);
+                    this.rowElements.set(i, row);
+                    tail.appendChild(row);
+                }
+                bottomSpacer.before(tail);
             }
-        });
-    } catch (error) {
-        console.error("更新预设行状态时出错:", error);
-    }
-}
-
-function movePresetToTop(index, tbody, presets) {
-    try {
 
-        if (index === 0) return false;
-
-
-        const rows = Array.from(tbody.getElementsByTagName('tr')).slice(0, -1);
-
-
-        const row = rows[index];
-        if (!row) return false;
-
-
-        const preset = presets.splice(index, 1)[0];
-        presets.unshift(preset);
-
-
-        tbody.insertBefore(row, tbody.firstChild);
-
-
-        updatePresetRows(tbody, presets);
-
-
-        trackChanges();
-
-        return true;
-    } catch (error) {
-        console.error("移动预设到顶部时出错:", error);
-        return false;
-    }
-}
+            topSpacer.style.height = `${start * PRESET_ROW_HEIGHT}px`;
+            bottomSpacer.style.height = `${(this.total - end) * PRESET_ROW_HEIGHT}px`;
+            this.renderedStart = start;
+            this.renderedEnd = end;
+        },
 
-async function displayPresetData(tbody, presets) {
-    try {
 
-        tbody.innerHTML = "";
+        patchRow(position) {
+            const oldRow = this.rowElements.get(position);
+            if (!oldRow) return;
 
-        if (!presets || presets.length === 0) {
-            const emptyRow = document.createElement("tr");
-            const emptyCell = document.createElement("td");
-            emptyCell.colSpan = 5;
-            emptyCell.textContent = "没有找到任何预设";
-            emptyCell.style.textAlign = "center";
-            emptyRow.appendChild(emptyCell);
-            tbody.appendChild(emptyRow);
-            return;
-        }
-
-
-        const presetTypes = new Set();
-        presets.forEach(preset => {
-            if (preset.type) presetTypes.add(preset.type);
-        });
-        const availableTypes = Array.from(presetTypes);
+            const row = this.createRow(position);
+            oldRow.replaceWith(row);
+            this.rowElements.set(position, row);
+        },
 
 
-        presets.forEach((preset, index) => {
+        createRow(position) {
+            const preset = this.rows[position];
             const row = document.createElement("tr");
-            row.dataset.index = index;
+            row.className = "preset-virtual-row";
+            row.dataset.index = position;
+
+            if (!preset) {
+                const loadingCell = document.createElement("td");
+                loadingCell.colSpan = 5;
+                loadingCell.className = "preset-row-loading";
+                loadingCell.textContent = "加载中...";
+                row.appendChild(loadingCell);
+                this.loadPage(Math.floor(position / PRESET_PAGE_SIZE));
+                return row;
+            }
 
 
             const colorCell = document.createElement("td");
             colorCell.style.width = "30px";
-            const colorSelect = document.createElement("select");
-            colorSelect.className = "preset-color-select";
-            colorSelect.style.width = "30px";
-            colorSelect.style.height = "24px";
+            const colorSelect = createPresetColorSelect(preset.color_type);
             colorSelect.title = "选择类型颜色";
-
-
-            Object.entries(PRESET_COLORS).forEach(([key, value]) => {
-                const option = document.createElement("option");
-                option.value = key;
-                option.textContent = "●";
-                option.style.color = value.color;
-                option.title = value.name;
-                if (preset.color_type === key) {
-                    option.selected = true;
-                    colorSelect.style.color = value.color;
-                }
-                colorSelect.appendChild(option);
-            });
-
-
-            if (!preset.color_type) {
-                const firstColor = Object.entries(PRESET_COLORS)[0];
-                if (firstColor) {
-                    preset.color_type = firstColor[0];
-                    colorSelect.style.color = firstColor[1].color;
-                    colorSelect.value = firstColor[0];
-                }
-            }
-
-            colorSelect.onchange = (e) => {
-                preset.color_type = e.target.value;
-                const selectedColor = PRESET_COLORS[e.target.value]?.color;
-                if (selectedColor) {
-                    e.target.style.color = selectedColor;
-                }
-                const typeSelect = row.querySelector('.preset-type-select');
-                if (typeSelect) {
-                    typeSelect.className = `preset-type-select preset_type_${e.target.value}`;
-                }
-            };
-
             colorCell.appendChild(colorSelect);
             row.appendChild(colorCell);
 
@@ -4791,8 +4989,8 @@ async function displayPresetData(tbody, presets) {
             const typeSelect = document.createElement("select");
             typeSelect.className = `preset-type-select${preset.color_type ? ` preset_type_${preset.color_type}` : ''}`;
 
-
-            availableTypes.forEach(type => {
+            const types = this.types.includes(preset.type) ? this.types : [...this.types, preset.type];
+            types.forEach(type => {
                 const option = document.createElement("option");
                 option.value = type;
                 option.textContent = type;
@@ -4802,13 +5000,24 @@ async function displayPresetData(tbody, presets) {
                 typeSelect.appendChild(option);
             });
 
-
             const newTypeOption = document.createElement("option");
             newTypeOption.value = "new";
             newTypeOption.textContent = "添加新类型...";
             typeSelect.appendChild(newTypeOption);
 
-            typeSelect.onchange = (e) => handleTypeChange(e.target, preset, newTypeOption);
+            typeSelect.onchange = (e) => handleTypeChange(e.target, preset, newTypeOption, (type) => {
+                if (!this.types.includes(type)) this.types.push(type);
+                this.updatePreset(preset, { type });
+            });
+
+            colorSelect.onchange = (e) => {
+                const selectedColor = PRESET_COLORS[e.target.value]?.color;
+                if (selectedColor) {
+                    e.target.style.color = selectedColor;
+                }
+                typeSelect.className = `preset-type-select preset_type_${e.target.value}`;
+                this.updatePreset(preset, { color_type: e.target.value });
+            };
 
             typeCell.appendChild(typeSelect);
             row.appendChild(typeCell);
@@ -4820,7 +5029,12 @@ async function displayPresetData(tbody, presets) {
             contentInput.className = "preset-content-input";
             contentInput.value = preset.content;
             contentInput.onchange = (e) => {
-                preset.content = e.target.value;
+                const value = e.target.value.trim();
+                if (!value) {
+                    e.target.value = preset.content;
+                    return;
+                }
+                this.updatePreset(preset, { content: value });
             };
             contentCell.appendChild(contentInput);
             row.appendChild(contentCell);
@@ -4832,7 +5046,7 @@ async function displayPresetData(tbody, presets) {
             noteInput.className = "preset-note-input";
             noteInput.value = preset.note || "";
             noteInput.onchange = (e) => {
-                preset.note = e.target.value;
+                this.updatePreset(preset, { note: e.target.value.trim() });
             };
             noteCell.appendChild(noteInput);
             row.appendChild(noteCell);
@@ -4841,59 +5055,37 @@ async function displayPresetData(tbody, presets) {
             const actionCell = document.createElement("td");
             actionCell.className = "preset-action-buttons";
 
+            // 筛选结果中的顺序不是完整列表的顺序，筛选时不允许移动
+            const movable = !this.filtered;
 
-            const moveTopButton = document.createElement("button");
-            moveTopButton.className = "preset-action-button move-top-button";
-            moveTopButton.innerHTML = "";
-            moveTopButton.title = "移至顶部";
-            moveTopButton.onclick = () => movePresetToTop(index, tbody, presets);
-            moveTopButton.disabled = index === 0;
-            if (moveTopButton.disabled) {
-                moveTopButton.classList.add('widget_button_disabled');
-            }
-
-
-
-            const upButton = document.createElement("button");
-            upButton.className = "preset-action-button up-button";
-            upButton.innerHTML = "";
-            upButton.title = "上移";
-            upButton.onclick = () => movePreset(index, -1, tbody, presets);
-            upButton.disabled = index === 0;
-            if (upButton.disabled) {
-                upButton.classList.add('widget_button_disabled');
-            }
-
-
-            const downButton = document.createElement("button");
-            downButton.className = "preset-action-button down-button";
-            downButton.innerHTML = "";
-            downButton.title = "下移";
-            downButton.onclick = () => movePreset(index, 1, tbody, presets);
-            downButton.disabled = index === presets.length - 1;
-            if (downButton.disabled) {
-                downButton.classList.add('widget_button_disabled');
-            }
-
+            const createActionButton = (className, title, disabled, onClick) => {
+                const button = document.createElement("button");
+                button.className = `preset-action-button ${className}`;
+                button.innerHTML = "";
+                button.title = title;
+                button.disabled = disabled;
+                if (disabled) {
+                    button.classList.add('widget_button_disabled');
+                }
+                button.onclick = onClick;
+                return button;
+            };
 
-            const deleteButton = document.createElement("button");
-            deleteButton.className = "preset-action-button delete-button";
-            deleteButton.innerHTML = "";
-            deleteButton.title = "删除";
-            deleteButton.onclick = () => {
+            const moveTopButton = createActionButton("move-top-button", "移至顶部", !movable || position === 0,
+                () => this.movePreset(position, 0));
+            const upButton = createActionButton("up-button", "上移", !movable || position === 0,
+                () => this.movePreset(position, position - 1));
+            const downButton = createActionButton("down-button", "下移", !movable || position === this.total - 1,
+                () => this.movePreset(position, position + 1));
+            const deleteButton = createActionButton("delete-button", "删除", false, () => {
                 showCustomDialog({
                     title: "确认删除",
                     content: "确定要删除这个预设吗？",
                     confirmText: "确定",
                     cancelText: "取消",
-                    onConfirm: () => {
-                        presets.splice(index, 1);
-                        tbody.removeChild(row);
-                        updatePresetRows(tbody, presets);
-                        trackChanges();
-                    }
+                    onConfirm: () => this.deletePreset(position)
                 });
-            };
+            });
 
 
             const actionDivider = document.createElement("div");
@@ -4907,176 +5099,265 @@ async function displayPresetData(tbody, presets) {
             actionCell.appendChild(deleteButton);
             row.appendChild(actionCell);
 
-            tbody.appendChild(row);
-        });
+            return row;
+        },
 
 
-        const addRow = document.createElement("tr");
-        addRow.className = "preset-add-row";
+        async updatePreset(preset, fields) {
+            try {
+                await postPresetOps([{ op: "update", id: preset.id, fields }]);
+                Object.assign(preset, fields);
+                this.changed = true;
+            } catch (error) {
+                showPresetError("保存失败", error);
+            }
+        },
 
 
-        const addColorCell = document.createElement("td");
-        const addColorSelect = document.createElement("select");
-        addColorSelect.className = "preset-color-select";
-        addColorSelect.style.width = "30px";
-        addColorSelect.style.height = "24px";
+        async movePreset(position, target) {
+            const preset = this.rows[position];
+            if (!preset || target < 0 || target >= this.total || target === position) return;
 
+            try {
+                await postPresetOps([{ op: "move", id: preset.id, index: target }]);
+            } catch (error) {
+                showPresetError("移动预设失败", error);
+                return;
+            }
+            this.changed = true;
 
-        const firstColorEntry = Object.entries(PRESET_COLORS)[0];
-        Object.entries(PRESET_COLORS).forEach(([key, value]) => {
-            const option = document.createElement("option");
-            option.value = key;
-            option.textContent = "●";
-            option.style.color = value.color;
-            option.title = value.name;
-            addColorSelect.appendChild(option);
-        });
+            this.rows.splice(position, 1);
+            this.rows.splice(target, 0, preset);
+
+            if (Math.abs(target - position) === 1) {
+                // 相邻交换只需更新两行
+                this.patchRow(position);
+                this.patchRow(target);
+            } else {
+                this.render(true);
+            }
+        },
 
 
-        if (firstColorEntry) {
-            addColorSelect.value = firstColorEntry[0];
-            addColorSelect.style.color = firstColorEntry[1].color;
-        }
+        async deletePreset(position) {
+            const preset = this.rows[position];
+            if (!preset) return;
+
+            try {
+                await postPresetOps([{ op: "delete", id: preset.id }]);
+            } catch (error) {
+                showPresetError("删除预设失败", error);
+                return;
+            }
+            this.changed = true;
+
+            this.rows.splice(position, 1);
+            this.total -= 1;
+            this.render(true);
+            this.onUpdate?.();
+        },
 
 
-        addColorSelect.onchange = (e) => {
-            const selectedColor = PRESET_COLORS[e.target.value]?.color;
-            if (selectedColor) {
-                e.target.style.color = selectedColor;
+        async addPreset(preset) {
+            let results;
+            try {
+                results = await postPresetOps([{ op: "add", preset }]);
+            } catch (error) {
+                showPresetError("添加预设失败", error);
+                return false;
             }
-        };
+            this.changed = true;
 
-        addColorCell.appendChild(addColorSelect);
-        addRow.appendChild(addColorCell);
+            if (this.filtered) {
+                await this.reset(this.query, this.type);
+                return true;
+            }
 
+            if (!this.types.includes(preset.type)) this.types.push(preset.type);
+            this.rows.push({ ...preset, id: results[0]?.id });
+            this.total += 1;
+            scroller.scrollTop = scroller.scrollHeight;
+            this.render(true);
+            this.onUpdate?.();
+            return true;
+        }
+    };
 
-        const addTypeCell = document.createElement("td");
-        const addTypeSelect = document.createElement("select");
-        addTypeSelect.className = "preset-type-select";
+    scroller.addEventListener("scroll", () => view.scheduleRender());
+    return view;
+}
+
+
+function createPresetColorSelect(colorType) {
+    const colorSelect = document.createElement("select");
+    colorSelect.className = "preset-color-select";
+    colorSelect.style.width = "30px";
+    colorSelect.style.height = "24px";
 
+    const entries = Object.entries(PRESET_COLORS);
+    const selected = PRESET_COLORS[colorType] ? colorType : entries[0]?.[0];
+
+    entries.forEach(([key, value]) => {
+        const option = document.createElement("option");
+        option.value = key;
+        option.textContent = "●";
+        option.style.color = value.color;
+        option.title = value.name;
+        colorSelect.appendChild(option);
+    });
 
-        availableTypes.forEach(type => {
+    if (selected) {
+        colorSelect.value = selected;
+        colorSelect.style.color = PRESET_COLORS[selected].color;
+    }
+    return colorSelect;
+}
+
+
+function renderPresetAddRow(tbody, view) {
+    const addRow = document.createElement("tr");
+    addRow.className = "preset-add-row";
+
+
+    const addColorCell = document.createElement("td");
+    const addColorSelect = createPresetColorSelect();
+    addColorSelect.onchange = (e) => {
+        const selectedColor = PRESET_COLORS[e.target.value]?.color;
+        if (selectedColor) {
+            e.target.style.color = selectedColor;
+        }
+    };
+    addColorCell.appendChild(addColorSelect);
+    addRow.appendChild(addColorCell);
+
+
+    const addTypeCell = document.createElement("td");
+    const addTypeSelect = document.createElement("select");
+    addTypeSelect.className = "preset-type-select";
+
+    const newTypeOption = document.createElement("option");
+    newTypeOption.value = "new";
+    newTypeOption.textContent = "添加新类型...";
+
+    const fillTypes = () => {
+        const current = addTypeSelect.value;
+        addTypeSelect.innerHTML = "";
+        view.types.forEach(type => {
             const option = document.createElement("option");
             option.value = type;
             option.textContent = type;
             addTypeSelect.appendChild(option);
         });
-
-
-        const newTypeOption = document.createElement("option");
-        newTypeOption.value = "new";
-        newTypeOption.textContent = "添加新类型...";
         addTypeSelect.appendChild(newTypeOption);
+        if (current && current !== "new" && view.types.includes(current)) {
+            addTypeSelect.value = current;
+        }
+    };
+    fillTypes();
+
+
+    addTypeSelect.onchange = (e) => {
+        if (e.target.value === "new") {
+            showCustomDialog({
+                title: "添加新类型",
+                content: "请输入新的类型名称：",
+                showInput: true,
+                inputLabel: "类型名称",
+                confirmText: "确定",
+                cancelText: "取消",
+                onConfirm: (newType) => {
+                    if (newType && newType.trim()) {
+                        const option = document.createElement("option");
+                        option.value = newType;
+                        option.textContent = newType;
+                        e.target.insertBefore(option, newTypeOption);
+                        e.target.value = newType;
+                    } else {
 
+                        e.target.value = e.target.options[0].value;
+                    }
+                },
+                onCancel: () => {
 
-        addTypeSelect.onchange = (e) => {
-            if (e.target.value === "new") {
-                showCustomDialog({
-                    title: "添加新类型",
-                    content: "请输入新的类型名称：",
-                    showInput: true,
-                    inputLabel: "类型名称",
-                    confirmText: "确定",
-                    cancelText: "取消",
-                    onConfirm: (newType) => {
-                        if (newType && newType.trim()) {
-                            const option = document.createElement("option");
-                            option.value = newType;
-                            option.textContent = newType;
-                            e.target.insertBefore(option, newTypeOption);
-                            e.target.value = newType;
-                        } else {
+                    e.target.value = e.target.options[0].value;
+                }
+            });
+        }
+    };
 
-                            e.target.value = e.target.options[0].value;
-                        }
-                    },
-                    onCancel: () => {
+    addTypeCell.appendChild(addTypeSelect);
+    addRow.appendChild(addTypeCell);
 
-                        e.target.value = e.target.options[0].value;
-                    }
-                });
-            }
-        };
 
-        addTypeCell.appendChild(addTypeSelect);
-        addRow.appendChild(addTypeCell);
+    const addContentCell = document.createElement("td");
+    const addContentInput = document.createElement("input");
+    addContentInput.type = "text";
+    addContentInput.className = "preset-content-input";
+    addContentInput.placeholder = "输入预设内容";
+    addContentCell.appendChild(addContentInput);
+    addRow.appendChild(addContentCell);
 
 
-        const addContentCell = document.createElement("td");
-        const addContentInput = document.createElement("input");
-        addContentInput.type = "text";
-        addContentInput.className = "preset-content-input";
-        addContentInput.placeholder = "输入预设内容";
-        addContentCell.appendChild(addContentInput);
-        addRow.appendChild(addContentCell);
+    const addNoteCell = document.createElement("td");
+    const addNoteInput = document.createElement("input");
+    addNoteInput.type = "text";
+    addNoteInput.className = "preset-note-input";
+    addNoteInput.placeholder = "输入说明";
+    addNoteCell.appendChild(addNoteInput);
+    addRow.appendChild(addNoteCell);
 
 
-        const addNoteCell = document.createElement("td");
-        const addNoteInput = document.createElement("input");
-        addNoteInput.type = "text";
-        addNoteInput.className = "preset-note-input";
-        addNoteInput.placeholder = "输入说明";
-        addNoteCell.appendChild(addNoteInput);
-        addRow.appendChild(addNoteCell);
+    const submit = async (type) => {
+        const added = await view.addPreset({
+            type: type,
+            content: addContentInput.value.trim(),
+            note: addNoteInput.value.trim(),
+            color_type: addColorSelect.value
+        });
+        if (added) {
+            addContentInput.value = "";
+            addNoteInput.value = "";
+            fillTypes();
+        }
+    };
 
 
-        const addActionCell = document.createElement("td");
-        const addButton = document.createElement("button");
-        addButton.className = "preset-add-button";
-        addButton.textContent = "添加";
-        addButton.onclick = () => {
-            const type = addTypeSelect.value;
-            const content = addContentInput.value.trim();
-            const note = addNoteInput.value.trim();
+    const addActionCell = document.createElement("td");
+    const addButton = document.createElement("button");
+    addButton.className = "preset-add-button";
+    addButton.textContent = "添加";
+    addButton.onclick = () => {
+        const type = addTypeSelect.value;
+        const content = addContentInput.value.trim();
 
-            if (!content) {
-                showCustomDialog({
-                    title: "提示",
-                    content: "请输入预设内容",
-                    confirmText: "确定"
-                });
-                return;
-            }
+        if (!content) {
+            showCustomDialog({
+                title: "提示",
+                content: "请输入预设内容",
+                confirmText: "确定"
+            });
+            return;
+        }
 
-            if (type === "new") {
-                showCustomDialog({
-                    title: "添加新类型",
-                    content: "请输入新的类型名称：",
-                    showInput: true,
-                    onConfirm: (newType) => {
-                        if (newType) {
-                            const newPreset = {
-                                type: newType,
-                                content: content,
-                                note: note,
-                                color_type: addColorSelect.value
-                            };
-                            presets.push(newPreset);
-                            displayPresetData(tbody, presets);
-                            trackChanges();
-                        }
+        if (type === "new" || !type) {
+            showCustomDialog({
+                title: "添加新类型",
+                content: "请输入新的类型名称：",
+                showInput: true,
+                onConfirm: (newType) => {
+                    if (newType) {
+                        submit(newType);
                     }
-                });
-            } else {
-                const newPreset = {
-                    type: type,
-                    content: content,
-                    note: note,
-                    color_type: addColorSelect.value
-                };
-                presets.push(newPreset);
-                displayPresetData(tbody, presets);
-                trackChanges();
-            }
-        };
-        addActionCell.appendChild(addButton);
-        addRow.appendChild(addActionCell);
+                }
+            });
+        } else {
+            submit(type);
+        }
+    };
+    addActionCell.appendChild(addButton);
+    addRow.appendChild(addActionCell);
 
-        tbody.appendChild(addRow);
-    } catch (error) {
-        console.error("显示预设数据时出错:", error);
-        throw error;
-    }
+    tbody.appendChild(addRow);
 }
 
 
@@ -5146,7 +5427,7 @@ function showSuccessToast(message, duration = 2000) {
 }
 
 
-function handleTypeChange(typeSelect, preset, newTypeOption) {
+function handleTypeChange(typeSelect, preset, newTypeOption, onChange) {
     if (typeSelect.value === "new") {
         showCustomDialog({
             title: "添加新类型",
@@ -5166,6 +5447,7 @@ function handleTypeChange(typeSelect, preset, newTypeOption) {
                         preset.type = newType;
                         trackChanges();
                     }
+                    onChange?.(newType);
                 } else {
                     typeSelect.value = preset ? preset.type : typeSelect.options[0].value;
                 }
@@ -5177,12 +5459,14 @@ function handleTypeChange(typeSelect, preset, newTypeOption) {
     } else if (preset) {
         preset.type = typeSelect.value;
         trackChanges();
+        onChange?.(typeSelect.value);
     }
 }
 
 
 let hasChanges = false;
 
+
 function trackChanges() {
     hasChanges = true;
 }
@@ -5212,44 +5496,6 @@ function handleClose(dialog, overlay) {
 }
 
 
-async function handleSave(dialog, overlay, tbody) {
-    try {
-        const presets = await loadPresetData(tbody);
-
-        const response = await fetch('/prompt_widget/save_presets', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ presets })
-        });
-
-        const result = await response.json();
-
-        if (!response.ok) {
-            throw new Error(result.message || `保存失败: ${response.status} ${response.statusText}`);
-        }
-
-        if (result.status === "success") {
-
-            await TranslateManager.reloadConfig();
-
-            showSuccessToast("保存成功！预设已更新");
-            hasChanges = false;
-        } else {
-            throw new Error(result.message || "保存失败");
-        }
-    } catch (error) {
-        console.error("保存预设失败:", error);
-        showCustomDialog({
-            title: "保存失败",
-            content: error.message,
-            confirmText: "确定"
-        });
-    }
-}
-
-
 async function showAPIConfigDialog() {
     try {
         if (DEBUG) console.log("正在打开API配置对话框...");
@@ -5572,7 +5818,7 @@ async function handleSaveConfig(dialog, overlay, container) {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(config)
+            body: JSON.stringify({ ...config, client_id: api.clientId })
         });
 
         const result = await response.json();